@@ -0,0 +1,50 @@
+"""Measures the memory held by a TaskHandler (and a ColumnarTaskHandler) after ingesting a Mofka-Dask run.
+
+Memory is measured with tracemalloc as the bytes still allocated once the handler is built, so the pandas
+dataframes read along the way are not counted. Run with the package installed (e.g. `pip install -e .`)::
+
+    python benchmarks/bench_memory.py tests/test_data
+"""
+import argparse as ap
+import gc
+import os
+import tracemalloc
+
+from wfmeta_dask import extract_metadata
+from wfmeta_dask.objs import ColumnarTaskHandler, TaskHandler
+
+_FILES = [("scheduler_transition.csv", "SCHED"), ("worker_transfer.csv", "WXFER"), ("worker_transition.csv", "WTRANS")]
+
+
+def measure(handler_type: type, directory: str):
+    gc.collect()
+    tracemalloc.start()
+    th = handler_type()
+    n_events = 0
+    for filename, category in _FILES:
+        path = os.path.join(directory, filename)
+        if os.path.isfile(path):
+            extract_metadata(path, category, False, th)
+            with open(path, "rb") as f:
+                n_events += sum(1 for _ in f) - 1
+    gc.collect()
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return th, n_events, held, peak
+
+
+def main():
+    parser = ap.ArgumentParser(description="Report resident memory per event of the TaskHandler implementations.")
+    parser.add_argument("directory", help="Directory containing the Mofka-Dask csv files.")
+    args = parser.parse_args()
+
+    for handler_type in (TaskHandler, ColumnarTaskHandler):
+        th, n_events, held, peak = measure(handler_type, args.directory)
+        per_million = held / max(n_events, 1) * 1e6 / 2**20
+        print("{name:<22}{n:>10} rows{held:>10.1f} MiB held{peak:>10.1f} MiB peak{pm:>10.1f} MiB per million rows".format(
+            name=handler_type.__name__, n=n_events, held=held / 2**20, peak=peak / 2**20, pm=per_million))
+        del th
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Compares snapshots (with every available codec) against pickling a TaskHandler: file size, save and load time.
+
+The handler is built once from a Mofka-Dask run and sorted, then written and read back with each format. Run with
+the package installed (e.g. `pip install -e .`)::
+
+    python benchmarks/bench_snapshot.py tests/test_data
+"""
+import argparse as ap
+import gc
+import os
+import pickle
+import tempfile
+import time
+
+from wfmeta_dask import extract_metadata
+from wfmeta_dask.objs import TaskHandler
+from wfmeta_dask.snapshot import CODECS, load_snapshot, write_snapshot
+
+_FILES = [("scheduler_transition.csv", "SCHED"), ("worker_transfer.csv", "WXFER"), ("worker_transition.csv", "WTRANS")]
+
+
+def _available(codec: str) -> bool:
+    if codec != "zstd":
+        return True
+    try:
+        import zstandard  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _pickle(th: TaskHandler, path: str) -> None:
+    with open(path, "wb") as f:
+        pickle.dump(th, f, pickle.HIGHEST_PROTOCOL)
+
+
+def _unpickle(path: str) -> TaskHandler:
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def _time(function, *args):
+    gc.collect()
+    t_begin = time.perf_counter()
+    out = function(*args)
+    return out, time.perf_counter() - t_begin
+
+
+def main():
+    parser = ap.ArgumentParser(description="Compare snapshot codecs against pickle on size, save and load time.")
+    parser.add_argument("directory", help="Directory containing the Mofka-Dask csv files.")
+    parser.add_argument("--codecs", nargs="+", choices=CODECS, default=CODECS)
+    args = parser.parse_args()
+
+    th = TaskHandler()
+    for filename, category in _FILES:
+        path = os.path.join(args.directory, filename)
+        if os.path.isfile(path):
+            extract_metadata(path, category, False, th)
+    th.sort_tasks_by_time()
+    print("{n} tasks".format(n=len(th.tasks)))
+
+    formats = [("pickle", _pickle, _unpickle)]
+    for codec in args.codecs:
+        if _available(codec):
+            formats.append(("snapshot/" + codec, lambda th, path, c=codec: write_snapshot(th, path, codec=c),
+                            load_snapshot))
+        else:
+            print("skipping snapshot/{c}: zstandard is not installed".format(c=codec))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, save, load in formats:
+            path = os.path.join(tmp, name.replace("/", "_"))
+            _, t_save = _time(save, th, path)
+            loaded, t_load = _time(load, path)
+            assert len(loaded.tasks) == len(th.tasks)
+            del loaded
+            print("{name:<18}{size:>10.2f} MiB{save:>10.2f} s save{load:>10.2f} s load".format(
+                name=name, size=os.path.getsize(path) / 2**20, save=t_save, load=t_load))
+
+
+if __name__ == "__main__":
+    main()
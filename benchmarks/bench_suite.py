@@ -0,0 +1,182 @@
+"""Scaling benchmark of the extraction pipeline on synthetic runs, with machine-readable results.
+
+For every requested scale, a synthetic run is generated with :mod:`wfmeta_dask.synthetic` (and cached in
+`--workdir`), then each handler type goes through `extract_metadata` (per file), `sort_tasks_by_time`, `to_df` and
+every output format. Wall time, rows per second, peak RSS and (with `--memory`) the peak traced Python memory of
+every stage are written as JSON, and `--compare` reports the stages that got slower than a previous result file.
+Run with the package installed (e.g. `pip install -e .`)::
+
+    python benchmarks/bench_suite.py --events 1000 100000 1000000 -o results.json
+    python benchmarks/bench_suite.py --events 1000 100000 1000000 --compare results.json
+"""
+import argparse as ap
+import datetime
+import gc
+import json
+import os
+import pathlib
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from wfmeta_dask import RUN_FILES, extract_metadata, write_output
+from wfmeta_dask.objs import ColumnarTaskHandler, TaskHandler
+from wfmeta_dask.profiling import max_rss
+from wfmeta_dask.synthetic import generate_events
+
+HANDLERS = {"object": TaskHandler, "columnar": ColumnarTaskHandler}
+FORMATS = ["txt", "pickle", "df_csv", "parquet", "store", "snapshot"]
+
+
+class Stage:
+    """Times one pipeline stage and records its peak memory."""
+
+    def __init__(self, results: list, memory: bool, **labels):
+        self.results = results
+        self.memory = memory
+        self.labels = labels
+        self.rows = labels.pop("rows", None)
+
+    def __enter__(self):
+        gc.collect()
+        if self.memory:
+            tracemalloc.reset_peak()
+        self.t_begin = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.t_begin
+        record = dict(self.labels, seconds=seconds, rows=self.rows, max_rss_bytes=max_rss())
+        if self.rows is not None and seconds > 0:
+            record["rows_per_second"] = self.rows / seconds
+        if self.memory:
+            record["peak_traced_bytes"] = tracemalloc.get_traced_memory()[1]
+        self.results.append(record)
+
+
+def run_pipeline(run_dir: str, n_events: int, handler: str, formats: list, memory: bool, results: list) -> None:
+    th = HANDLERS[handler]()
+    labels = {"events": n_events, "handler": handler}
+    for name, category in RUN_FILES:
+        path = os.path.join(run_dir, name)
+        with open(path, "rb") as f:
+            rows = sum(1 for _ in f) - 1
+        with Stage(results, memory, stage="extract", category=category, rows=rows, **labels):
+            extract_metadata(path, category, False, th)
+
+    with Stage(results, memory, stage="sort", **labels):
+        th.sort_tasks_by_time()
+    with Stage(results, memory, stage="to_df", **labels):
+        th.to_df()
+
+    with tempfile.TemporaryDirectory() as out:
+        for form in formats:
+            with Stage(results, memory, stage="write", format=form, **labels):
+                write_output(th, pathlib.Path(out), form)
+
+
+def _stage_id(r: dict) -> tuple:
+    return (r["events"], r["handler"], r["stage"], r.get("category"), r.get("format"))
+
+
+def best_of(results: list) -> list:
+    """Keeps the fastest repetition of every stage."""
+    best = {}
+    for r in results:
+        k = _stage_id(r)
+        if k not in best or r["seconds"] < best[k]["seconds"]:
+            best[k] = r
+    return list(best.values())
+
+
+def compare(current: list, baseline: list, threshold: float) -> int:
+    """Prints the stages that are more than `threshold` times slower than in `baseline`; returns how many."""
+    old = {_stage_id(r): r for r in baseline}
+    n_slower = 0
+    for r in current:
+        b = old.get(_stage_id(r))
+        if b is None or b["seconds"] <= 0:
+            continue
+        ratio = r["seconds"] / b["seconds"]
+        if ratio > threshold:
+            n_slower += 1
+            print("SLOWER {id}: {b:.4f}s -> {c:.4f}s ({r:.2f}x)".format(id=_stage_id(r), b=b["seconds"], c=r["seconds"],
+                                                                        r=ratio))
+    return n_slower
+
+
+def _meta() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"timestamp": datetime.datetime.now().isoformat(), "commit": commit, "python": platform.python_version(),
+            "numpy": np.__version__, "pandas": pd.__version__, "platform": platform.platform(),
+            "cpu_count": os.cpu_count()}
+
+
+def main():
+    parser = ap.ArgumentParser(description="Time and memory-profile the extraction pipeline on synthetic runs.")
+    parser.add_argument("--events", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="Approximate number of events of each synthetic run.")
+    parser.add_argument("--handlers", nargs="+", choices=list(HANDLERS), default=list(HANDLERS))
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=FORMATS)
+    parser.add_argument("--repeat", type=int, default=1, help="Repetitions per stage; the fastest is reported.")
+    parser.add_argument("--memory", action="store_true",
+                        help="Also record the peak Python memory of every stage with tracemalloc (slows everything down).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default=None, help="Directory to generate (and reuse) the synthetic runs in.")
+    parser.add_argument("-o", "--output", default=None, help="File to write the JSON results to.")
+    parser.add_argument("--compare", default=None, help="A previous JSON result file to compare against.")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="With --compare, report stages this many times slower; the exit status is 1 if any are.")
+    args = parser.parse_args()
+
+    formats = list(args.formats)
+    if "parquet" in formats:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("pyarrow is not installed, skipping the parquet format.")
+            formats.remove("parquet")
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="wfmeta_bench_")
+    if args.memory:
+        tracemalloc.start()
+
+    results: list = []
+    for n_events in args.events:
+        run_dir = os.path.join(workdir, "events_{n}_seed_{s}".format(n=n_events, s=args.seed))
+        if not all(os.path.isfile(os.path.join(run_dir, name)) for name, _ in RUN_FILES):
+            print("Generating a run of about {n} events in {d}.".format(n=n_events, d=run_dir))
+            generate_events(run_dir, n_events, seed=args.seed)
+        for handler in args.handlers:
+            for _ in range(args.repeat):
+                run_pipeline(run_dir, n_events, handler, formats, args.memory, results)
+
+    results = best_of(results)
+    for r in results:
+        print("{events:>10} {handler:<9} {stage:<8} {what:<7} {seconds:>9.4f}s {rate}".format(
+            what=r.get("category") or r.get("format") or "", rate="{:,.0f} rows/s".format(r["rows_per_second"])
+            if "rows_per_second" in r else "", **r))
+
+    report = {"meta": _meta(), "results": results}
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        if compare(results, baseline, args.threshold) > 0:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Compares parsing the `keys` column of a worker transfer file with `eval` against :func:`parse_wxfer_keys`.
+
+Run with the package installed (e.g. `pip install -e .`)::
+
+    python benchmarks/bench_wxfer_keys.py data/worker_transfer.csv
+"""
+import argparse as ap
+import timeit
+
+import pandas as pd
+
+from wfmeta_dask.helpers import _parse_wxfer_keys_cached, parse_wxfer_keys
+
+
+def run_eval(keys):
+    for k in keys:
+        eval(k)
+
+
+def run_parser(keys):
+    for k in keys:
+        parse_wxfer_keys(k)
+
+
+def run_parser_cold(keys):
+    _parse_wxfer_keys_cached.cache_clear()
+    run_parser(keys)
+
+
+def main():
+    parser = ap.ArgumentParser(description="Benchmark eval against parse_wxfer_keys on a worker_transfer.csv file.")
+    parser.add_argument("filename", help="Path to a worker_transfer.csv file.")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="Number of timed repetitions; the best is reported.")
+    args = parser.parse_args()
+
+    keys = pd.read_csv(args.filename)["keys"].to_list()
+    print("{n} rows, {u} distinct keys strings".format(n=len(keys), u=len(set(keys))))
+
+    for name, fn in [("eval", run_eval), ("parse_wxfer_keys (cold cache)", run_parser_cold),
+                     ("parse_wxfer_keys (warm cache)", run_parser)]:
+        best = min(timeit.repeat(lambda: fn(keys), number=1, repeat=args.repeat))
+        print("{name:<32}{t:10.4f} s{r:12.0f} rows/s".format(name=name, t=best, r=len(keys) / best))
+
+
+if __name__ == "__main__":
+    main()
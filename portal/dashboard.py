@@ -1,21 +1,65 @@
-import pickle
+import os
 import sys
 
-from dash import Dash, dash_table, dcc, callback, Output, Input, html, _dash_renderer
+from dash import Dash, dash_table, dcc, callback, Output, Input, State, html, no_update, _dash_renderer
 import pandas as pd
-import plotly.express as px
+import plotly.graph_objects as go
 import dash_mantine_components as dmc
-sys.path.append('../')
-from dask_md_objs import TaskHandler, Task, SchedulerEvent
+
+from wfmeta_dask.browser import TaskBrowser
+from wfmeta_dask.objs import Task, SchedulerEvent, WorkerEvent, WXferEvent
+from wfmeta_dask.objs.enums import EventTypeEnum, TransferTypeEnum
 
 _dash_renderer._set_react_version("18.2.0")
 
-th: TaskHandler = None
+# A task store (`wfmeta-dask -f store`) opens instantly whatever the size of the trace; tasks are read as they
+# are viewed. Pass its path as the first argument or in WFMETA_STORE.
+STORE_PATH = sys.argv[1] if len(sys.argv) > 1 else os.environ.get("WFMETA_STORE", "../../data/output.wfstore")
+PAGE_SIZE = 50
+# one bin per horizontal pixel of the timeline.
+TIMELINE_BINS = 1200
+
+
+def generate_div_from_event(ev) :
+    if isinstance(ev, SchedulerEvent) :
+        return html.Div([
+            html.Div(html.B("Scheduler Event")),
+            html.Div(f"Event time: {ev.t_event}"),
+            html.Div(f"{ev.start.value} -> {ev.finish.value} (stimulus {ev.stimulus_id})")
+        ])
+    if isinstance(ev, WorkerEvent) :
+        return html.Div([
+            html.Div(html.B("Worker Event")),
+            html.Div(f"Event time: {ev.t_event}"),
+            html.Div(f"{ev.start.value} -> {ev.finish.value} on {ev.ip}")
+        ])
+    if isinstance(ev, WXferEvent) :
+        # data flows from the requestor to the fulfiller for incoming transfers, as in transfer_matrix.
+        incoming = ev.transfer_type == TransferTypeEnum.INCOMING
+        sender, receiver = (ev.requestor, ev.fulfiller) if incoming else (ev.fulfiller, ev.requestor)
+        return html.Div([
+            html.Div(html.B("Transfer Event")),
+            html.Div(f"From {ev.start} to {ev.stop}"),
+            html.Div(f"{ev.transfer_type.value}: {ev.total} bytes from {sender} to {receiver}")
+        ])
+    return html.Div(str(ev))
+
+
+def render_task(key, task: Task) :
+    return html.Div([
+        html.H3(str(key)),
+        html.Div(f"Start: {task.t_start}, end: {task.t_end}"),
+        html.Div(f"Workers: {', '.join(str(w) for w in task.workers)}"),
+        html.Details([
+            html.Summary(f"{len(task.events)} events"),
+            html.Div([generate_div_from_event(ev) for ev in task.events])
+        ], open=True)
+    ])
 
-with open("../../data/compressed_out.pickle", 'rb') as f:
-    th = pickle.load(f)
-names = th.return_names()
-#df = pd.read_csv('https://raw.githubusercontent.com/plotly/datasets/master/gapminder_unfiltered.csv')
+
+browser = TaskBrowser(STORE_PATH, render_task)
+# names and event times are read in the background, so the page is served right away.
+browser.preload()
 
 app = Dash()
 
@@ -24,44 +68,81 @@ app.layout = dmc.MantineProvider(
         dmc.Container(
             [
             html.H1(children='DASK Metadata Collection Viewer', style={'textAlign':'center'}),
-            dcc.Dropdown(names, names[0], id='dropdown-selection'),
-            #dcc.Graph(id='graph-content'),
-            html.Details([
-                html.Summary("Label"),
-                html.Div("contents", id="TaskDisplay")
-            ])
+            dcc.Graph(id='timeline', config={'displayModeBar': False}),
+            dcc.Input(id='task-search', type='search', placeholder='Search task keys', debounce=True, value=''),
+            dash_table.DataTable(
+                id='task-table',
+                columns=[{'name': 'Task', 'id': 'key'}],
+                data=[],
+                page_current=0,
+                page_size=PAGE_SIZE,
+                page_action='custom',
+                page_count=1,
+                row_selectable='single',
+                selected_rows=[],
+            ),
+            html.Div(id='task-count'),
+            html.Div("Select a task to see its events.", id="TaskDisplay")
             ]
         )
     )
 )
 
+
 @callback(
-    Output('TaskDisplay','children'),
-    Input('dropdown-selection', 'value')
+    Output('task-table', 'page_current'),
+    Input('task-search', 'value')
 )
-def update_div(selected_task) :
-    divs = []
-    res: Task = th.get_task_by_name(selected_task)
-    for ev in res.events :
-        if isinstance(ev, SchedulerEvent) :
-            divs.append(generate_div_from_sched_event(ev))
-    
-    return divs
-
-def generate_div_from_sched_event(ev: SchedulerEvent) :
-    div = html.Div([
-        html.Div(html.B("Scheduler Event")),
-        html.Div(f"Event time: {ev.t_event}")
-    ])
-    return div
+def reset_page(text) :
+    return 0
+
+
+@callback(
+    Output('task-table', 'data'),
+    Output('task-table', 'page_count'),
+    Output('task-table', 'selected_rows'),
+    Output('task-count', 'children'),
+    Input('task-table', 'page_current'),
+    Input('task-search', 'value')
+)
+def update_table(page_current, text) :
+    page = browser.search(text or "", page_current or 0, PAGE_SIZE)
+    # keys are shown as text; the row number maps the selection back to the key.
+    data = [{'key': str(k), 'row': i} for i, k in enumerate(page.keys)]
+    return data, page.n_pages, [], f"{page.total} matching tasks"
+
+
+@callback(
+    Output('TaskDisplay', 'children'),
+    Input('task-table', 'selected_rows'),
+    State('task-table', 'page_current'),
+    State('task-search', 'value')
+)
+def update_div(selected_rows, page_current, text) :
+    if not selected_rows :
+        return no_update
+    # the search is cached, so this is the same page the table shows.
+    page = browser.search(text or "", page_current or 0, PAGE_SIZE)
+    return browser.panel(page.keys[selected_rows[0]])
+
+
+@callback(
+    Output('timeline', 'figure'),
+    Input('timeline', 'relayoutData')
+)
+def update_timeline(relayout) :
+    t_begin = t_end = None
+    if relayout and 'xaxis.range[0]' in relayout :
+        t_begin = pd.Timestamp(relayout['xaxis.range[0]']).timestamp()
+        t_end = pd.Timestamp(relayout['xaxis.range[1]']).timestamp()
+    rates = browser.event_rates(TIMELINE_BINS, t_begin, t_end)
+    centers = pd.to_datetime((rates.edges[:-1] + rates.edges[1:]) / 2, unit='s')
+    fig = go.Figure()
+    for event_type in EventTypeEnum :
+        fig.add_trace(go.Scattergl(x=centers, y=rates.counts[event_type], mode='lines', name=event_type.value))
+    fig.update_layout(yaxis_title='events per bin', uirevision='timeline')
+    return fig
 
-#@callback(
-#    Output('graph-content', 'figure'),
-#    Input('dropdown-selection', 'value')
-#)
-#def update_graph(value):
-#    dff = df[df.country==value]
-#    return px.line(dff, x='year', y='pop')
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True)
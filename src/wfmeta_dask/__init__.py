@@ -1,57 +1,57 @@
+import contextlib
 import os
 import pathlib
 import pickle
-from typing import Callable, Dict, Optional
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
 import pandas as pd
 import argparse as ap
 
 from .helpers import create_verbose_function
+from .profiling import Profiler, profiled, stage
+from .parallel import extract_parallel
+from .batch import MANIFEST_NAME, find_runs, run_batch
+from .follow import Follower
+from .sources import CsvSource, EventSource, AsyncEventSource, QueueSource, StreamSource
+from .writers import write_parquet, write_txt
+from .store import TaskStore, write_store
+from .snapshot import CODECS, load_snapshot, write_snapshot
 from .objs.enums import EventTypeEnum
 
 from .objs import TaskHandler, WXferEvent, WorkerEvent, Event
-from .objs import SchedulerEvent
+from .objs import SchedulerEvent, ColumnarTaskHandler
 
 
-def extract_metadata(filename: str, filecategory: str, debug: bool = False, th: Optional[TaskHandler] = None) -> TaskHandler:
+def extract_metadata(filename: str, filecategory: str, debug: bool = False,
+                     th: Optional[Union[TaskHandler, ColumnarTaskHandler]] = None,
+                     chunksize: Optional[int] = None) -> Union[TaskHandler, ColumnarTaskHandler]:
     """Augments the provided TaskHandler with Event objects from the provided file, such that it can create new Events or augment existing ones with new Task information.
     Note that this function modifies the provided TaskHandler itself (aka it has side effects.)
 
-    :param filename: the file to parse events from
+    :param filename: the file to parse events from, or an open binary file object positioned at its header
     :type filename: str
     :param filecategory: the type of file being provided; must be one of ["SCHED", "WXFER", "WTRANS"]
     :type filecategory: str
     :param debug: whether to print the total number of tasks created and the first task, defaults to False
     :type debug: bool, optional
     :param th: the taskhandler to augment, defaults to None. If None, creates a new :class:`~dask_md_objs.TaskHandler`.
-    :type th: :class:`~dask_md_objs.TaskHandler`, optional
+        A :class:`~dask_md_objs.ColumnarTaskHandler` may be provided instead to keep events in compact array form.
+    :type th: :class:`~dask_md_objs.TaskHandler` or :class:`~dask_md_objs.ColumnarTaskHandler`, optional
+    :param chunksize: if provided, read and ingest the file this many rows at a time instead of all at once, so that
+        peak memory depends on the chunk size rather than the file size. Defaults to None.
+    :type chunksize: int, optional
     :raises ValueError: when an invalid filecategory is provided.
     :return: The provided taskhandler (or a new TaskHandler) augmented with the new events provided.
     :rtype: :class:`~dask_md_objs.TaskHandler`
     """
-    # validate that provided filecategory is valid
-    # this is only used internally so it's okay that it's just a magic value (for now).
-    if filecategory not in ["SCHED", "WXFER", "WTRANS"]:
-        # TODO : add examples of valid filecategories.
-        raise ValueError("Invalid filecategory provided: {c}.".format(c=filecategory))
-
-    dat: pd.DataFrame = pd.read_csv(filename)
-    nrow, _ = dat.shape
+    source = CsvSource(filename, filecategory, chunksize)
 
     if th is None:
         th = TaskHandler()
 
-    # store what type constructor to use based on filecategory
-    eventtype: type = Event
-    if filecategory == "SCHED":
-        eventtype = SchedulerEvent
-    elif filecategory == "WTRANS":
-        eventtype = WorkerEvent
-    elif filecategory == "WXFER":
-        eventtype = WXferEvent
-
-    for i in range(0, nrow):
-        th.add_event(eventtype(dat.iloc(axis=0)[i]))
+    source.feed(th)
 
     if debug:
         print(len(th.tasks))
@@ -59,6 +59,142 @@ def extract_metadata(filename: str, filecategory: str, debug: bool = False, th:
 
     return th
 
+
+#: The csv files of a Mofka-Dask run directory, with the filecategory each is parsed as.
+RUN_FILES = [("scheduler_transition.csv", "SCHED"), ("worker_transfer.csv", "WXFER"), ("worker_transition.csv", "WTRANS")]
+
+
+def find_run_files(directory: str) -> List[Tuple[str, str]]:
+    """Returns the (filename, filecategory) pairs of a Mofka-Dask run directory, in the order they are extracted.
+
+    :param directory: The run directory.
+    :type directory: str
+    :raises ValueError: when the directory does not exist or one of the expected csv files is missing.
+    :return: The path and filecategory of `scheduler_transition.csv`, `worker_transfer.csv` and `worker_transition.csv`.
+    :rtype: List[Tuple[str, str]]
+    """
+    # make sure that they passed us a valid directory.
+    if not os.path.exists(directory):
+        raise ValueError("Provided directory path {path} does not exist.".format(path=directory))
+    elif not os.path.isdir(directory):
+        raise ValueError("Provided path {path} is not a directory. Please provide the path to the folder containing your Mofka-DASK output files.".format(path=directory))
+
+    # make sure all the files we expect exist.
+    files: List[Tuple[str, str]] = []
+    for name, filecategory in RUN_FILES:
+        path: str = os.path.join(directory, name)
+        if not os.path.isfile(path):
+            raise ValueError("There is no {file}.".format(file=path))
+        files.append((path, filecategory))
+    return files
+
+
+def write_output(th: Union[TaskHandler, ColumnarTaskHandler], output: pathlib.Path, form: str, jobs: int = 1,
+                 codec: str = "gzip") -> None:
+    """Writes `th` to the `output` directory in the given format (one of the `--fileformat` choices).
+
+    :param th: The TaskHandler to write out.
+    :type th: :class:`~dask_md_objs.TaskHandler` or :class:`~dask_md_objs.ColumnarTaskHandler`
+    :param output: The directory to write to.
+    :type output: pathlib.Path
+    :param form: One of "txt", "pickle", "df_csv", "parquet", "store" or "snapshot".
+    :type form: str
+    :param jobs: Number of processes formatting the "txt" output, defaults to 1
+    :type jobs: int, optional
+    :param codec: Compression of the "snapshot" output, one of :data:`~wfmeta_dask.snapshot.CODECS`. Defaults to
+        "gzip".
+    :type codec: str, optional
+    :raises ValueError: when an unknown format is provided.
+    """
+    with stage("write", form):
+        match form:
+            case "txt":
+                write_txt(th, output.joinpath("output.txt"), jobs)
+            case "pickle":
+                with open(output.joinpath("output.pickle"), 'wb') as f:
+                    pickle.dump(th, f, pickle.HIGHEST_PROTOCOL)
+            case "df_csv":
+                with stage("to_df"):
+                    dfs: Dict[EventTypeEnum, pd.DataFrame] = th.to_df()
+                for event_type, df in dfs.items():
+                    df.to_csv(output.joinpath(event_type.name + "_df.csv"))
+            case "store":
+                write_store(th, output.joinpath("output.wfstore"))
+            case "snapshot":
+                write_snapshot(th, output.joinpath("output.wfsnap"), codec)
+            case "parquet":
+                write_parquet(th, output)
+            case _:
+                raise ValueError("Unknown output format {f}.".format(f=form))
+
+
+def process_run(directory: str, output: pathlib.Path, form: str = "df_csv", jobs: int = 1, columnar: bool = False,
+                chunksize: Optional[int] = None, debug: bool = False,
+                verbose_print: Optional[Callable[[str], None]] = None, codec: str = "gzip") -> Dict[str, Any]:
+    """Extracts, sorts and writes out one Mofka-Dask run directory.
+
+    :param directory: The run directory containing the Mofka-Dask csv files.
+    :type directory: str
+    :param output: The directory to write the output files to.
+    :type output: pathlib.Path
+    :param form: The output format, see :func:`write_output`. Defaults to "df_csv".
+    :type form: str, optional
+    :param jobs: Number of processes used to parse the csv files (and to format "txt" output), defaults to 1
+    :type jobs: int, optional
+    :param columnar: Use a :class:`~dask_md_objs.ColumnarTaskHandler`, defaults to False
+    :type columnar: bool, optional
+    :param chunksize: Rows read at a time, see :func:`extract_metadata`. Defaults to None.
+    :type chunksize: int, optional
+    :param debug: passed on to :func:`extract_metadata`, defaults to False
+    :type debug: bool, optional
+    :param verbose_print: Progress printing function, defaults to None (silent).
+    :type verbose_print: Callable[[str], None], optional
+    :param codec: Compression of the "snapshot" output, see :func:`write_output`. Defaults to "gzip".
+    :type codec: str, optional
+    :raises ValueError: when the run directory is not valid.
+    :return: "rows" read per filecategory (None when parsed with several processes), number of "tasks", and "timings"
+        in seconds of the "extract", "sort" and "write" stages.
+    :rtype: Dict[str, Any]
+    """
+    if verbose_print is None:
+        verbose_print = create_verbose_function(False)
+
+    files = find_run_files(directory)
+    verbose_print("All files present and accounted for.")
+
+    # off to the races
+    t_begin = time.perf_counter()
+    th: Union[TaskHandler, ColumnarTaskHandler]
+    rows: Optional[Dict[str, int]] = None
+    if jobs > 1:
+        verbose_print("Extracting scheduler, worker transfer and worker metadata with {j} processes.".format(j=jobs))
+        with stage("extract_parallel"):
+            th = extract_parallel(files, jobs=jobs, columnar=columnar, chunksize=chunksize, sorted=True)
+    else:
+        # events are kept in time order as they are read, so the sort below has nothing left to do.
+        th = ColumnarTaskHandler(sorted=True) if columnar else TaskHandler(sorted=True)
+        rows = {}
+        for filename, filecategory in files:
+            verbose_print("Extracting metadata from {f}.".format(f=filename))
+            rows[filecategory] = CsvSource(filename, filecategory, chunksize).feed(th)
+            if debug:
+                print(len(th.tasks))
+                print(th.tasks[list(th.tasks.keys())[0]])
+    t_extracted = time.perf_counter()
+
+    verbose_print("Sorting compiled tasks.")
+    with stage("sort"):
+        th.sort_tasks_by_time()
+    t_sorted = time.perf_counter()
+
+    verbose_print("Saving {f} output.".format(f=form))
+    write_output(th, output, form, jobs, codec)
+    t_written = time.perf_counter()
+
+    return {"rows": rows, "tasks": len(th.tasks),
+            "timings": {"extract": t_extracted - t_begin, "sort": t_sorted - t_extracted, "write": t_written - t_sorted}}
+
+
 def create_parser_and_run() :
     debug = False
 
@@ -66,11 +202,35 @@ def create_parser_and_run() :
                         prog='wfmeta-dask',
                         description='Extracts metadata objects from Dask-Mofka .csv files')
     parser.add_argument('-f', '--fileformat', default="df_csv",
-                        choices=["txt", "pickle", "df_csv"],
-                        help="Output format. TXT is prettyprint output, pickle are pickled python objects, and df_csv are dataframes serialized as csv.")
+                        choices=["txt", "pickle", "df_csv", "parquet", "store", "snapshot"],
+                        help="Output format. TXT is prettyprint output, pickle are pickled python objects, df_csv are dataframes serialized as csv, parquet are dataframes with typed, dictionary-encoded columns (requires pyarrow), store is an indexed task store that can be read one task at a time, and snapshot is a compressed, versioned snapshot that load_snapshot reads back into a TaskHandler.")
     parser.add_argument('-o', '--output',
                         help="Directory to store output files in.")
+    parser.add_argument('--codec', default="gzip", choices=CODECS,
+                        help="Compression of the snapshot output. zstd requires the zstandard package.")
     parser.add_argument('--debug', action="store_true")
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help="Read the input files this many rows at a time, bounding memory use by the chunk size instead of the file size. Best combined with --columnar.")
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help="Number of processes used to parse the input files. Large files are split into row ranges across processes. With --batch, the number of runs processed at once.")
+    parser.add_argument('--columnar', action="store_true",
+                        help="Store events in compact NumPy columns instead of one Python object per event. Uses much less memory on large runs.")
+    parser.add_argument('--batch', action="store_true",
+                        help="Treat directory as a root directory (or glob) of run directories, process every run found and write each one's output to its own subdirectory of --output, along with a manifest.json.")
+    parser.add_argument('--follow', action="store_true",
+                        help="Keep following the csv files of a run that is still being written, ingesting only newly appended rows every --interval seconds and refreshing the output at most every --write-interval seconds. New rows and file offsets are checkpointed in --output, so a restarted follower resumes where it stopped.")
+    parser.add_argument('--interval', type=float, default=5.0,
+                        help="Seconds between polls in --follow mode.")
+    parser.add_argument('--write-interval', type=float, default=60.0,
+                        help="Minimum seconds between two rewrites of the output in --follow mode. Checkpoints are still written after every poll that found new rows.")
+    parser.add_argument('--idle-timeout', type=float, default=None,
+                        help="Stop --follow mode once no new rows arrived for this many seconds. Defaults to following until interrupted.")
+    parser.add_argument('--profile', default=None, metavar="FILE",
+                        help="Write a JSON report of the wall time, CPU time, rows per second and peak RSS of every pipeline stage and file category to FILE.")
+    parser.add_argument('--cprofile', default=None, metavar="FILE",
+                        help="Run cProfile over the whole run and dump its statistics to FILE, e.g. for snakeviz.")
+    parser.add_argument('--tracemalloc', action="store_true",
+                        help="With --profile, also record the peak traced Python memory of every stage and the largest allocation sites. Slows the run down considerably.")
     parser.add_argument("-v", "--verbose", action="store_true",
                         help="Verbose mode - print pretty statements through various points of the runtime.")
     parser.add_argument("directory",
@@ -81,62 +241,37 @@ def create_parser_and_run() :
 
     verbose_print: Callable[[str], None] = create_verbose_function(args.verbose)
 
-    directory = os.path.normpath(args.directory)
     output= pathlib.Path(args.output)
     debug = args.debug
     form = args.fileformat
+    chunksize: Optional[int] = args.chunksize
 
-    # make sure that they passed us a valid directory.
-    if not os.path.exists(directory):
-        raise ValueError("Provided directory path {path} does not exist.".format(path=directory))
-    elif not os.path.isdir(directory):
-        raise ValueError("Provided path {path} is not a directory. Please provide the path to the folder containing your Mofka-DASK output files.".format(path=directory))
+    if args.batch and (args.profile or args.cprofile):
+        parser.error("--profile and --cprofile profile a single run and cannot be combined with --batch.")
+    if args.tracemalloc and not args.profile:
+        parser.error("--tracemalloc requires --profile.")
 
-    # make sure all the files we expect exist.
-    sched_file: str = os.path.join(directory, "scheduler_transition.csv")
-    if not os.path.isfile(sched_file):
-        raise ValueError("There is no {file}.".format(file=sched_file))
-
-    worker_xfer_file: str = os.path.join(directory, "worker_transfer.csv")
-    if not os.path.isfile(worker_xfer_file):
-        raise ValueError("There is no {file}.".format(file=worker_xfer_file))
-
-    worker_trans_file: str = os.path.join(directory, "worker_transition.csv")
-    if not os.path.isfile(worker_trans_file):
-        raise ValueError("There is no {file}.".format(file=worker_trans_file))
-    
-    verbose_print("All files present and accounted for.")
+    if args.batch:
+        runs = find_runs(args.directory)
+        verbose_print("Found {n} run directories.".format(n=len(runs)))
+        manifest = run_batch(runs, output, form, jobs=args.jobs, columnar=args.columnar, chunksize=chunksize,
+                             verbose_print=verbose_print, codec=args.codec)
+        if manifest["n_failed"] > 0:
+            print("{f} of {n} runs failed, see {m}.".format(f=manifest["n_failed"], n=len(runs),
+                                                            m=output.joinpath(MANIFEST_NAME)))
+            sys.exit(1)
+        verbose_print("Done.")
+        return
 
-    # off to the races
-    th = TaskHandler()
-
-    verbose_print("Extracting scheduler metadata.")
-    extract_metadata(sched_file, "SCHED", debug, th)
-    verbose_print("Extracting worker transfer metadata.")
-    extract_metadata(worker_xfer_file, "WXFER", debug, th)
-    verbose_print("Extracting worker metadata.")
-    extract_metadata(worker_trans_file, "WTRANS", debug, th)
-
-    verbose_print("Sorting compiled tasks.")
-    th.sort_tasks_by_time()
-
-    match form:
-        case "txt":
-            verbose_print("Saving txt file.")
-            with open(output.joinpath("output.txt"), "w") as f:
-                keys: list[str] = list(th.tasks.keys())
-                for i in range(0, len(keys)):
-                    f.write(th.tasks[keys[i]].__str__())
-        case "pickle":
-            verbose_print("Saving pickle file of Python objects.")
-            with open(output.joinpath("output.pickle"), 'wb') as f:
-                pickle.dump(th, f, pickle.HIGHEST_PROTOCOL)
-        case "df_csv":
-            verbose_print("Saving pandas DataFrames serialized into csv files.")
-            dfs: Dict[EventTypeEnum, pd.DataFrame] = th.to_df()
-            for event_type, df in dfs.items():
-                df.to_csv(output.joinpath(event_type.name + "_df.csv"))
-        case _:
-            raise ValueError("Somehow reached an unknown point when checking the format argument.")
+    directory = os.path.normpath(args.directory)
+    # stages only cost something while a profiler is active, so only start one when a report was asked for.
+    profiling = args.profile or args.cprofile or args.tracemalloc
+    with profiled(args.profile, args.cprofile, args.tracemalloc) if profiling else contextlib.nullcontext():
+        if args.follow:
+            follower = Follower(directory, output, form, columnar=args.columnar, verbose_print=verbose_print,
+                                codec=args.codec)
+            follower.run(interval=args.interval, idle_timeout=args.idle_timeout, write_interval=args.write_interval)
+        else:
+            process_run(directory, output, form, args.jobs, args.columnar, chunksize, debug, verbose_print, args.codec)
 
     verbose_print("Done.")
\ No newline at end of file
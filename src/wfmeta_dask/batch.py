@@ -0,0 +1,172 @@
+"""Batch processing of many Mofka-Dask run directories.
+
+A campaign produces one directory per run (e.g. `D2024-04-18_15:54:02_R1_W8`). :func:`find_runs` discovers every
+run directory below a root directory or glob, and :func:`run_batch` processes them concurrently, writing each run's
+output to its own directory plus a `manifest.json` describing how every run went.
+"""
+import glob
+import json
+import os
+import pathlib
+import time
+import traceback
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Union
+
+#: Name of the manifest :func:`run_batch` writes into its output directory.
+MANIFEST_NAME = "manifest.json"
+
+
+def _is_run(directory: str) -> bool:
+    from . import RUN_FILES
+
+    return all(os.path.isfile(os.path.join(directory, name)) for name, _ in RUN_FILES)
+
+
+def _search(directory: str) -> List[str]:
+    """Returns `directory` if it is a run, otherwise every run directory below it."""
+    if _is_run(directory):
+        return [directory]
+
+    runs: List[str] = []
+    for dirpath, dirnames, _ in os.walk(directory):
+        dirnames.sort()
+        # runs are not searched for nested runs.
+        for name in list(dirnames):
+            path = os.path.join(dirpath, name)
+            if _is_run(path):
+                runs.append(path)
+                dirnames.remove(name)
+    return runs
+
+
+def find_runs(root: str) -> List[str]:
+    """Finds every valid run directory, i.e. every directory containing all three Mofka-Dask csv files.
+
+    :param root: A directory to search recursively, or a glob pattern of directories (e.g. `data/D2024-04-*`).
+        Matches of a glob that are not runs themselves are searched recursively as well.
+    :type root: str
+    :raises ValueError: when `root` is neither an existing directory nor a pattern.
+    :return: The run directories found, sorted and without duplicates.
+    :rtype: List[str]
+    """
+    if glob.has_magic(root):
+        candidates = sorted(p for p in glob.glob(root) if os.path.isdir(p))
+    elif os.path.isdir(root):
+        candidates = [root]
+    else:
+        raise ValueError("Provided path {path} is neither a directory nor a glob pattern.".format(path=root))
+
+    runs: List[str] = []
+    for candidate in candidates:
+        for run in _search(os.path.normpath(candidate)):
+            if run not in runs:
+                runs.append(run)
+    return sorted(runs)
+
+
+def _output_names(runs: List[str]) -> List[str]:
+    """Names each run's output directory after its path relative to the runs' common parent."""
+    if len(runs) == 0:
+        return []
+    base = os.path.commonpath([os.path.dirname(os.path.abspath(r)) for r in runs])
+    return [os.path.relpath(os.path.abspath(r), base) for r in runs]
+
+
+def _process_one(run: str, output: pathlib.Path, form: str, columnar: bool,
+                 chunksize: Optional[int], codec: str = "gzip") -> Dict[str, Any]:
+    from . import process_run
+
+    t_begin = time.perf_counter()
+    entry: Dict[str, Any] = {"run": run, "output": str(output), "status": "ok", "error": None,
+                             "rows": None, "tasks": None, "timings": None}
+    try:
+        output.mkdir(parents=True, exist_ok=True)
+        entry.update(process_run(run, output, form, 1, columnar, chunksize, codec=codec))
+    except Exception as e:
+        entry["status"] = "failed"
+        entry["error"] = "".join(traceback.format_exception_only(type(e), e)).strip()
+    entry["wall_time"] = time.perf_counter() - t_begin
+    return entry
+
+
+def write_manifest(manifest: Dict[str, Any], output: pathlib.Path) -> pathlib.Path:
+    """Writes the manifest returned by :func:`run_batch` as `manifest.json` into `output`."""
+    path = output.joinpath(MANIFEST_NAME)
+    # write then rename, so the manifest on disk is never half-written.
+    tmp = path.with_name(MANIFEST_NAME + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+    return path
+
+
+def run_batch(runs: List[str], output: Union[str, pathlib.Path], form: str = "df_csv", jobs: int = 1,
+              columnar: bool = False, chunksize: Optional[int] = None,
+              verbose_print: Optional[Callable[[str], None]] = None, codec: str = "gzip") -> Dict[str, Any]:
+    """Processes several run directories concurrently with :func:`~wfmeta_dask.process_run`.
+
+    Every run is written to its own subdirectory of `output`, named after the run's path relative to the runs'
+    common parent. A run that fails is recorded as such in the manifest and does not stop the others. The manifest
+    is rewritten to `output/manifest.json` every time a run finishes, so it also reports the progress of a batch.
+
+    :param runs: The run directories, e.g. from :func:`find_runs`.
+    :type runs: List[str]
+    :param output: The directory to write the per-run outputs and the manifest to.
+    :type output: str or pathlib.Path
+    :param form: The output format of every run, defaults to "df_csv"
+    :type form: str, optional
+    :param jobs: Maximum number of runs processed at the same time, defaults to 1
+    :type jobs: int, optional
+    :param columnar: Use a :class:`~dask_md_objs.ColumnarTaskHandler` for every run, defaults to False
+    :type columnar: bool, optional
+    :param chunksize: Rows read at a time, see :func:`~wfmeta_dask.extract_metadata`. Defaults to None.
+    :type chunksize: int, optional
+    :param verbose_print: Progress printing function, defaults to None (silent).
+    :type verbose_print: Callable[[str], None], optional
+    :param codec: Compression of "snapshot" outputs, see :func:`~wfmeta_dask.write_output`. Defaults to "gzip".
+    :type codec: str, optional
+    :raises ValueError: when `jobs` is not positive.
+    :return: The manifest: one entry per run (in the order of `runs`) with its "status", "error", "rows", "tasks",
+        "timings" and "wall_time", plus the number of runs that failed and the total wall time.
+    :rtype: Dict[str, Any]
+    """
+    if jobs < 1:
+        raise ValueError("jobs must be a positive number of processes, got {j}.".format(j=jobs))
+
+    output = pathlib.Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+
+    t_begin = time.perf_counter()
+    entries: List[Optional[Dict[str, Any]]] = [None] * len(runs)
+    manifest: Dict[str, Any] = {"format": form, "n_runs": len(runs), "n_failed": 0, "wall_time": 0.0, "runs": []}
+
+    def record(i: int, entry: Dict[str, Any]) -> None:
+        entries[i] = entry
+        if entry["status"] != "ok":
+            manifest["n_failed"] += 1
+        manifest["runs"] = [e for e in entries if e is not None]
+        manifest["wall_time"] = time.perf_counter() - t_begin
+        write_manifest(manifest, output)
+        if verbose_print is not None:
+            verbose_print("[{d}/{n}] {r}: {s}".format(
+                d=len(manifest["runs"]), n=len(runs), r=entry["run"], s=entry["status"]))
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures: Dict[Future, int] = {}
+        for i, (run, name) in enumerate(zip(runs, _output_names(runs))):
+            futures[pool.submit(_process_one, run, output.joinpath(name), form, columnar, chunksize, codec)] = i
+        for fut in as_completed(futures):
+            i = futures[fut]
+            try:
+                entry = fut.result()
+            except Exception as e:
+                # the worker process itself died, e.g. it ran out of memory.
+                entry = {"run": runs[i], "output": None, "status": "failed",
+                         "error": "".join(traceback.format_exception_only(type(e), e)).strip(),
+                         "rows": None, "tasks": None, "timings": None, "wall_time": None}
+            record(i, entry)
+
+    if len(runs) == 0:
+        write_manifest(manifest, output)
+    return manifest
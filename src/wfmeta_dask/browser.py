@@ -0,0 +1,237 @@
+"""Lazy data layer for interactive viewers such as the dashboard in `portal/`.
+
+A :class:`TaskBrowser` wraps a task source (a :class:`~wfmeta_dask.TaskStore`, or an in-memory handler) and only
+touches it when a view asks for something: opening a browser costs the same for any trace size. Task names are
+loaded on the first search and searched server-side, a page at a time. Rendered task panels are kept in a bounded
+LRU cache. Event rates over time are reduced to at most one bin per pixel, from sorted event times, so redrawing a
+zoomed timeline costs a few binary searches per bin.
+"""
+import collections
+import pathlib
+import threading
+from typing import Any, Callable, Dict, Hashable, List, NamedTuple, Optional, OrderedDict, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from .objs import ColumnarTaskHandler, Task, TaskHandler
+from .objs.enums import EventTypeEnum
+from .objs.query import EVENT_TYPES
+from .objs.timeindex import Time, _seconds
+from .store import TaskStore
+
+#: Number of rendered task panels a browser keeps by default.
+PANEL_CACHE_SIZE: int = 256
+#: Number of search results a browser keeps by default, so paging through them does not search again.
+SEARCH_CACHE_SIZE: int = 16
+
+Source = Union[TaskStore, TaskHandler, ColumnarTaskHandler]
+
+
+class Page(NamedTuple):
+    """One page of task keys matching a search."""
+    #: The task keys on this page.
+    keys: List[Hashable]
+    #: The page number, starting at 0.
+    page: int
+    #: The number of pages, at least 1.
+    n_pages: int
+    #: The number of matching tasks on all pages.
+    total: int
+
+
+class Rates(NamedTuple):
+    """Number of events per time bin, see :meth:`TaskBrowser.event_rates`."""
+    #: The bin edges in epoch seconds, one more than there are bins.
+    edges: np.ndarray
+    #: The number of events of every type in every bin.
+    counts: Dict[EventTypeEnum, np.ndarray]
+
+
+class TaskBrowser:
+    """Searches, pages through and renders the tasks of a source without loading all of it up front.
+
+    The source is opened, but nothing is read from it until a method needs it: the task names on the first
+    :meth:`search`, one task per :meth:`panel` that is not cached yet, and the time of every event on the first
+    :meth:`event_rates` (from the :meth:`~dask_md_objs.TaskHandler.event_index` of in-memory handlers, or the
+    :meth:`~wfmeta_dask.TaskStore.event_times` of a task store). Viewers serving several requests at once can share one browser; :meth:`preload` reads
+    the names and event times in the background so the first search and timeline do not wait for them.
+    """
+    source: Source
+
+    def __init__(self, source: Union[Source, str, pathlib.Path], render: Callable[[Hashable, Task], Any] = None,
+                 panel_cache_size: int = PANEL_CACHE_SIZE, search_cache_size: int = SEARCH_CACHE_SIZE):
+        """
+        :param source: A task handler or task store, or the path of a task store file to open.
+        :type source: TaskStore, TaskHandler, ColumnarTaskHandler, str or pathlib.Path
+        :param render: Turns a task into what :meth:`panel` returns, defaults to None (the task's text).
+        :type render: Callable[[Hashable, Task], Any], optional
+        :param panel_cache_size: Number of rendered panels to keep, defaults to :data:`PANEL_CACHE_SIZE`
+        :type panel_cache_size: int, optional
+        :param search_cache_size: Number of search results to keep, defaults to :data:`SEARCH_CACHE_SIZE`
+        :type search_cache_size: int, optional
+        :raises ValueError: when a path is given that is not a task store.
+        """
+        self.source = TaskStore(source) if isinstance(source, (str, pathlib.Path)) else source
+        self.render = render if render is not None else (lambda key, task: task.__str__())
+        self.panel_cache_size = panel_cache_size
+        self.search_cache_size = search_cache_size
+
+        self._names: Optional[pd.Series] = None
+        self._keys: Optional[np.ndarray] = None
+        self._searches: OrderedDict[str, np.ndarray] = collections.OrderedDict()
+        self._panels: OrderedDict[Hashable, Any] = collections.OrderedDict()
+        self._times: Optional[Dict[EventTypeEnum, np.ndarray]] = None
+        self._lock = threading.RLock()
+
+    def preload(self) -> threading.Thread:
+        """Starts loading the task names and event times in a background thread, and returns the thread."""
+        def load():
+            self._load_names()
+            self._load_times()
+
+        thread = threading.Thread(target=load, name="TaskBrowser.preload", daemon=True)
+        thread.start()
+        return thread
+
+    def close(self) -> None:
+        """Closes the source, if it is a task store."""
+        if isinstance(self.source, TaskStore):
+            self.source.close()
+
+    def __enter__(self) -> 'TaskBrowser':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ------------------------------------------------------------------
+    # Task lists
+
+    def _load_names(self) -> None:
+        if self._names is not None:
+            return
+        # read without the lock, so a concurrent load only costs a second read and never blocks other calls.
+        keys = self.source.return_names()
+        key_array = np.empty(len(keys), dtype=object)
+        key_array[:] = keys
+        # tuple keys are searched by their text.
+        names = pd.Series([k if type(k) is str else str(k) for k in keys], dtype="string")
+        with self._lock:
+            if self._names is None:
+                self._keys, self._names = key_array, names
+
+    def __len__(self) -> int:
+        self._load_names()
+        return len(self._keys)
+
+    def _matches(self, text: str) -> np.ndarray:
+        with self._lock:
+            if text in self._searches:
+                self._searches.move_to_end(text)
+                return self._searches[text]
+        if text == "":
+            rows = np.arange(len(self._names))
+        else:
+            rows = np.flatnonzero(self._names.str.contains(text, case=False, regex=False).to_numpy(dtype=bool))
+        with self._lock:
+            self._searches[text] = rows
+            if len(self._searches) > self.search_cache_size:
+                self._searches.popitem(last=False)
+        return rows
+
+    def search(self, text: str = "", page: int = 0, page_size: int = 50) -> Page:
+        """Returns one page of the tasks whose key contains `text`, ignoring case, in the order of the source.
+
+        :param text: The text to look for, defaults to "" (every task).
+        :type text: str, optional
+        :param page: The page to return, starting at 0; pages past the last one are empty. Defaults to 0.
+        :type page: int, optional
+        :param page_size: The number of tasks per page, defaults to 50.
+        :type page_size: int, optional
+        :raises ValueError: when `page` is negative or `page_size` is not positive.
+        :rtype: Page
+        """
+        if page < 0 or page_size < 1:
+            raise ValueError("Invalid page {p} of size {s}.".format(p=page, s=page_size))
+        self._load_names()
+        rows = self._matches(text.strip())
+        on_page = rows[page * page_size:(page + 1) * page_size]
+        return Page(list(self._keys[on_page]), page, max(1, -(-len(rows) // page_size)), len(rows))
+
+    # ------------------------------------------------------------------
+    # Task panels
+
+    def panel(self, key: Hashable) -> Any:
+        """Returns the rendered panel of the task `key`, loading and rendering it only if it is not cached.
+
+        :raises KeyError: when there is no such task.
+        """
+        with self._lock:
+            if key in self._panels:
+                self._panels.move_to_end(key)
+                return self._panels[key]
+        panel = self.render(key, self.source.get_task_by_name(key))
+        with self._lock:
+            self._panels[key] = panel
+            if len(self._panels) > self.panel_cache_size:
+                self._panels.popitem(last=False)
+        return panel
+
+    # ------------------------------------------------------------------
+    # Timelines
+
+    def _load_times(self) -> Dict[EventTypeEnum, np.ndarray]:
+        times = self._times
+        if times is not None:
+            return times
+        if isinstance(self.source, TaskStore):
+            times = self.source.event_times()
+        else:
+            index = self.source.event_index()
+            rows = index.postings["event_type"]
+            times = {t: index.t_event[rows.get(t)] for t in EVENT_TYPES}
+        with self._lock:
+            if self._times is None:
+                self._times = times
+            return self._times
+
+    def time_range(self) -> Tuple[float, float]:
+        """Returns the time of the first and last event in epoch seconds, or NaN for both if there are none."""
+        known = [t[~np.isnan(t)] for t in self._load_times().values()]
+        known = [t for t in known if len(t) > 0]
+        if len(known) == 0:
+            return np.nan, np.nan
+        return min(t[0] for t in known), max(t[-1] for t in known)
+
+    def event_rates(self, n_bins: int = 1000, t_begin: Optional[Time] = None, t_end: Optional[Time] = None) -> Rates:
+        """Counts the events of every type in `n_bins` equal bins over [t_begin, t_end].
+
+        Pass the width of the plot in pixels as `n_bins`, so no more points are drawn than can be seen; zooming in
+        with a narrower window then shows finer bins. Transfers are counted once per task they belong to.
+
+        :param n_bins: Number of bins, defaults to 1000.
+        :type n_bins: int, optional
+        :param t_begin: Start of the window as epoch seconds or `datetime`, defaults to None (the first event).
+        :type t_begin: float or datetime, optional
+        :param t_end: End of the window as epoch seconds or `datetime`, defaults to None (the last event).
+        :type t_end: float or datetime, optional
+        :raises ValueError: when `n_bins` is not positive.
+        :rtype: Rates
+        """
+        if n_bins < 1:
+            raise ValueError("n_bins must be positive, got {n}.".format(n=n_bins))
+        times = self._load_times()
+        first, last = self.time_range()
+        lo = first if t_begin is None else _seconds(t_begin)
+        hi = last if t_end is None else _seconds(t_end)
+        if np.isnan(lo) or np.isnan(hi):
+            return Rates(np.zeros(1), {t: np.zeros(0, dtype=np.int64) for t in EVENT_TYPES})
+        edges = np.linspace(lo, max(hi, lo), n_bins + 1)
+        counts = {}
+        for event_type, t in times.items():
+            # the last bin includes its right edge, like np.histogram.
+            at = np.searchsorted(t, edges, side="left")
+            at[-1] = np.searchsorted(t, edges[-1], side="right")
+            counts[event_type] = np.diff(at)
+        return Rates(edges, counts)
@@ -0,0 +1,306 @@
+"""Follow mode: incrementally ingesting the csv files of a Mofka-Dask run while they are still being written.
+
+:class:`CsvTail` remembers how far into a csv file it has read and only parses complete lines appended since.
+:class:`Follower` feeds the new rows of all three run files into a live TaskHandler that keeps every task in time
+order as they arrive, and periodically rewrites the outputs. After every poll it appends the newly ingested rows to
+a checkpoint log and records its file offsets, so that a restarted follower replays the log and picks up where the
+previous one stopped. A checkpoint costs the size of the new rows, not of the whole handler.
+"""
+import io
+import os
+import pathlib
+import pickle
+import time
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from .objs import ColumnarTaskHandler, TaskHandler
+from .profiling import stage
+from .sources import _event_type
+
+#: Name of the checkpoint file :class:`Follower` keeps in its output directory.
+CHECKPOINT_NAME = "follow_checkpoint.pickle"
+#: Name of the append-only log of ingested rows next to the checkpoint file.
+CHECKPOINT_LOG_NAME = "follow_checkpoint.log"
+#: Version of the checkpoint layout.
+CHECKPOINT_VERSION = 1
+
+
+class CsvTail:
+    """Reads the rows appended to a growing csv file, one batch of complete lines at a time.
+
+    A trailing line without its newline is left for the next read, since the writer may not have finished it.
+    Fields must not contain newlines, which holds for all files written by the Mofka-Dask coupler.
+    """
+    #: Byte offset of the first row that has not been read yet.
+    offset: int
+    #: The header line of the file, once it has been read.
+    header: Optional[bytes]
+
+    def __init__(self, filename: str, usecols: list, offset: int = 0, header: Optional[bytes] = None,
+                 max_bytes: int = 64 * 2**20):
+        """
+        :param filename: The csv file to follow. It does not need to exist yet.
+        :type filename: str
+        :param usecols: The columns to read, e.g. `SchedulerEvent.csv_columns`.
+        :type usecols: list
+        :param offset: Byte offset to resume reading from, defaults to 0 (the start of the file).
+        :type offset: int, optional
+        :param header: The header line read before `offset`, required when resuming. Defaults to None.
+        :type header: bytes, optional
+        :param max_bytes: Read at most about this many bytes per call to :meth:`read`, defaults to 64 MiB.
+        :type max_bytes: int, optional
+        """
+        if offset > 0 and header is None:
+            raise ValueError("Resuming {f} at offset {o} requires its header line.".format(f=filename, o=offset))
+        self.filename = filename
+        self.usecols = usecols
+        self.offset = offset
+        self.header = header
+        self.max_bytes = max_bytes
+        self._next_offset: Optional[int] = None
+
+    def read(self) -> Optional[pd.DataFrame]:
+        """Parses the complete lines appended after :attr:`offset`.
+
+        The offset only moves past these lines once :meth:`advance` is called, so rows that were read but never
+        ingested (e.g. because of an interruption) are read again.
+
+        :raises ValueError: when the file shrank below the offset already read, i.e. it was truncated or replaced.
+        :return: A dataframe of the new rows, or None when there are none (or the file does not exist yet).
+        :rtype: pd.DataFrame or None
+        """
+        if not os.path.isfile(self.filename):
+            return None
+
+        size = os.path.getsize(self.filename)
+        if size < self.offset:
+            raise ValueError("{f} shrank from {o} to {s} bytes while being followed.".format(
+                f=self.filename, o=self.offset, s=size))
+
+        with open(self.filename, "rb") as f:
+            if self.header is None:
+                header = f.readline()
+                if not header.endswith(b"\n"):
+                    return None
+                self.header = header
+                self.offset = f.tell()
+
+            f.seek(self.offset)
+            data = f.read(self.max_bytes)
+            end = data.rfind(b"\n")
+            while end < 0 and len(data) > 0:
+                # a single line longer than max_bytes; keep reading until it is complete.
+                more = f.read(self.max_bytes)
+                if len(more) == 0:
+                    break
+                end = more.rfind(b"\n")
+                if end >= 0:
+                    end += len(data)
+                data += more
+
+        if end < 0:
+            return None
+        df = pd.read_csv(io.BytesIO(self.header + data[:end + 1]), usecols=self.usecols)
+        self._next_offset = self.offset + end + 1
+        return df
+
+    def advance(self) -> None:
+        """Marks the rows returned by the last :meth:`read` as ingested, so the next read starts after them."""
+        if self._next_offset is not None:
+            self.offset = self._next_offset
+            self._next_offset = None
+
+
+class Follower:
+    """Keeps a TaskHandler (and its output files) up to date with a Mofka-Dask run that is still being written.
+
+    Events are merged into each task in time order as they are read, so the tasks are the same as when reading each
+    file whole and sorting afterwards, except that events with equal times keep the order they were read in.
+    """
+    th: Union[TaskHandler, ColumnarTaskHandler]
+    tails: Dict[str, CsvTail]
+
+    def __init__(self, directory: str, output: Union[str, pathlib.Path], form: str = "df_csv", columnar: bool = False,
+                 checkpoint: bool = True, verbose_print: Optional[Callable[[str], None]] = None, codec: str = "gzip"):
+        """
+        :param directory: The run directory to follow.
+        :type directory: str
+        :param output: The directory to write the output (and the checkpoint) to.
+        :type output: str or pathlib.Path
+        :param form: The output format, see :func:`~wfmeta_dask.write_output`. Defaults to "df_csv".
+        :type form: str, optional
+        :param columnar: Use a :class:`~dask_md_objs.ColumnarTaskHandler`, defaults to False. Ignored when resuming
+            from a checkpoint, which keeps the kind of handler it was written with.
+        :type columnar: bool, optional
+        :param checkpoint: Resume from and write a checkpoint in `output`, defaults to True
+        :type checkpoint: bool, optional
+        :param verbose_print: Progress printing function, defaults to None (silent).
+        :type verbose_print: Callable[[str], None], optional
+        :param codec: Compression of the "snapshot" output, see :func:`~wfmeta_dask.write_output`. Defaults to "gzip".
+        :type codec: str, optional
+        :raises ValueError: when `directory` is not a directory or the checkpoint cannot be used.
+        """
+        from . import RUN_FILES, create_verbose_function
+
+        if not os.path.isdir(directory):
+            raise ValueError("Provided path {path} is not a directory.".format(path=directory))
+
+        self.directory = directory
+        self.output = pathlib.Path(output)
+        self.form = form
+        self.codec = codec
+        self.checkpoint = checkpoint
+        self.verbose_print = verbose_print if verbose_print is not None else create_verbose_function(False)
+        self._eventtypes = {category: _event_type(category) for _, category in RUN_FILES}
+
+        self.th = ColumnarTaskHandler(sorted=True) if columnar else TaskHandler(sorted=True)
+        #: Rows ingested since the last checkpoint, in the order they were added.
+        self._pending: List[Tuple[str, pd.DataFrame]] = []
+        #: Length of the checkpoint log that the checkpoint file refers to; anything after it is discarded.
+        self._log_size = 0
+        self.tails = {category: CsvTail(os.path.join(directory, name), self._eventtypes[category].csv_columns)
+                      for name, category in RUN_FILES}
+        if checkpoint and self.checkpoint_path.is_file():
+            self._load_checkpoint()
+
+    @property
+    def checkpoint_path(self) -> pathlib.Path:
+        return self.output.joinpath(CHECKPOINT_NAME)
+
+    @property
+    def log_path(self) -> pathlib.Path:
+        return self.output.joinpath(CHECKPOINT_LOG_NAME)
+
+    def _load_checkpoint(self) -> None:
+        with open(self.checkpoint_path, "rb") as f:
+            state = pickle.load(f)
+        if state.get("version", 0) > CHECKPOINT_VERSION:
+            raise ValueError("{p} was written with checkpoint version {v}, but only versions up to {s} can be read.".format(
+                p=self.checkpoint_path, v=state.get("version"), s=CHECKPOINT_VERSION))
+        if os.path.abspath(state["directory"]) != os.path.abspath(self.directory):
+            raise ValueError("{p} belongs to a follower of {d}, not {s}.".format(
+                p=self.checkpoint_path, d=state["directory"], s=self.directory))
+
+        self.th = ColumnarTaskHandler(sorted=True) if state["columnar"] else TaskHandler(sorted=True)
+        self._log_size = state["log_size"]
+        self._replay_log()
+        for category, (offset, header) in state["offsets"].items():
+            self.tails[category].offset = offset
+            self.tails[category].header = header
+        self.verbose_print("Resumed from {p}.".format(p=self.checkpoint_path))
+
+    def _replay_log(self) -> None:
+        with stage("replay_log"), open(self.log_path, "rb") as f:
+            while f.tell() < self._log_size:
+                for category, df in pickle.load(f):
+                    self.th.add_df(self._eventtypes[category], df)
+            self.th.sort_touched_tasks()
+
+    def write_checkpoint(self) -> None:
+        """Appends the rows ingested since the last checkpoint to the log, then saves the file offsets.
+
+        The offsets are saved together with the length of the log they belong to, in one step, so the two always
+        agree: rows logged by a checkpoint that did not finish are dropped again and read anew from the run files.
+        """
+        with open(self.log_path, "ab") as f:
+            f.truncate(self._log_size)
+            if len(self._pending) > 0:
+                pickle.dump(self._pending, f, pickle.HIGHEST_PROTOCOL)
+            log_size = f.tell()
+
+        state = {"version": CHECKPOINT_VERSION, "directory": self.directory,
+                 "columnar": isinstance(self.th, ColumnarTaskHandler), "log_size": log_size,
+                 "offsets": {category: (t.offset, t.header) for category, t in self.tails.items()}}
+        tmp = self.checkpoint_path.with_name(CHECKPOINT_NAME + ".tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+        # replace the old checkpoint in one step, so a crash never leaves a half-written one behind.
+        os.replace(tmp, self.checkpoint_path)
+        self._log_size = log_size
+        self._pending = []
+
+    def poll(self) -> int:
+        """Ingests every complete row appended to the run files since the last poll, then sorts the touched tasks.
+
+        :return: The number of rows ingested.
+        :rtype: int
+        """
+        n_rows = 0
+        for category, tail in self.tails.items():
+            while True:
+                with stage("read_csv", category) as s:
+                    df = tail.read()
+                    s.rows = 0 if df is None else len(df)
+                if df is None:
+                    break
+                with stage("add_df", category, len(df)):
+                    self.th.add_df(self._eventtypes[category], df)
+                tail.advance()
+                if self.checkpoint:
+                    self._pending.append((category, df))
+                n_rows += len(df)
+        if n_rows > 0:
+            with stage("sort"):
+                self.th.sort_touched_tasks()
+        return n_rows
+
+    def refresh(self) -> None:
+        """Rewrites the outputs from the current TaskHandler and checkpoints it."""
+        from . import write_output
+
+        if len(self.th.tasks) > 0:
+            write_output(self.th, self.output, self.form, codec=self.codec)
+        if self.checkpoint:
+            self.write_checkpoint()
+
+    def run(self, interval: float = 5.0, idle_timeout: Optional[float] = None, max_polls: Optional[int] = None,
+            write_interval: float = 60.0) -> None:
+        """Polls the run files every `interval` seconds, checkpointing whenever new rows arrived, and rewrites the
+        outputs at most every `write_interval` seconds.
+
+        Rewriting the outputs costs the size of the whole handler, while a checkpoint only costs the new rows, so
+        outputs are refreshed less often than the files are polled. Runs until no rows arrived for `idle_timeout`
+        seconds, `max_polls` polls were made, or it is interrupted (e.g. with Ctrl-C); the outputs and checkpoint
+        are brought up to date before returning either way.
+
+        :param interval: Seconds between polls, defaults to 5.0
+        :type interval: float, optional
+        :param idle_timeout: Stop after this many seconds without new rows, defaults to None (never).
+        :type idle_timeout: float, optional
+        :param max_polls: Stop after this many polls, defaults to None (never).
+        :type max_polls: int, optional
+        :param write_interval: Minimum seconds between two rewrites of the outputs, defaults to 60.0
+        :type write_interval: float, optional
+        """
+        self.output.mkdir(parents=True, exist_ok=True)
+        last_data = time.monotonic()
+        last_write = None
+        polls = 0
+        refreshed = False
+        try:
+            while True:
+                n_rows = self.poll()
+                polls += 1
+                if n_rows > 0:
+                    last_data = time.monotonic()
+                    self.verbose_print("Ingested {n} new rows, {t} tasks so far.".format(n=n_rows, t=len(self.th.tasks)))
+                    refreshed = False
+                    if last_write is None or last_data - last_write >= write_interval:
+                        self.refresh()
+                        last_write = time.monotonic()
+                        refreshed = True
+                    elif self.checkpoint:
+                        self.write_checkpoint()
+                if max_polls is not None and polls >= max_polls:
+                    break
+                if idle_timeout is not None and time.monotonic() - last_data >= idle_timeout:
+                    self.verbose_print("No new rows for {s} seconds, stopping.".format(s=idle_timeout))
+                    break
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            self.verbose_print("Interrupted, writing final output.")
+            refreshed = False
+        if not refreshed:
+            self.refresh()
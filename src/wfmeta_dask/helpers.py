@@ -1,10 +1,16 @@
 """Miscellaneous helper methods to keep other mofka-dask capture methods code DRY.
 """
 
+import ast
+import re
+import time
 from datetime import datetime
-from typing import Tuple, Union
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
 
 import numpy as np
+import numpy.typing as npt
+import pandas as pd
 
 
 def generate_times(sched_entry, debug: bool = False) -> Tuple[datetime, Union[None, datetime], Union[None, datetime]]:
@@ -33,6 +39,333 @@ def generate_times(sched_entry, debug: bool = False) -> Tuple[datetime, Union[No
     return (t_event, t_begins, t_ends)
 
 
+def epoch_to_datetime64(timestamps: npt.ArrayLike) -> np.ndarray:
+    """Vectorized equivalent of calling `datetime.fromtimestamp` on every entry of an array of epoch seconds.
+
+    Timestamps are rounded to the microsecond the same way `datetime.fromtimestamp` rounds them (round-half-even on
+    the fractional part), then shifted into naive local time. NaN entries become NaT.
+
+    :param timestamps: epoch timestamps, in seconds.
+    :type timestamps: array-like of floats
+    :return: an array of naive local times with dtype `datetime64[us]`.
+    :rtype: np.ndarray
+    """
+    ts = np.asarray(timestamps, dtype=np.float64)
+    nan_mask = np.isnan(ts)
+    ts = np.where(nan_mask, 0.0, ts)
+
+    secs = np.trunc(ts)
+    usecs = np.round((ts - secs) * 1e6)
+    total_us = secs.astype(np.int64) * 1_000_000 + usecs.astype(np.int64)
+
+    # UTC offsets only change on quarter-hour boundaries, so look them up once per 15 minute bucket.
+    buckets = np.floor_divide(secs, 900).astype(np.int64)
+    first = buckets.min() if buckets.size > 0 else 0
+    if buckets.size > 0 and buckets.max() - first < 2**16:
+        # a run spans few buckets; a lookup table over their range avoids sorting every timestamp.
+        offsets = np.array([time.localtime(int(b) * 900).tm_gmtoff for b in range(first, buckets.max() + 1)],
+                           dtype=np.int64)
+        total_us += offsets[buckets - first] * 1_000_000
+    else:
+        uniq_buckets, inverse = np.unique(buckets, return_inverse=True)
+        offsets = np.array([time.localtime(int(b) * 900).tm_gmtoff for b in uniq_buckets], dtype=np.int64)
+        total_us += offsets[inverse.reshape(-1)].reshape(ts.shape) * 1_000_000
+
+    out = total_us.astype("datetime64[us]")
+    out[nan_mask] = np.datetime64("NaT")
+    return out
+
+
+def epoch_to_datetimes(timestamps: npt.ArrayLike) -> np.ndarray:
+    """Converts an array of epoch seconds into an object array of `datetime` objects, with None for NaN entries.
+
+    Each entry is identical to what `datetime.fromtimestamp` would return for it.
+
+    :param timestamps: epoch timestamps, in seconds.
+    :type timestamps: array-like of floats
+    :return: object array of `datetime` (or None) values.
+    :rtype: np.ndarray
+    """
+    return epoch_to_datetime64(timestamps).astype(object)
+
+
+#: Number of distinct `keys` strings :func:`parse_wxfer_keys` remembers.
+WXFER_KEYS_CACHE_SIZE: int = 4096
+
+_KEYS_TOKEN_RE = re.compile(r"""\s*(?:
+    (?P<str>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+  | (?P<float>[-+]?(?:\d+\.\d*|\.\d+)(?:[eE][-+]?\d+)?|[-+]?\d+[eE][-+]?\d+)
+  | (?P<int>[-+]?\d+)
+  | (?P<const>None|True|False)
+  | (?P<punct>[{}()\[\]:,])
+)""", re.VERBOSE)
+
+_CONSTANTS = {"None": None, "True": True, "False": False}
+
+
+def _tokenize_keys(text: str) -> List[Tuple[str, Any]]:
+    tokens: List[Tuple[str, Any]] = []
+    pos = 0
+    end = len(text.rstrip())
+    while pos < end:
+        m = _KEYS_TOKEN_RE.match(text, pos)
+        if m is None or m.end() == pos:
+            raise ValueError("Unexpected character at position {p} in keys string {t!r}.".format(p=pos, t=text))
+        kind = m.lastgroup
+        tok = m.group(kind)
+        if kind == "str":
+            value: Any = tok[1:-1] if "\\" not in tok else ast.literal_eval(tok)
+        elif kind == "int":
+            value = int(tok)
+        elif kind == "float":
+            value = float(tok)
+        elif kind == "const":
+            value = _CONSTANTS[tok]
+        else:
+            value = tok
+        tokens.append((kind, value))
+        pos = m.end()
+    return tokens
+
+
+class _KeysParser:
+    """Recursive-descent parser for the literals found in the `keys` column: dicts, tuples, lists, strings and numbers."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = _tokenize_keys(text)
+        self.pos = 0
+
+    def error(self, expected: str) -> ValueError:
+        found = self.tokens[self.pos][1] if self.pos < len(self.tokens) else "end of input"
+        return ValueError("Expected {e} but found {f!r} in keys string {t!r}.".format(e=expected, f=found, t=self.text))
+
+    def expect(self, punct: str) -> None:
+        if self.pos >= len(self.tokens) or self.tokens[self.pos] != ("punct", punct):
+            raise self.error(repr(punct))
+        self.pos += 1
+
+    def peek(self, punct: str) -> bool:
+        return self.pos < len(self.tokens) and self.tokens[self.pos] == ("punct", punct)
+
+    def parse(self) -> Any:
+        value = self.value()
+        if self.pos != len(self.tokens):
+            raise self.error("end of input")
+        return value
+
+    def value(self) -> Any:
+        if self.pos >= len(self.tokens):
+            raise self.error("a value")
+        kind, tok = self.tokens[self.pos]
+        if kind != "punct":
+            self.pos += 1
+            return tok
+        if tok == "{":
+            return self.mapping()
+        if tok == "(":
+            return self.sequence("(", ")", tuple)
+        if tok == "[":
+            return self.sequence("[", "]", list)
+        raise self.error("a value")
+
+    def mapping(self) -> Dict[Any, Any]:
+        self.expect("{")
+        out: Dict[Any, Any] = {}
+        while not self.peek("}"):
+            k = self.value()
+            self.expect(":")
+            out[k] = self.value()
+            if not self.peek(","):
+                break
+            self.pos += 1
+        self.expect("}")
+        return out
+
+    def sequence(self, opening: str, closing: str, kind: type) -> Any:
+        self.expect(opening)
+        items = []
+        trailing_comma = False
+        while not self.peek(closing):
+            items.append(self.value())
+            trailing_comma = self.peek(",")
+            if not trailing_comma:
+                break
+            self.pos += 1
+        self.expect(closing)
+        # "(x)" is just a parenthesized value, "(x,)" is a one element tuple.
+        if kind is tuple and len(items) == 1 and not trailing_comma:
+            return items[0]
+        return kind(items)
+
+
+@lru_cache(maxsize=WXFER_KEYS_CACHE_SIZE)
+def _parse_wxfer_keys_cached(keys: str) -> Dict[Any, int]:
+    parsed = _KeysParser(keys).parse()
+    if not isinstance(parsed, dict):
+        raise ValueError("Keys string {t!r} is not a dictionary.".format(t=keys))
+    return parsed
+
+
+def parse_wxfer_keys(keys: str) -> Dict[Any, int]:
+    """Parses the `keys` column of a worker transfer file, such as `"{('array-8838...', 120): 336}"`, into a dictionary.
+
+    Only literals are understood (dicts, tuples, lists, strings, numbers, None/True/False), so unlike `eval` no code
+    from the trace file is ever run. Transfer rows repeat the same `keys` string very often, so parsed results are
+    memoized in a bounded LRU cache of :data:`WXFER_KEYS_CACHE_SIZE` entries; each call returns a fresh copy.
+
+    :param keys: The `keys` string from a worker transfer row.
+    :type keys: str
+    :raises ValueError: when the string is not a dictionary literal.
+    :return: The mapping of task key to number of bytes transferred.
+    :rtype: Dict[Any, int]
+    """
+    return dict(_parse_wxfer_keys_cached(keys))
+
+
+_HEX_WORD_RE = re.compile(r"^[a-f0-9]{8}$")
+_TOKEN_RE = re.compile(r"^[a-f0-9]{32}$")
+
+#: Number of distinct keys :func:`key_split` remembers.
+KEY_SPLIT_CACHE_SIZE: int = 2**16
+
+
+@lru_cache(maxsize=KEY_SPLIT_CACHE_SIZE)
+def key_split(key: Any) -> str:
+    """Returns the prefix of a task key, the same way `dask.utils.key_split` does, e.g. "block-info" for
+    `"('block-info-_map_read_frame-c50155175b03e4c1ec9664317841e345', 127, 0, 0, 0)"`.
+
+    Keys are read back from the csv files as the string form of dask's tuple keys, so the leading `('` is dropped
+    like any other punctuation around the first word. Results are memoized, since the same keys come up very often.
+
+    :param key: A task key, as a string or tuple.
+    :type key: str or tuple
+    :return: The key prefix, "data" for bare tokens and "Other" for keys that can not be split.
+    :rtype: str
+    """
+    if type(key) is bytes:
+        key = key.decode()
+    if type(key) is tuple:
+        key = key[0]
+    try:
+        words = key.split("-")
+        if not words[0][0].isalpha():
+            result = words[0].split(",")[0].strip("_'()\"")
+        else:
+            result = words[0]
+        for word in words[1:]:
+            if word.isalpha() and _HEX_WORD_RE.match(word) is None:
+                result += "-" + word
+            else:
+                break
+        if _TOKEN_RE.match(result) is not None:
+            return "data"
+        if result[0] == "<":
+            result = result.strip("<>").split()[0].split(".")[-1]
+        return result
+    except Exception:
+        return "Other"
+
+
+def key_prefixes(keys: npt.ArrayLike) -> np.ndarray:
+    """Vectorized :func:`key_split` of many keys.
+
+    Stringified tuple keys only depend on their first element, so keys are first cut down to it (the text up to
+    and including its closing quote), and :func:`key_split` only runs once per distinct first element, e.g. once
+    per dask array rather than once per chunk.
+
+    :param keys: Task keys, as strings or tuples.
+    :type keys: array-like
+    :return: An object array with the prefix of every key.
+    :rtype: np.ndarray
+    """
+    heads = []
+    for k in keys:
+        if type(k) is str and k.startswith("('"):
+            end = k.find("', ")
+            if end > 0:
+                k = k[:end + 1]
+        heads.append(k)
+    codes, uniques = pd.factorize(pd.Series(heads, dtype=object), use_na_sentinel=False)
+    prefixes = np.empty(len(uniques), dtype=object)
+    prefixes[:] = [key_split(h) for h in uniques]
+    return prefixes[codes]
+
+
+_TOKEN_WORD_RE = re.compile(r"^[a-f0-9]{8,}$")
+
+#: The columns :func:`decompose_keys` adds.
+KEY_PART_COLUMNS: List[str] = ["key_name", "key_prefix", "key_token", "key_index"]
+
+
+class KeyParts(NamedTuple):
+    """The structured form of a task key, e.g. `"('block-info-_map_read_frame-c501...', 127, 0, 0, 0)"`."""
+    #: The name of the collection the key belongs to, e.g. `"block-info-_map_read_frame-c501..."`.
+    name: str
+    #: The key prefix, see :func:`key_split`, e.g. `"block-info"`.
+    prefix: str
+    #: The hex token at the end of the name, e.g. `"c501..."`, or None when it has none.
+    token: Optional[str]
+    #: The chunk indices after the name, e.g. `(127, 0, 0, 0)`; empty for keys that are not tuples.
+    index: tuple
+
+
+@lru_cache(maxsize=KEY_SPLIT_CACHE_SIZE)
+def parse_key(key: Any) -> KeyParts:
+    """Splits a task key into its name, prefix, token and chunk indices.
+
+    Keys read from the csv files are the string form of dask's tuple keys, which are parsed with the same literal
+    parser as :func:`parse_wxfer_keys`; keys already given as tuples are used as is. Results are memoized like those
+    of :func:`key_split`.
+
+    :param key: A task key, as a string or tuple.
+    :type key: str or tuple
+    :return: The parts of the key. Strings that are not tuple literals are a name without indices.
+    :rtype: KeyParts
+    """
+    if type(key) is bytes:
+        key = key.decode()
+    if type(key) is str and key.startswith("("):
+        try:
+            parsed = _KeysParser(key).parse()
+        except ValueError:
+            parsed = None
+        if type(parsed) is tuple and len(parsed) > 0:
+            key = parsed
+    if type(key) is tuple and len(key) > 0:
+        name, index = str(key[0]), tuple(key[1:])
+    else:
+        name, index = str(key), ()
+
+    last = name.rsplit("-", 1)[-1]
+    token = last if _TOKEN_WORD_RE.match(last) is not None else None
+    return KeyParts(name, key_split(name), token, index)
+
+
+def decompose_keys(keys: npt.ArrayLike) -> pd.DataFrame:
+    """Vectorized :func:`parse_key`, as categorical columns that group by collection, prefix or chunk cheaply.
+
+    Every distinct key is only parsed once.
+
+    :param keys: Task keys, as strings or tuples.
+    :type keys: array-like
+    :return: One row per key, with the columns of :data:`KEY_PART_COLUMNS`. Categories are in order of first
+        appearance, and keys without a token have a missing "key_token".
+    :rtype: pd.DataFrame
+    """
+    codes, uniques = pd.factorize(pd.Series(list(keys), dtype=object), use_na_sentinel=False)
+    parts = [parse_key(u) for u in uniques]
+
+    out = {}
+    for column, field in zip(KEY_PART_COLUMNS, KeyParts._fields):
+        values = np.empty(len(parts), dtype=object)
+        values[:] = [getattr(p, field) for p in parts]
+        part_codes, categories = pd.factorize(pd.Series(values, dtype=object))
+        out[column] = pd.Categorical.from_codes(part_codes[codes] if len(codes) > 0 else codes,
+                                                categories=pd.Index(categories, dtype=object))
+    return pd.DataFrame(out)
+
+
 def create_verbose_function(verbose: bool = False):
     if verbose:
         def y(message: str):
@@ -1,6 +1,9 @@
 from .enums import TaskState, TransferTypeEnum
 from .events import Event, TaskEvent, WXferEvent, WorkerEvent, SchedulerEvent
 from .tasks import Task, TaskHandler
+from .columnar import ColumnarTaskHandler
+from .timeindex import TimeIndex
+from .query import EventIndex, Query
 
 # if you only need to expose a certain subset of all the objects to the outside
 # __all__ = ["enums", "events", "tasks"]
@@ -0,0 +1,776 @@
+"""Array-backed alternative to :class:`~dask_md_objs.TaskHandler`.
+
+Events are kept as struct-of-arrays (one NumPy column per field) instead of one Python object per event,
+with task keys, IP addresses and other repeated strings dictionary-encoded into integer codes.
+:class:`~dask_md_objs.Task` and Event objects are only built when they are asked for.
+"""
+from collections.abc import Mapping
+from typing import Any, Dict, Hashable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+from ..helpers import decompose_keys, epoch_to_datetime64, parse_wxfer_keys
+from . import metrics
+from . import transfers as wxfers
+from .enums import EventTypeEnum, TaskState, TransferTypeEnum
+from .events import (STATE_CATEGORIES, TRANSFER_CATEGORIES, Event, SchedulerEvent, WorkerEvent, WXferEvent, _epoch,
+                     _epoch_column)
+from .tasks import Task
+from .query import STATE_CODES, STATES, EventIndex, Query
+from .timeindex import TimeIndex
+
+#: Integer code of every :class:`~dask_md_objs.TransferTypeEnum`, in declaration order.
+TRANSFER_TYPES: List[TransferTypeEnum] = list(TransferTypeEnum)
+_TRANSFER_CODES: Dict[TransferTypeEnum, int] = {t: i for i, t in enumerate(TRANSFER_TYPES)}
+
+
+class _Dictionary:
+    """Dictionary encoder mapping arbitrary hashable values to dense integer codes, in order of first appearance."""
+    values: List[Hashable]
+    index: Dict[Hashable, int]
+
+    def __init__(self):
+        self.values = []
+        self.index = {}
+        self._lookup: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def encode_one(self, value: Hashable) -> int:
+        code = self.index.get(value)
+        if code is None:
+            code = len(self.values)
+            self.index[value] = code
+            self.values.append(value)
+        return code
+
+    def encode(self, column: npt.ArrayLike) -> np.ndarray:
+        """Encodes a whole column, only touching the Python dictionary once per distinct value."""
+        codes, uniques = pd.factorize(pd.Series(column, dtype=object), use_na_sentinel=False)
+        mapping = np.fromiter((self.encode_one(u) for u in uniques), dtype=np.int32, count=len(uniques))
+        return mapping[codes]
+
+    def decode(self, codes: npt.ArrayLike) -> np.ndarray:
+        # values are only ever appended, so the lookup array only has to be rebuilt after new values came in.
+        if self._lookup is None or len(self._lookup) != len(self.values):
+            self._lookup = np.empty(len(self.values), dtype=object)
+            self._lookup[:] = self.values
+        return self._lookup[np.asarray(codes, dtype=np.intp)]
+
+
+def _encode_enum(column: pd.Series, enum_type: type, codes: Dict[Any, int]) -> np.ndarray:
+    col_codes, uniques = pd.factorize(column, use_na_sentinel=False)
+    mapping = np.array([codes[enum_type(u)] for u in uniques], dtype=np.int8)
+    return mapping[col_codes]
+
+
+class _ColumnTable:
+    """A growable struct-of-arrays table: appended column blocks are only concatenated when a column is read."""
+    dtypes: Dict[str, np.dtype]
+
+    def __init__(self, dtypes: Dict[str, Any]):
+        self.dtypes = {name: np.dtype(d) for name, d in dtypes.items()}
+        self._chunks: Dict[str, List[np.ndarray]] = {name: [] for name in self.dtypes}
+        self._n = 0
+
+    def __len__(self) -> int:
+        return self._n
+
+    def append(self, columns: Dict[str, npt.ArrayLike]) -> None:
+        n: Optional[int] = None
+        for name, dtype in self.dtypes.items():
+            arr = np.asarray(columns[name], dtype=dtype)
+            if n is None:
+                n = len(arr)
+            elif len(arr) != n:
+                raise ValueError("Column {c} has {a} rows, expected {n}.".format(c=name, a=len(arr), n=n))
+            self._chunks[name].append(arr)
+        self._n += n or 0
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        chunks = self._chunks[name]
+        if len(chunks) != 1:
+            merged = np.concatenate(chunks) if chunks else np.empty(0, dtype=self.dtypes[name])
+            self._chunks[name] = [merged]
+        return self._chunks[name][0]
+
+
+_SCHED_COLUMNS = {"task": np.int32, "seq": np.int64, "t_event": np.float64, "t_begins": np.float64,
+                  "t_ends": np.float64, "start": np.int8, "finish": np.int8, "ip": np.int32, "stimulus_id": np.int32}
+_WORKER_COLUMNS = {"task": np.int32, "seq": np.int64, "t_event": np.float64, "start": np.int8, "finish": np.int8,
+                   "ip": np.int32}
+_WXFER_COLUMNS = {"start": np.float64, "stop": np.float64, "middle": np.float64, "t_event": np.float64,
+                  "duration": np.float64, "total": np.int64, "bandwidth": np.float64, "compressed": np.float64,
+                  "requestor": np.int32, "fulfiller": np.int32, "transfer_type": np.int8, "keys": np.int32}
+_IDENTITY_DTYPE = np.dtype([("start", np.float64), ("stop", np.float64), ("middle", np.float64),
+                            ("duration", np.float64), ("keyset", np.int64), ("total", np.int64),
+                            ("bandwidth", np.float64), ("transfer_type", np.int8), ("t_event", np.float64),
+                            ("requestor", np.int32), ("fulfiller", np.int32), ("compressed", np.float64)])
+#: One row per (transfer event, task) pair, since a transfer can move several tasks' data.
+_LINK_COLUMNS = {"xfer": np.int64, "task": np.int32, "seq": np.int64}
+
+
+class _TaskView(Mapping):
+    """Read-only mapping of task key to :class:`~dask_md_objs.Task`, building each Task on access."""
+
+    def __init__(self, handler: 'ColumnarTaskHandler'):
+        self._handler = handler
+
+    def __getitem__(self, key: Hashable) -> Task:
+        return self._handler.get_task_by_name(key)
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self._handler._keys.values)
+
+    def __len__(self) -> int:
+        return len(self._handler._keys)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._handler._keys.index
+
+
+class ColumnarTaskHandler:
+    """A :class:`~dask_md_objs.TaskHandler` that stores events as NumPy columns rather than Python objects.
+
+    Tasks are identified by dictionary-encoded keys, and every event row records its task code and a global
+    insertion sequence number so the per-task event order of :class:`~dask_md_objs.TaskHandler` can be
+    reproduced. :attr:`tasks` and :meth:`get_task_by_name` hand out freshly built :class:`~dask_md_objs.Task`
+    objects; modifying them does not modify the handler.
+    """
+    #: Whether every task's events are listed in time order, see :meth:`sort_tasks_by_time`.
+    sorted: bool = False
+
+    def __init__(self, sorted: bool = False):
+        """
+        :param sorted: List the events of every task in time order from the start, so no separate sort is needed
+            before writing output. Defaults to False, which lists events in the order they were added until
+            :meth:`sort_tasks_by_time` is called.
+        :type sorted: bool, optional
+        """
+        self.sorted = sorted
+        self._keys = _Dictionary()
+        self._ips = _Dictionary()
+        self._stimulus_ids = _Dictionary()
+        #: Raw `keys` strings of transfer events, with their parsed form cached alongside.
+        self._xfer_keys = _Dictionary()
+        self._xfer_keys_parsed: List[Dict[Any, int]] = []
+
+        # per-task attributes, indexed by task code
+        self._task_name = np.empty(0, dtype=np.int32)
+        self._t_start = np.empty(0, dtype=np.float64)
+        self._t_end = np.empty(0, dtype=np.float64)
+
+        self._sched = _ColumnTable(_SCHED_COLUMNS)
+        self._worker = _ColumnTable(_WORKER_COLUMNS)
+        self._wxfer = _ColumnTable(_WXFER_COLUMNS)
+        self._links = _ColumnTable(_LINK_COLUMNS)
+
+        #: Identity of every stored transfer event, for deduplication.
+        self._xfer_ids: Dict[bytes, int] = {}
+        self._keysets = _Dictionary()
+        # per IP code whether it is NaN, and per `keys` code its keyset code; grown as new codes come in.
+        self._ip_is_nan = np.empty(0, dtype=bool)
+        self._keyset_codes = np.empty(0, dtype=np.int64)
+        self._next_seq = 0
+        #: Events with a sequence number below this are ordered by time, unless the handler is :attr:`sorted`.
+        self._sorted_upto = 0
+        self._row_index: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._time_index: Optional[TimeIndex] = None
+        self._event_index: Optional[EventIndex] = None
+
+    def __getstate__(self) -> Dict:
+        # the event index refers back to the handler and is cheap to rebuild, so it is not pickled.
+        state = self.__dict__.copy()
+        state["_event_index"] = None
+        return state
+
+    @property
+    def tasks(self) -> Mapping:
+        return _TaskView(self)
+
+    # ------------------------------------------------------------------
+    # Ingestion
+
+    def _take_seq(self, n: int) -> np.ndarray:
+        seq = np.arange(self._next_seq, self._next_seq + n, dtype=np.int64)
+        self._next_seq += n
+        return seq
+
+    def _new_tasks(self, task_codes: np.ndarray, names: np.ndarray) -> None:
+        """Grows the per-task arrays to cover `task_codes`, naming newly seen tasks."""
+        n_old = len(self._task_name)
+        n_new = len(self._keys)
+        if n_new == n_old:
+            return
+
+        new_names = np.empty(n_new - n_old, dtype=np.int32)
+        fresh = task_codes >= n_old
+        # the first row that mentions a task decides its name, same as Task.__init__.
+        first_rows = np.unique(task_codes[fresh], return_index=True)
+        new_names[first_rows[0] - n_old] = names[fresh][first_rows[1]]
+
+        self._task_name = np.concatenate((self._task_name, new_names))
+        self._t_start = np.concatenate((self._t_start, np.full(n_new - n_old, np.nan)))
+        self._t_end = np.concatenate((self._t_end, np.full(n_new - n_old, np.nan)))
+
+    def _invalidate(self) -> None:
+        self._row_index = {}
+        self._time_index: Optional[TimeIndex] = None
+        self._event_index: Optional[EventIndex] = None
+
+    def add_df(self, eventtype: type, data: pd.DataFrame) -> None:
+        """Adds one event of type `eventtype` per row of the provided dataframe, without creating Event objects.
+
+        :param eventtype: One of :class:`SchedulerEvent`, :class:`WorkerEvent` or :class:`WXferEvent`.
+        :type eventtype: type
+        :param data: The dataframe read from the corresponding Mofka-Dask csv file.
+        :type data: pd.DataFrame
+        """
+        if len(data) == 0:
+            return
+
+        if eventtype is SchedulerEvent:
+            keys = [str(v) for v in data["key"].to_numpy(dtype=object)]
+            task = self._keys.encode(keys)
+            self._new_tasks(task, task)
+            t_begins = data["begins"].to_numpy(dtype=np.float64)
+            t_ends = data["ends"].to_numpy(dtype=np.float64)
+            self._sched.append({
+                "task": task,
+                "seq": self._take_seq(len(data)),
+                "t_event": data["time"].to_numpy(dtype=np.float64),
+                "t_begins": t_begins,
+                "t_ends": t_ends,
+                "start": _encode_enum(data["start"], TaskState, STATE_CODES),
+                "finish": _encode_enum(data["finish"], TaskState, STATE_CODES),
+                "ip": self._ips.encode([str(v) for v in data["called_from"].to_numpy(dtype=object)]),
+                "stimulus_id": self._stimulus_ids.encode([str(v) for v in data["stimulus_id"].to_numpy(dtype=object)]),
+            })
+            # Task.add_scheduler_event keeps the smallest begin and the smallest end time.
+            np.fmin.at(self._t_start, task, t_begins)
+            np.fmin.at(self._t_end, task, t_ends)
+        elif eventtype is WorkerEvent:
+            task = self._keys.encode(data["key"].to_numpy(dtype=object))
+            self._new_tasks(task, task)
+            self._worker.append({
+                "task": task,
+                "seq": self._take_seq(len(data)),
+                "t_event": data["time"].to_numpy(dtype=np.float64),
+                "start": _encode_enum(data["start"], TaskState, STATE_CODES),
+                "finish": _encode_enum(data["finish"], TaskState, STATE_CODES),
+                "ip": self._ips.encode(data["called_from"].to_numpy(dtype=object)),
+            })
+        elif eventtype is WXferEvent:
+            self._add_wxfer_df(data)
+        else:
+            raise NotImplementedError("Unknown type handed to ColumnarTaskHandler.")
+
+        self._invalidate()
+
+    def _parsed_keys(self, code: int) -> Dict[Any, int]:
+        while len(self._xfer_keys_parsed) < len(self._xfer_keys):
+            self._xfer_keys_parsed.append(parse_wxfer_keys(self._xfer_keys.values[len(self._xfer_keys_parsed)]))
+        return self._xfer_keys_parsed[code]
+
+    def _add_wxfer_df(self, data: pd.DataFrame) -> None:
+        cols: Dict[str, np.ndarray] = {
+            "start": data["start"].to_numpy(dtype=np.float64),
+            "stop": data["stop"].to_numpy(dtype=np.float64),
+            "middle": data["middle"].to_numpy(dtype=np.float64),
+            "t_event": data["time"].to_numpy(dtype=np.float64),
+            "duration": data["duration"].to_numpy(dtype=np.float64),
+            "total": data["total"].to_numpy(dtype=np.int64),
+            "bandwidth": data["bandwidth"].to_numpy(dtype=np.float64),
+            "compressed": data["compressed"].to_numpy(dtype=np.float64),
+            "requestor": self._ips.encode(data["who"].to_numpy(dtype=object)),
+            "fulfiller": self._ips.encode(data["called_from"].to_numpy(dtype=object)),
+            "transfer_type": _encode_enum(data["type"], TransferTypeEnum, _TRANSFER_CODES),
+            "keys": self._xfer_keys.encode(data["keys"].to_numpy(dtype=object)),
+        }
+        self._append_wxfer(cols)
+
+    def _register_wxfer(self, cols: Dict[str, np.ndarray]) -> np.ndarray:
+        """Appends the transfer events in `cols` that are not already stored.
+
+        :return: for every input row, the row it was stored at in the transfer table, or -1 if it was a duplicate.
+        :rtype: np.ndarray
+        """
+        # Events that compare unequal to themselves (NaN fields) can never be deduplicated by WXferEvent.__eq__.
+        # Missing times are the exception: WXferEvent._times compares them equal, so they are packed as one NaN.
+        outgoing = cols["transfer_type"] == _TRANSFER_CODES[TransferTypeEnum.OUTGOING]
+        undedupable = np.isnan(cols["duration"]) | np.isnan(cols["bandwidth"]) | \
+            (outgoing & np.isnan(cols["compressed"]))
+        n_known = len(self._ip_is_nan)
+        if n_known < len(self._ips):
+            new_ips = self._ips.values[n_known:]
+            self._ip_is_nan = np.concatenate((self._ip_is_nan, np.array([v != v for v in new_ips], dtype=bool)))
+        undedupable |= self._ip_is_nan[cols["requestor"]] | self._ip_is_nan[cols["fulfiller"]]
+
+        # parsed keys are compared as dicts, so two spellings of the same mapping are the same event.
+        n_known = len(self._keyset_codes)
+        if n_known < len(self._xfer_keys):
+            new_keysets = np.fromiter((self._keysets.encode_one(frozenset(self._parsed_keys(c).items()))
+                                       for c in range(n_known, len(self._xfer_keys))),
+                                      dtype=np.int64, count=len(self._xfer_keys) - n_known)
+            self._keyset_codes = np.concatenate((self._keyset_codes, new_keysets))
+        keysets = self._keyset_codes
+
+        # Pack the fields WXferEvent.__eq__ compares into one fixed-width byte string per row.
+        identity = np.empty(len(cols["start"]), dtype=_IDENTITY_DTYPE)
+        for name in ("start", "stop", "middle", "duration", "total", "bandwidth", "transfer_type", "t_event",
+                     "requestor", "fulfiller"):
+            identity[name] = cols[name]
+        identity["keyset"] = keysets[cols["keys"]]
+        identity["compressed"] = np.where(outgoing, cols["compressed"], 0.0)
+        for name in ("start", "stop", "middle", "duration", "bandwidth", "t_event", "compressed"):
+            identity[name] += 0.0  # -0.0 == 0.0 but packs differently
+        for name in ("start", "stop", "middle", "t_event"):
+            # NaNs with a different sign or payload would pack differently too.
+            identity[name][np.isnan(identity[name])] = np.nan
+        identities = identity.view("V{n}".format(n=_IDENTITY_DTYPE.itemsize)).tolist()
+
+        stored_at = np.full(len(identities), -1, dtype=np.int64)
+        next_row = len(self._wxfer)
+        for i, (ident, nodedup) in enumerate(zip(identities, undedupable.tolist())):
+            if not nodedup:
+                if ident in self._xfer_ids:
+                    continue
+                self._xfer_ids[ident] = next_row
+            stored_at[i] = next_row
+            next_row += 1
+
+        keep = stored_at >= 0
+        self._wxfer.append({name: col[keep] for name, col in cols.items()})
+        return stored_at
+
+    def _append_wxfer(self, cols: Dict[str, np.ndarray]) -> None:
+        stored_at = self._register_wxfer(cols)
+
+        link_xfer: List[int] = []
+        link_key: List[Hashable] = []
+        link_name: List[Hashable] = []
+        for xfer, keys_code in zip(stored_at.tolist(), cols["keys"].tolist()):
+            if xfer < 0:
+                continue
+            task_keys = list(self._parsed_keys(keys_code).keys())
+            for k in task_keys:
+                link_xfer.append(xfer)
+                link_key.append(k)
+                link_name.append(task_keys[0])
+
+        key_arr = np.empty(len(link_key), dtype=object)
+        key_arr[:] = link_key
+        name_arr = np.empty(len(link_name), dtype=object)
+        name_arr[:] = link_name
+        task = self._keys.encode(key_arr)
+        self._new_tasks(task, self._keys.encode(name_arr))
+        self._links.append({
+            "xfer": link_xfer,
+            "task": task,
+            "seq": self._take_seq(len(link_xfer)),
+        })
+
+    def merge(self, other: 'ColumnarTaskHandler') -> None:
+        """Adds every event of `other` to this handler, as if they had been added after this handler's own events.
+
+        Dictionary codes of `other` are translated into this handler's codes, duplicate transfer events are
+        dropped and task start/end times are reconciled, matching :meth:`TaskHandler.merge`.
+
+        :param other: The handler whose events come after this one's.
+        :type other: ColumnarTaskHandler
+        """
+        key_map = self._keys.encode(other._keys.values)
+        ip_map = self._ips.encode(other._ips.values)
+        stim_map = self._stimulus_ids.encode(other._stimulus_ids.values)
+        xkeys_map = self._xfer_keys.encode(other._xfer_keys.values)
+
+        self._new_tasks(key_map, key_map[other._task_name])
+        np.fmin.at(self._t_start, key_map, other._t_start)
+        np.fmin.at(self._t_end, key_map, other._t_end)
+
+        # Renumber other's events in its own per-task event order, after everything already stored here.
+        tables = [(other._sched, other._sched["t_event"]), (other._worker, other._worker["t_event"]),
+                  (other._links, other._wxfer["t_event"][other._links["xfer"]])]
+        seq = np.concatenate([t["seq"] for t, _ in tables])
+        t_event = np.concatenate([te for _, te in tables])
+        unsorted = other._unsorted(seq)
+        order = np.lexsort((seq, np.where(unsorted, 0.0, t_event), unsorted))
+        new_seq = np.empty(len(order), dtype=np.int64)
+        new_seq[order] = self._take_seq(len(order))
+        n_sched, n_worker = len(other._sched), len(other._worker)
+
+        sched = {name: other._sched[name] for name in _SCHED_COLUMNS}
+        sched["task"] = key_map[sched["task"]]
+        sched["seq"] = new_seq[:n_sched]
+        sched["ip"] = ip_map[sched["ip"]]
+        sched["stimulus_id"] = stim_map[sched["stimulus_id"]]
+        self._sched.append(sched)
+
+        worker = {name: other._worker[name] for name in _WORKER_COLUMNS}
+        worker["task"] = key_map[worker["task"]]
+        worker["seq"] = new_seq[n_sched:n_sched + n_worker]
+        worker["ip"] = ip_map[worker["ip"]]
+        self._worker.append(worker)
+
+        wxfer = {name: other._wxfer[name] for name in _WXFER_COLUMNS}
+        wxfer["requestor"] = ip_map[wxfer["requestor"]]
+        wxfer["fulfiller"] = ip_map[wxfer["fulfiller"]]
+        wxfer["keys"] = xkeys_map[wxfer["keys"]]
+        stored_at = self._register_wxfer(wxfer)
+
+        link_xfer = stored_at[other._links["xfer"]]
+        kept = link_xfer >= 0
+        self._links.append({
+            "xfer": link_xfer[kept],
+            "task": key_map[other._links["task"]][kept],
+            "seq": new_seq[n_sched + n_worker:][kept],
+        })
+        self._invalidate()
+
+    def add_event(self, event: Event) -> None:
+        """Adds a single Event object. Prefer :meth:`add_df` when ingesting whole files."""
+        if type(event) is SchedulerEvent:
+            row = {"key": [event.key], "time": [event._t_event], "begins": [event._t_begins], "ends": [event._t_ends],
+                   "start": [event.start.value], "finish": [event.finish.value],
+                   "called_from": [event.ip], "stimulus_id": [event.stimulus_id]}
+        elif type(event) is WorkerEvent:
+            row = {"key": [event.key], "time": [event._t_event], "start": [event.start.value],
+                   "finish": [event.finish.value], "called_from": [event.ip]}
+        elif type(event) is WXferEvent:
+            row = {"start": [event._start], "stop": [event._stop], "middle": [event._middle], "time": [event._t_event],
+                   "duration": [event.duration], "keys": [repr(event.keys)], "total": [event.total],
+                   "bandwidth": [event.bandwidth], "compressed": [event.compressed], "who": [event.requestor],
+                   "called_from": [event.fulfiller], "type": [event.transfer_type.value]}
+        else:
+            raise NotImplementedError("Unknown type handed to ColumnarTaskHandler.")
+
+        self.add_df(type(event), pd.DataFrame(row))
+
+    # ------------------------------------------------------------------
+    # Lookup
+
+    def _rows_of(self, table_name: str, task_code: int) -> np.ndarray:
+        """Returns the row numbers of `table_name` that belong to `task_code`, via a cached CSR index."""
+        if table_name not in self._row_index:
+            table: _ColumnTable = getattr(self, table_name)
+            order = np.argsort(table["task"], kind="stable")
+            offsets = np.searchsorted(table["task"][order], np.arange(len(self._keys) + 1))
+            self._row_index[table_name] = (order, offsets)
+
+        order, offsets = self._row_index[table_name]
+        return order[offsets[task_code]:offsets[task_code + 1]]
+
+    def return_names(self) -> List[Hashable]:
+        return list(self._keys.values)
+
+    def _make_sched_events(self, rows: np.ndarray) -> List[SchedulerEvent]:
+        t = self._sched
+        out = []
+        for t_event, t_begins, t_ends, start, finish, ip, stim, task in zip(
+                _epoch_column(t["t_event"][rows]), _epoch_column(t["t_begins"][rows]), _epoch_column(t["t_ends"][rows]),
+                t["start"][rows], t["finish"][rows],
+                self._ips.decode(t["ip"][rows]), self._stimulus_ids.decode(t["stimulus_id"][rows]),
+                self._keys.decode(t["task"][rows])):
+            e = SchedulerEvent.__new__(SchedulerEvent)
+            e._t_event, e._t_begins, e._t_ends = t_event, t_begins, t_ends
+            e.start, e.finish = STATES[start], STATES[finish]
+            e.ip, e.stimulus_id, e.key = ip, stim, task
+            out.append(e)
+        return out
+
+    def _make_worker_events(self, rows: np.ndarray) -> List[WorkerEvent]:
+        t = self._worker
+        out = []
+        for t_event, start, finish, ip, task in zip(
+                _epoch_column(t["t_event"][rows]), t["start"][rows], t["finish"][rows],
+                self._ips.decode(t["ip"][rows]), self._keys.decode(t["task"][rows])):
+            e = WorkerEvent.__new__(WorkerEvent)
+            e.start, e.finish = STATES[start], STATES[finish]
+            e.ip, e._t_event, e.key = ip, t_event, task
+            out.append(e)
+        return out
+
+    def _make_wxfer_events(self, xfers: np.ndarray) -> List[WXferEvent]:
+        t = self._wxfer
+        out = []
+        for start, stop, middle, t_event, duration, total, bandwidth, compressed, req, ful, ttype, keys in zip(
+                _epoch_column(t["start"][xfers]), _epoch_column(t["stop"][xfers]), _epoch_column(t["middle"][xfers]),
+                _epoch_column(t["t_event"][xfers]),
+                t["duration"][xfers], t["total"][xfers], t["bandwidth"][xfers], t["compressed"][xfers],
+                self._ips.decode(t["requestor"][xfers]), self._ips.decode(t["fulfiller"][xfers]),
+                t["transfer_type"][xfers], t["keys"][xfers]):
+            e = WXferEvent.__new__(WXferEvent)
+            e._start, e._stop, e._middle, e._t_event = start, stop, middle, t_event
+            e.duration, e.total, e.bandwidth, e.compressed = duration, total, bandwidth, compressed
+            e.requestor, e.fulfiller = req, ful
+            e.transfer_type = TRANSFER_TYPES[ttype]
+            e.keys = dict(self._parsed_keys(keys))
+            out.append(e)
+        return out
+
+    def get_task_by_name(self, taskname: Hashable) -> Task:
+        """Builds the :class:`~dask_md_objs.Task` stored under `taskname`, with its events in insertion order."""
+        code = self._keys.index[taskname]
+
+        sched_rows = self._rows_of("_sched", code)
+        worker_rows = self._rows_of("_worker", code)
+        link_rows = self._rows_of("_links", code)
+        xfer_rows = self._links["xfer"][link_rows]
+
+        events: List[Event] = self._make_sched_events(sched_rows) + self._make_worker_events(worker_rows) + \
+            self._make_wxfer_events(xfer_rows)
+        seqs = np.concatenate((self._sched["seq"][sched_rows], self._worker["seq"][worker_rows],
+                               self._links["seq"][link_rows]))
+        t_events = np.concatenate((self._sched["t_event"][sched_rows], self._worker["t_event"][worker_rows],
+                                   self._wxfer["t_event"][xfer_rows]))
+        insertion_order = np.argsort(seqs, kind="stable")
+        unsorted = self._unsorted(seqs)
+        order = np.lexsort((seqs, np.where(unsorted, 0.0, t_events), unsorted))
+
+        task = Task(None)
+        task.name = self._keys.values[self._task_name[code]]
+        task.initiated = True
+        task.events = [events[i] for i in order]
+        # workers are recorded in the order their events arrived, regardless of sorting.
+        for e in (events[i] for i in insertion_order):
+            if isinstance(e, WXferEvent):
+                task.workers[e.requestor] = None
+                task.workers[e.fulfiller] = None
+            elif isinstance(e, WorkerEvent):
+                task.workers[e.ip] = None
+
+        task._t_start = _epoch(self._t_start[code])
+        task._t_end = _epoch(self._t_end[code])
+        return task
+
+    def _get_arbitrary_task(self) -> Task:
+        return self.get_task_by_name(self._keys.values[0])
+
+    def _unique_xfers(self) -> np.ndarray:
+        """Rows of the transfer table in the order :meth:`TaskHandler.return_all_wxfer_events` lists the events."""
+        xfers = self._links["xfer"][self._event_order("_links")]
+        _, first = np.unique(xfers, return_index=True)
+        return xfers[np.sort(first)]
+
+    def return_all_wxfer_events(self, filter_type: Optional[TransferTypeEnum] = None) -> List[WXferEvent]:
+        xfers = self._unique_xfers()
+        if filter_type is not None:
+            xfers = xfers[self._wxfer["transfer_type"][xfers] == _TRANSFER_CODES[filter_type]]
+        return self._make_wxfer_events(xfers)
+
+    # ------------------------------------------------------------------
+    # Ordering and output
+
+    def sort_tasks_by_time(self) -> None:
+        """Orders every task's events by event time, keeping insertion order between equal times.
+
+        Nothing is moved: the handler is marked :attr:`sorted`, and every output orders the events of a task with
+        one global sort on (task, time, sequence number). Events added afterwards are ordered by time as well, like
+        :meth:`TaskHandler.sort_tasks_by_time <dask_md_objs.TaskHandler.sort_tasks_by_time>` does.
+        """
+        self.sorted = True
+        self._sorted_upto = self._next_seq
+        self._invalidate()
+
+    def sort_touched_tasks(self) -> None:
+        """Same as :meth:`sort_tasks_by_time`, which already only has to consider events added since the last sort."""
+        self.sort_tasks_by_time()
+
+    def _unsorted(self, seq: np.ndarray) -> np.ndarray:
+        """Which of the events with sequence numbers `seq` are listed in insertion order rather than by time."""
+        if self.sorted:
+            return np.zeros(len(seq), dtype=bool)
+        return seq >= self._sorted_upto
+
+    def _event_order(self, table_name: str) -> np.ndarray:
+        """Row order of `table_name` matching :meth:`TaskHandler.to_df`: task insertion order, then the task's event order."""
+        table: _ColumnTable = getattr(self, table_name)
+        seq = table["seq"]
+        if table_name == "_links":
+            t_event = self._wxfer["t_event"][table["xfer"]]
+        else:
+            t_event = table["t_event"]
+
+        if self.sorted:
+            return np.lexsort((seq, t_event, table["task"]))
+        unsorted = self._unsorted(seq)
+        return np.lexsort((seq, np.where(unsorted, 0.0, t_event), unsorted, table["task"]))
+
+    def _frame(self, event_type: EventTypeEnum, o: np.ndarray) -> pd.DataFrame:
+        """Builds the dataframe of the given rows of the table of `event_type` (the link table for transfers)."""
+        def states(codes: np.ndarray) -> pd.Categorical:
+            return pd.Categorical.from_codes(codes, categories=STATE_CATEGORIES)
+
+        if event_type is EventTypeEnum.SCHEDULER:
+            t = self._sched
+            return pd.DataFrame({
+                "start": states(t["start"][o]),
+                "finish": states(t["finish"][o]),
+                "key": self._keys.decode(t["task"][o]),
+                "t_begins": epoch_to_datetime64(t["t_begins"][o]),
+                "t_ends": epoch_to_datetime64(t["t_ends"][o]),
+                "ip": self._ips.decode(t["ip"][o]),
+                "stimulus_id": self._stimulus_ids.decode(t["stimulus_id"][o]),
+                "t_event": epoch_to_datetime64(t["t_event"][o]),
+            })
+        if event_type is EventTypeEnum.WORKER:
+            t = self._worker
+            return pd.DataFrame({
+                "start": states(t["start"][o]),
+                "finish": states(t["finish"][o]),
+                "key": self._keys.decode(t["task"][o]),
+                "ip": self._ips.decode(t["ip"][o]),
+                "t_event": epoch_to_datetime64(t["t_event"][o]),
+            })
+        x = self._links["xfer"][o]
+        t = self._wxfer
+        return pd.DataFrame({
+            "start": epoch_to_datetime64(t["start"][x]),
+            "stop": epoch_to_datetime64(t["stop"][x]),
+            "middle": epoch_to_datetime64(t["middle"][x]),
+            "duration": t["duration"][x],
+            "key": self._keys.decode(self._task_name[self._links["task"][o]]),
+            "total": t["total"][x],
+            "bandwidth": t["bandwidth"][x],
+            "compressed": t["compressed"][x],
+            "requestor": self._ips.decode(t["requestor"][x]),
+            "fulfiller": self._ips.decode(t["fulfiller"][x]),
+            "transfer_type": pd.Categorical.from_codes(t["transfer_type"][x], categories=TRANSFER_CATEGORIES),
+            "t_event": epoch_to_datetime64(t["t_event"][x]),
+        })
+
+    def to_df(self, key_parts: bool = False) -> Dict[EventTypeEnum, pd.DataFrame]:
+        """Builds one dataframe per event type, see :meth:`TaskHandler.to_df <dask_md_objs.TaskHandler.to_df>`."""
+        out: Dict[EventTypeEnum, pd.DataFrame] = {}
+        key_codes: Dict[EventTypeEnum, np.ndarray] = {}
+
+        o = self._event_order("_sched")
+        key_codes[EventTypeEnum.SCHEDULER] = self._sched["task"][o]
+        out[EventTypeEnum.SCHEDULER] = self._frame(EventTypeEnum.SCHEDULER, o)
+
+        o = self._event_order("_worker")
+        key_codes[EventTypeEnum.WORKER] = self._worker["task"][o]
+        out[EventTypeEnum.WORKER] = self._frame(EventTypeEnum.WORKER, o)
+
+        o = self._event_order("_links")
+        key_codes[EventTypeEnum.WORKER_TRANSFER] = self._task_name[self._links["task"][o]]
+        out[EventTypeEnum.WORKER_TRANSFER] = self._frame(EventTypeEnum.WORKER_TRANSFER, o)
+
+        if key_parts:
+            for event_type, codes in key_codes.items():
+                # only the keys that occur are parsed, in order of first appearance like TaskHandler.to_df.
+                codes, used = pd.factorize(codes)
+                values = np.empty(len(used), dtype=object)
+                values[:] = [self._keys.values[c] for c in used]
+                parts = decompose_keys(values).iloc[codes].reset_index(drop=True)
+                out[event_type] = pd.concat([out[event_type], parts], axis=1)
+        return out
+
+    def time_index(self) -> TimeIndex:
+        """Returns the index of the time spans of every task and transfer, building it from the columns on first use.
+
+        See :meth:`TaskHandler.time_index <dask_md_objs.TaskHandler.time_index>`.
+        """
+        if getattr(self, "_time_index", None) is not None:
+            return self._time_index
+
+        tasks = np.flatnonzero(self._t_end >= self._t_start)  # False for NaN on either side
+        row_of_task = np.full(len(self._keys), -1, dtype=np.int64)
+        row_of_task[tasks] = np.arange(len(tasks))
+        link_xfer = self._links["xfer"]
+        task_pairs = (np.concatenate((self._worker["task"], self._links["task"], self._links["task"])),
+                      np.concatenate((self._worker["ip"], self._wxfer["requestor"][link_xfer],
+                                      self._wxfer["fulfiller"][link_xfer])))
+        involved = row_of_task[task_pairs[0]] >= 0
+
+        xfers = self._unique_xfers()
+        xfers = xfers[~np.isnan(self._wxfer["start"][xfers]) & ~np.isnan(self._wxfer["stop"][xfers])]
+        xfer_rows = len(tasks) + np.arange(len(xfers))
+        key_names = [tuple(self._parsed_keys(c).keys()) for c in range(len(self._xfer_keys))]
+
+        keys = np.empty(len(tasks) + len(xfers), dtype=object)
+        keys[:len(tasks)] = self._keys.decode(tasks)
+        keys[len(tasks):] = [key_names[c] for c in self._wxfer["keys"][xfers]]
+        self._time_index = TimeIndex(
+            np.repeat(np.array(["task", "transfer"], dtype=object), [len(tasks), len(xfers)]),
+            np.concatenate((self._t_start[tasks], self._wxfer["start"][xfers])),
+            np.concatenate((self._t_end[tasks], self._wxfer["stop"][xfers])),
+            keys,
+            np.concatenate((row_of_task[task_pairs[0][involved]], xfer_rows, xfer_rows)),
+            self._ips.decode(np.concatenate((task_pairs[1][involved], self._wxfer["requestor"][xfers],
+                                             self._wxfer["fulfiller"][xfers]))))
+        return self._time_index
+
+    def event_index(self) -> EventIndex:
+        """Returns the worker, state, event type, prefix and task indexes of the events, built from the columns on first use.
+
+        See :meth:`TaskHandler.event_index <dask_md_objs.TaskHandler.event_index>`.
+        """
+        if getattr(self, "_event_index", None) is not None:
+            return self._event_index
+
+        s, w, links = self._sched, self._worker, self._links
+        x = links["xfer"]
+        self._event_index = EventIndex(
+            np.concatenate((s["task"], w["task"], links["task"])), self._keys.values,
+            np.repeat(np.arange(3), [len(s), len(w), len(links)]),
+            np.concatenate((s["ip"], w["ip"], self._wxfer["requestor"][x])),
+            np.concatenate((np.full(len(s) + len(w), -1), self._wxfer["fulfiller"][x])), self._ips.values,
+            np.concatenate((s["finish"], w["finish"], np.full(len(links), -1, dtype=np.int8))),
+            np.concatenate((s["t_event"], w["t_event"], self._wxfer["t_event"][x])),
+            np.concatenate((np.arange(len(s)), np.arange(len(w)), np.arange(len(links)))),
+            self._frame)
+        return self._event_index
+
+    def query(self) -> Query:
+        """Returns a query over every event, see :meth:`TaskHandler.query <dask_md_objs.TaskHandler.query>`."""
+        return Query(self.event_index(), tasks=self.get_task_by_name)
+
+    def transfers(self) -> pd.DataFrame:
+        """Lists every distinct transfer event as one table, straight from the columns.
+
+        See :meth:`TaskHandler.transfers <dask_md_objs.TaskHandler.transfers>`.
+        """
+        x = self._unique_xfers()
+        t = self._wxfer
+        return wxfers.make_transfers(t["requestor"][x], t["fulfiller"][x], self._ips.values, t["transfer_type"][x],
+                                     t["total"][x], t["bandwidth"][x], t["duration"][x], t["start"][x], t["stop"][x])
+
+    def transfer_matrix(self, transfer_type: Optional[TransferTypeEnum] = TransferTypeEnum.INCOMING,
+                        bins=None, quantile: float = 0.95) -> wxfers.TransferMatrix:
+        """Returns the worker×worker matrix of bytes, counts and bandwidth of the transfers, see
+        :func:`~dask_md_objs.transfers.transfer_matrix`."""
+        return wxfers.transfer_matrix(self.transfers(), transfer_type, bins, quantile)
+
+    def transitions(self) -> pd.DataFrame:
+        """Lists the scheduler and worker transitions of every task as one table, straight from the columns.
+
+        See :meth:`TaskHandler.transitions <dask_md_objs.TaskHandler.transitions>`; the sequence numbers differ
+        between the two handlers, but order the events of each task the same way.
+        """
+        s, w = self._sched, self._worker
+        return metrics.make_transitions(
+            np.concatenate((s["task"], w["task"])), self._keys.values,
+            np.concatenate((np.zeros(len(s), dtype=np.int8), np.ones(len(w), dtype=np.int8))),
+            np.concatenate((s["ip"], w["ip"])), self._ips.values,
+            np.concatenate((s["start"], w["start"])),
+            np.concatenate((s["finish"], w["finish"])),
+            np.concatenate((s["t_event"], w["t_event"])),
+            np.concatenate((s["seq"], w["seq"])))
+
+    def state_intervals(self) -> pd.DataFrame:
+        """Returns the intervals every task spent in each state, see :func:`~dask_md_objs.metrics.state_intervals`."""
+        return metrics.state_intervals(self.transitions())
+
+    def state_durations(self, source: str = "scheduler", by: str = "task", agg: str = "sum") -> pd.DataFrame:
+        """Returns the time spent in each state per task, key prefix or worker, see
+        :func:`~dask_md_objs.metrics.state_durations`."""
+        return metrics.state_durations(self.transitions(), source, by, agg)
+
+    def lifecycles(self) -> pd.DataFrame:
+        """Returns the first and last transition time and transition counts of every task, see
+        :func:`~dask_md_objs.metrics.lifecycles`."""
+        return metrics.lifecycles(self.transitions())
@@ -1,21 +1,133 @@
 from datetime import datetime
-from typing import Dict, List, Tuple, Union
+from operator import attrgetter
+from typing import Dict, List, Optional, Tuple, Union
 
+import numpy as np
+import numpy.typing as npt
 import pandas as pd
 
-from ..helpers import generate_times
+from ..helpers import epoch_to_datetime64, parse_wxfer_keys
 from .enums import TaskState, TransferTypeEnum, EventTypeEnum
 
 
+def _states_from_column(column: pd.Series) -> np.ndarray:
+    """Converts a column of state strings into an object array of :class:`~dask_md_objs.TaskState`, constructing each distinct state once.
+    """
+    codes, uniques = pd.factorize(column, use_na_sentinel=False)
+    states = np.empty(len(uniques), dtype=object)
+    states[:] = [TaskState(u) for u in uniques]
+    return states[codes]
+
+
+def _pooled_column(column: pd.Series, pool: Optional[Dict[str, str]], convert=None) -> np.ndarray:
+    """Converts a column into an object array in which equal strings are the same object.
+
+    Each distinct value is converted once with `convert` (if given), and string values are looked up in
+    `pool` so every event created from any dataframe shares one copy of each string.
+    """
+    codes, uniques = pd.factorize(column, use_na_sentinel=False)
+    values = np.empty(len(uniques), dtype=object)
+    values[:] = [convert(u) for u in uniques] if convert is not None else list(uniques)
+    if pool is not None:
+        for i, v in enumerate(values):
+            if type(v) is str:
+                values[i] = pool.setdefault(v, v)
+    return values[codes]
+
+
+#: The one NaN every missing time refers to, so missing times cost no memory of their own.
+NAN: float = float("nan")
+
+
+def _epoch(value: Union[None, float, datetime]) -> float:
+    """Epoch seconds of a `datetime`, number or None (NaN)."""
+    if value is None:
+        return NAN
+    ts = value.timestamp() if isinstance(value, datetime) else float(value)
+    return NAN if ts != ts else ts
+
+
+def _epoch_column(column: npt.ArrayLike) -> np.ndarray:
+    """Converts a column of epoch seconds into an object array of Python floats, which are smaller and faster to
+    compare than numpy scalars."""
+    values = np.asarray(column, dtype=np.float64)
+    out = values.astype(object)
+    out[np.isnan(values)] = NAN
+    return out
+
+
+#: Categories of the `start` and `finish` columns of the event dataframes: every TaskState, in declaration order.
+STATE_CATEGORIES: pd.Index = pd.Index(list(TaskState), dtype=object)
+#: Categories of the `transfer_type` column of the transfer event dataframe.
+TRANSFER_CATEGORIES: pd.Index = pd.Index(list(TransferTypeEnum), dtype=object)
+
+
+def _enum_column(events: list, attribute: str, categories: pd.Index) -> pd.Categorical:
+    """Builds a categorical column of the enum members in `attribute` of every event."""
+    # enum members are singletons, so comparing their ids is much faster than hashing or comparing every value.
+    ids = np.fromiter(map(id, map(attrgetter(attribute), events)), dtype=np.int64, count=len(events))
+    codes = np.full(len(events), -1, dtype=np.int8)
+    for i, member in enumerate(categories):
+        codes[ids == id(member)] = i
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+
+def _time_column(events: list, slot: str) -> np.ndarray:
+    """The epoch times in `slot` of every event, as a `datetime64[us]` column of the same local times the
+    `datetime` attributes return."""
+    return epoch_to_datetime64(np.fromiter(map(attrgetter(slot), events), dtype=np.float64, count=len(events)))
+
+
+class EpochTime:
+    """A time attribute stored as epoch seconds in a slot, and read as a `datetime`.
+
+    Events keep the raw float of the csv file, which is cheaper to create, compare and sort than a `datetime`; the
+    `datetime` (identical to `datetime.fromtimestamp` of the float, or None for NaN) is only made when the attribute
+    is read. The attribute can be set to a `datetime`, a number or None. The float itself is in the slot named like
+    the attribute with a leading underscore, e.g. `_t_event`.
+    """
+
+    def __set_name__(self, owner, name: str):
+        self.slot = "_" + name
+
+    def __get__(self, obj, objtype=None) -> Union[None, datetime, 'EpochTime']:
+        if obj is None:
+            return self
+        ts = getattr(obj, self.slot)
+        return None if ts != ts else datetime.fromtimestamp(ts)
+
+    def __set__(self, obj, value: Union[None, float, datetime]) -> None:
+        setattr(obj, self.slot, _epoch(value))
+
+
 class Event:
     # TODO: make useful
-    #: The time this event was noted in a message.
-    t_event: datetime
+    __slots__ = ("_t_event",)
+
+    #: The time this event was noted in a message, as a `datetime`; `_t_event` holds it in epoch seconds.
+    t_event = EpochTime()
     #: The event type, for easy event filtering.
     e_type: EventTypeEnum
+    #: The csv columns :meth:`from_df` reads; other columns can be skipped when reading a file.
+    csv_columns: List[str] = []
+
+    @classmethod
+    def from_df(cls, data: pd.DataFrame, pool: Optional[Dict[str, str]] = None) -> List['Event']:
+        """Creates one Event per row of the provided dataframe, converting each column in a single vectorized pass.
+
+        :param data: The pandas dataframe read from a Mofka-Dask csv file.
+        :type data: pd.DataFrame
+        :param pool: String pool to share repeated strings (keys, IP addresses, ...) through, defaults to None
+        :type pool: Dict[str, str], optional
+        :return: A list of Events, in row order.
+        :rtype: List[Event]
+        """
+        raise NotImplementedError()
 
 
 class TaskEvent(Event):
+    __slots__ = ("start", "finish", "key", "ip")
+
     #: The starting state of the task described in this message, as a :class:`~dask_md_objs.TaskState`.
     start: TaskState
     #: The ending state of the task described in this message, as a :class:`~dask_md_objs.TaskState`.
@@ -32,14 +144,17 @@ class SchedulerEvent(TaskEvent):
     Object representing an event that was sent by a DASK Scheduler instance.
     Contains information unique to messages sent by a DASK scheduler.
     """
+    __slots__ = ("_t_begins", "_t_ends", "stimulus_id")
+
     #: The `datetime` of the task start, if applicable.
-    t_begins: Union[datetime, None]
+    t_begins = EpochTime()
     #: The `datetime` of the task end, if applicable.
-    t_ends: Union[datetime, None]
+    t_ends = EpochTime()
     #: The stimulus ID of the scheduler event that caused this event message.
     stimulus_id: str
 
     e_type = EventTypeEnum.SCHEDULER
+    csv_columns = ["key", "start", "finish", "stimulus_id", "called_from", "begins", "ends", "time"]
 
     # TODO : key, thread, worker, prefix, group
     def __init__(self, data: pd.DataFrame):
@@ -48,10 +163,9 @@ class SchedulerEvent(TaskEvent):
         :param data: The pandas dataframe row that represents all data associated with a SchedulerEvent, including 'time', 'begins', 'ends', 'called_from', 'stimulus_id', and 'key'.
         :type data: pandas dataframe row
         """
-        self.t_event, self.t_begins, self.t_ends = generate_times(
-            {key: data[key]
-             for key in ["time", "begins", "ends"]}
-        )
+        self._t_event = _epoch(data["time"])
+        self._t_begins = _epoch(data["begins"])
+        self._t_ends = _epoch(data["ends"])
 
         self.start = TaskState(data["start"])
         self.finish = TaskState(data["finish"])
@@ -62,22 +176,46 @@ class SchedulerEvent(TaskEvent):
         self.key = str(data["key"])
 
     def __str__(self) -> str:
-        return "Scheduler Event for task {e.key}\n".format(e=self) + \
-              "\tEvent time: {e.t_event}\tBegin time: {e.t_begins}\tEnd time: {e.t_ends}\n".format(e=self) + \
-              "\tStart: {e.start.value}\t\t\t\tFinish: {e.finish.value}\n".format(e=self) + \
-              "\tSource: \n\t\t{source_info}\n".format(source_info="\n\t\t".join(self.ip.__str__().split("\n")))
+        return ("Scheduler Event for task {e.key}\n"
+                "\tEvent time: {e.t_event}\tBegin time: {e.t_begins}\tEnd time: {e.t_ends}\n"
+                "\tStart: {e.start.value}\t\t\t\tFinish: {e.finish.value}\n"
+                "\tSource: \n\t\t{source_info}\n").format(e=self, source_info=self.ip.__str__().replace("\n", "\n\t\t"))
+
+    @classmethod
+    def from_df(cls, data: pd.DataFrame, pool: Optional[Dict[str, str]] = None) -> List['SchedulerEvent']:
+        t_event = _epoch_column(data["time"])
+        t_begins = _epoch_column(data["begins"])
+        t_ends = _epoch_column(data["ends"])
+        start = _states_from_column(data["start"])
+        finish = _states_from_column(data["finish"])
+        ip = _pooled_column(data["called_from"], pool, str)
+        stimulus_id = _pooled_column(data["stimulus_id"], pool, str)
+        key = _pooled_column(data["key"], pool, str)
+
+        out: List[SchedulerEvent] = []
+        for row in zip(t_event, t_begins, t_ends, start, finish, ip, stimulus_id, key):
+            e = cls.__new__(cls)
+            e._t_event, e._t_begins, e._t_ends, e.start, e.finish, e.ip, e.stimulus_id, e.key = row
+            out.append(e)
+        return out
 
     @staticmethod
     def to_df(events: List['SchedulerEvent']) -> pd.DataFrame:
-        coll = []
-        for e in events:
-            coll.append([e.start, e.finish, e.key, e.t_begins, e.t_ends, e.ip, e.stimulus_id])
+        """Builds a dataframe of the provided events, one column at a time.
 
-        df: pd.DataFrame = pd.DataFrame(
-            coll,
-            columns=["start", "finish", "key", "t_begins", "t_ends", "ip", "stimulus_id"],
-            # dtype=[TaskState, TaskState, str, datetime, datetime, str, str]
-            )
+        States are categoricals of :data:`STATE_CATEGORIES` and times are `datetime64[us]` columns, NaT where
+        missing.
+        """
+        df: pd.DataFrame = pd.DataFrame({
+            "start": _enum_column(events, "start", STATE_CATEGORIES),
+            "finish": _enum_column(events, "finish", STATE_CATEGORIES),
+            "key": list(map(attrgetter("key"), events)),
+            "t_begins": _time_column(events, "_t_begins"),
+            "t_ends": _time_column(events, "_t_ends"),
+            "ip": list(map(attrgetter("ip"), events)),
+            "stimulus_id": list(map(attrgetter("stimulus_id"), events)),
+            "t_event": _time_column(events, "_t_event"),
+        })
 
         return df
 
@@ -86,34 +224,50 @@ class WorkerEvent(TaskEvent):
     """Event that represents a change in Worker task state.
 
     """
+    __slots__ = ()
 
     e_type = EventTypeEnum.WORKER
+    csv_columns = ["key", "start", "finish", "called_from", "time"]
 
     def __init__(self, data):
         self.start = TaskState(data["start"])
         self.finish = TaskState(data["finish"])
 
         self.ip = data["called_from"]
-        self.t_event = datetime.fromtimestamp(data["time"])
+        self._t_event = _epoch(data["time"])
         self.key = data["key"]
 
     def __str__(self) -> str:
-        return "Worker Event for task {e.key}\n".format(e=self) + \
-            "\tEvent time: {e.t_event}\n".format(e=self) + \
-            "\tStart: {e.start.value}\t\t\t\tFinish: {e.finish.value}\n".format(e=self) + \
-            "\tSource: {e.ip}\n".format(e=self)
+        return ("Worker Event for task {e.key}\n"
+                "\tEvent time: {e.t_event}\n"
+                "\tStart: {e.start.value}\t\t\t\tFinish: {e.finish.value}\n"
+                "\tSource: {e.ip}\n").format(e=self)
+
+    @classmethod
+    def from_df(cls, data: pd.DataFrame, pool: Optional[Dict[str, str]] = None) -> List['WorkerEvent']:
+        start = _states_from_column(data["start"])
+        finish = _states_from_column(data["finish"])
+        ip = _pooled_column(data["called_from"], pool)
+        t_event = _epoch_column(data["time"])
+        key = _pooled_column(data["key"], pool)
+
+        out: List[WorkerEvent] = []
+        for row in zip(start, finish, ip, t_event, key):
+            e = cls.__new__(cls)
+            e.start, e.finish, e.ip, e._t_event, e.key = row
+            out.append(e)
+        return out
 
     @staticmethod
     def to_df(events: List['WorkerEvent']) -> pd.DataFrame:
-        coll = []
-        for e in events:
-            coll.append([e.start, e.finish, e.key, e.ip])
-
-        df: pd.DataFrame = pd.DataFrame(
-            coll,
-            columns=["start", "finish", "key", "ip"],
-            # dtype=[TaskState, TaskState, str, str]
-            )
+        """Builds a dataframe of the provided events, one column at a time; see :meth:`SchedulerEvent.to_df`."""
+        df: pd.DataFrame = pd.DataFrame({
+            "start": _enum_column(events, "start", STATE_CATEGORIES),
+            "finish": _enum_column(events, "finish", STATE_CATEGORIES),
+            "key": list(map(attrgetter("key"), events)),
+            "ip": list(map(attrgetter("ip"), events)),
+            "t_event": _time_column(events, "_t_event"),
+        })
 
         return df
 
@@ -124,15 +278,18 @@ class WXferEvent(Event):
     An object that represents an event message that signifies a file has
     been transferred between two workers.
     """
-    start: datetime
-    stop: datetime
-    middle: datetime
+    __slots__ = ("_start", "_stop", "_middle", "duration", "keys", "total", "bandwidth", "compressed", "requestor",
+                 "fulfiller", "transfer_type")
+
+    start = EpochTime()
+    stop = EpochTime()
+    middle = EpochTime()
     duration: float
 
     keys: Dict[str, int]
     """Dictionary containing the `keys` information from the worker transfer message file.
 
-    This dictionary is generating by `eval` ing the data directly."""
+    This dictionary is generated by parsing the data with :func:`~dask_md_helpers.parse_wxfer_keys`."""
 
     total: int
     bandwidth: float
@@ -148,15 +305,17 @@ class WXferEvent(Event):
     transfer_type: TransferTypeEnum
 
     e_type = EventTypeEnum.WORKER_TRANSFER
+    csv_columns = ["start", "stop", "middle", "duration", "keys", "total", "bandwidth", "who", "type", "called_from",
+                   "time", "compressed"]
 
     def __init__(self, data):
         #: This is an example docstring.
-        self.start = datetime.fromtimestamp(data['start'])
-        self.stop = datetime.fromtimestamp(data['stop'])
-        self.middle = datetime.fromtimestamp(data['middle'])
+        self._start = _epoch(data['start'])
+        self._stop = _epoch(data['stop'])
+        self._middle = _epoch(data['middle'])
         self.duration = data['duration']
 
-        self.keys = eval(data['keys'])
+        self.keys = parse_wxfer_keys(data['keys'])
 
         self.total = data['total']
         self.bandwidth = data['bandwidth']
@@ -167,35 +326,66 @@ class WXferEvent(Event):
 
         self.transfer_type = TransferTypeEnum(data['type'])
 
-        self.t_event = datetime.fromtimestamp(data['time'])
+        self._t_event = _epoch(data['time'])
 
     def __str__(self) -> str:
-        out = "Worker Transfer Event (Type: {t})\n".format(t=self.transfer_type)
-        out += "\tEvent time: {t}\n".format(t=self.t_event)
-        out += "\tRequestor (Them): {r}\tFulfiller (Me): {f}\n".format(r=self.requestor, f=self.fulfiller)
-        out += "\tStart: {s}\tMiddle: {m}\tEnd: {e}\t(Duration: {d})\n".format(
-            s=self.start, m=self.middle, e=self.stop, d=self.duration
-        )
-        out += "\tTotal Transfer: {t}\n".format(t=self.total)
-        out += "\tAffiliated Keys:"
-
-        for key in self.keys:
-            out += "\n\t\t{k}".format(k=key)
-
-        out += "\n"
+        return ("Worker Transfer Event (Type: {e.transfer_type})\n"
+                "\tEvent time: {e.t_event}\n"
+                "\tRequestor (Them): {e.requestor}\tFulfiller (Me): {e.fulfiller}\n"
+                "\tStart: {e.start}\tMiddle: {e.middle}\tEnd: {e.stop}\t(Duration: {e.duration})\n"
+                "\tTotal Transfer: {e.total}\n"
+                "\tAffiliated Keys:{keys}\n").format(e=self, keys="".join(["\n\t\t{k}".format(k=key) for key in self.keys]))
+
+    @classmethod
+    def from_df(cls, data: pd.DataFrame, pool: Optional[Dict[str, str]] = None) -> List['WXferEvent']:
+        start = _epoch_column(data["start"])
+        stop = _epoch_column(data["stop"])
+        middle = _epoch_column(data["middle"])
+        t_event = _epoch_column(data["time"])
+
+        codes, uniques = pd.factorize(data["type"], use_na_sentinel=False)
+        transfer_types = np.empty(len(uniques), dtype=object)
+        transfer_types[:] = [TransferTypeEnum(u) for u in uniques]
+        transfer_type = transfer_types[codes]
+
+        keys = [parse_wxfer_keys(k) for k in data["keys"].to_numpy(dtype=object)]
+
+        out: List[WXferEvent] = []
+        for row in zip(start, stop, middle, data["duration"].to_numpy(), keys,
+                       data["total"].to_numpy(), data["bandwidth"].to_numpy(), data["compressed"].to_numpy(),
+                       _pooled_column(data["who"], pool), _pooled_column(data["called_from"], pool),
+                       transfer_type, t_event):
+            e = cls.__new__(cls)
+            e._start, e._stop, e._middle, e.duration, e.keys, e.total, e.bandwidth, e.compressed, \
+                e.requestor, e.fulfiller, e.transfer_type, e._t_event = row
+            out.append(e)
         return out
 
     @staticmethod
     def to_df(events: List[Tuple[str, 'WXferEvent']]) -> pd.DataFrame:
-        coll = []
-        for (cur_task, e) in events:
-            coll.append([e.start, e.stop, e.middle, e.duration, cur_task, e.total, e.bandwidth, e.compressed, e.requestor, e.fulfiller, e.transfer_type, e.t_event])
-
-        df: pd.DataFrame = pd.DataFrame(
-            coll,
-            columns=["start", "stop", "middle", "duration", "key", "total", "bandwidth", "compressed", "requestor", "fulfiller", "transfer_type", "t_event"],
-            # dtype=[datetime, datetime, datetime, float, str, int, float, float, str, str, TransferTypeEnum, datetime]
-            )
+        """Builds a dataframe of the provided (task key, event) pairs, one column at a time.
+
+        An event shared by several tasks has one row per task. The transfer type is a categorical of
+        :data:`TRANSFER_CATEGORIES` and times are `datetime64[us]` columns.
+        """
+        n = len(events)
+        xfers = [e for (_, e) in events]
+        keys = np.empty(n, dtype=object)
+        keys[:] = [cur_task for (cur_task, _) in events]
+        df: pd.DataFrame = pd.DataFrame({
+            "start": _time_column(xfers, "_start"),
+            "stop": _time_column(xfers, "_stop"),
+            "middle": _time_column(xfers, "_middle"),
+            "duration": np.fromiter(map(attrgetter("duration"), xfers), dtype=np.float64, count=n),
+            "key": keys,
+            "total": np.fromiter(map(attrgetter("total"), xfers), dtype=np.int64, count=n),
+            "bandwidth": np.fromiter(map(attrgetter("bandwidth"), xfers), dtype=np.float64, count=n),
+            "compressed": np.fromiter(map(attrgetter("compressed"), xfers), dtype=np.float64, count=n),
+            "requestor": list(map(attrgetter("requestor"), xfers)),
+            "fulfiller": list(map(attrgetter("fulfiller"), xfers)),
+            "transfer_type": _enum_column(xfers, "transfer_type", TRANSFER_CATEGORIES),
+            "t_event": _time_column(xfers, "_t_event"),
+        })
         return df
 
     def is_only_1_task(self) -> bool:
@@ -232,6 +422,11 @@ class WXferEvent(Event):
         """
         return list(self.keys.keys())
 
+    def _times(self) -> Tuple[Optional[float], ...]:
+        """The start, stop, middle and event times in epoch seconds, with None for NaN so missing times compare
+        (and hash) equal."""
+        return tuple(None if t != t else t for t in (self._start, self._stop, self._middle, self._t_event))
+
     def _check_most_equiv(self, other: 'WXferEvent') -> bool:
         """Checks most equivalencies between WXfer events to avoid repetition in identical_except_(fulfiller,requestor) and __eq__.
 
@@ -243,15 +438,12 @@ class WXferEvent(Event):
         :return: True if all attributes except requestor or fulfiller match.
         :rtype: bool
         """
-        if not (self.start == other.start) or \
-           not (self.stop == other.stop) or \
-           not (self.middle == other.middle) or \
+        if not (self._times() == other._times()) or \
            not (self.duration == other.duration) or \
            not (self.keys == other.keys) or \
            not (self.total == other.total) or \
            not (self.bandwidth == other.bandwidth) or \
-           not (self.transfer_type == other.transfer_type) or \
-           not (self.t_event == other.t_event):
+           not (self.transfer_type == other.transfer_type):
             return False
 
         elif self.transfer_type == TransferTypeEnum.OUTGOING and not (self.compressed == other.compressed):
@@ -291,6 +483,16 @@ class WXferEvent(Event):
 
         return False
 
+    def __hash__(self) -> int:
+        """Hashes the same attributes :meth:`__eq__` compares, so equal transfer events can be deduplicated with sets and dicts.
+
+        Only the task keys (not the per-key byte counts) of `keys` are hashed, and `compressed` is only hashed for
+        `TransferTypeEnum.OUTGOING` events, matching :meth:`_check_most_equiv`.
+        """
+        compressed = self.compressed if self.transfer_type == TransferTypeEnum.OUTGOING else None
+        return hash((self._times(), self.duration, frozenset(self.keys), self.total,
+                     self.bandwidth, self.transfer_type, compressed, self.requestor, self.fulfiller))
+
     def __eq__(self, other) -> bool:
         if not isinstance(other, WXferEvent):
             # Not sure when a WXferEvent would ever be equal to another type of event.
@@ -0,0 +1,216 @@
+"""Vectorized per-task state durations and lifecycle metrics.
+
+Both task handlers can list their scheduler and worker transitions as one flat table (see
+:meth:`~dask_md_objs.TaskHandler.transitions`). Every transition moves a task into its `finish` state on the
+scheduler or on one worker, where it stays until the next transition of the same task on the same scheduler or
+worker. The functions in this module turn that table into dwell-time intervals and roll them up by task, key prefix
+or worker with grouped array operations, never visiting events one by one.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+from ..helpers import key_prefixes
+from .enums import TaskState
+
+#: Values of every :class:`~dask_md_objs.TaskState`, in declaration order; the categories of the state columns.
+STATE_VALUES: List[str] = [s.value for s in TaskState]
+#: Where a transition was recorded; the categories of the `source` column.
+SOURCES: List[str] = ["scheduler", "worker"]
+#: The columns of a transitions table, and their dtypes.
+TRANSITION_COLUMNS: Dict[str, str] = {"key": "category", "source": "category", "ip": "category", "start": "category",
+                                      "finish": "category", "t_event": "float64", "seq": "int64"}
+
+_GROUPINGS = {"task": "key", "prefix": "prefix", "worker": "ip"}
+
+
+def _categorical(codes: npt.ArrayLike, categories: Sequence) -> pd.Categorical:
+    values = np.empty(len(categories), dtype=object)
+    values[:] = list(categories)
+    return pd.Categorical.from_codes(np.asarray(codes), categories=pd.Index(values, dtype=object))
+
+
+def make_transitions(key_codes: npt.ArrayLike, keys: Sequence, source_codes: npt.ArrayLike, ip_codes: npt.ArrayLike,
+                     ips: Sequence, start_codes: npt.ArrayLike, finish_codes: npt.ArrayLike, t_event: npt.ArrayLike,
+                     seq: npt.ArrayLike) -> pd.DataFrame:
+    """Builds a transitions table from dictionary-encoded columns.
+
+    Keys and ip addresses are given as codes into `keys` and `ips`, sources as codes into :data:`SOURCES` and
+    states as codes into :data:`STATE_VALUES`. Keys and ips that no transition uses are dropped from the categories.
+
+    :return: One row per transition, with the columns of :data:`TRANSITION_COLUMNS`.
+    :rtype: pd.DataFrame
+    """
+    def compact(codes, values):
+        used, codes = np.unique(np.asarray(codes, dtype=np.int64), return_inverse=True)
+        values = np.asarray(values, dtype=object) if len(values) > 0 else np.empty(0, dtype=object)
+        return _categorical(codes.reshape(-1).astype(np.int32), values[used] if len(used) > 0 else [])
+
+    return pd.DataFrame({
+        "key": compact(key_codes, keys),
+        "source": _categorical(np.asarray(source_codes, dtype=np.int8), SOURCES),
+        "ip": compact(ip_codes, ips),
+        "start": _categorical(np.asarray(start_codes, dtype=np.int8), STATE_VALUES),
+        "finish": _categorical(np.asarray(finish_codes, dtype=np.int8), STATE_VALUES),
+        "t_event": np.asarray(t_event, dtype=np.float64),
+        "seq": np.asarray(seq, dtype=np.int64),
+    })
+
+
+def _codes(column: pd.Series) -> np.ndarray:
+    return column.cat.codes.to_numpy().astype(np.int64)
+
+
+def _packed_argsort(major: np.ndarray, n_major: int) -> Optional[np.ndarray]:
+    """Stable argsort of non-negative integers below `n_major`, or None when the packed keys would overflow.
+
+    Every value is packed together with its position into one int64 so that a plain sort, which is much faster
+    than a stable argsort, can be used.
+    """
+    n = len(major)
+    if n == 0 or n_major * n >= 2**62:
+        return None
+    return np.sort(major.astype(np.int64) * n + np.arange(n, dtype=np.int64)) % n
+
+
+def _stream_order(transitions: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the row order by (task, source, ip) stream, time and `seq`, and the stream of every ordered row.
+
+    Same as `np.lexsort((seq, t_event, stream))`, but several times faster on tens of millions of rows.
+    """
+    n_ips = max(len(transitions["ip"].cat.categories), 1)
+    # one integer per (task, source, ip) stream, so ordering only needs three sort keys.
+    stream = (_codes(transitions["key"]) * len(SOURCES) + _codes(transitions["source"])) * n_ips + \
+        _codes(transitions["ip"])
+    seq = transitions["seq"].to_numpy()
+    t = transitions["t_event"].to_numpy(dtype=np.float64)
+    n = len(t)
+
+    order = np.arange(n)
+    if n > 1 and (np.diff(seq) < 0).any():
+        order = np.argsort(seq, kind="stable")
+
+    # dense time ranks (equal times share one) only need an unstable sort; ties then keep the `seq` order above.
+    by_time = np.argsort(t)
+    t_sorted = t[by_time]
+    time_rank = np.empty(n, dtype=np.int64)
+    time_rank[by_time] = np.concatenate(([0], np.cumsum(t_sorted[1:] != t_sorted[:-1]))) if n > 0 else []
+    packed = _packed_argsort(time_rank[order], n)
+    if packed is None:
+        return np.lexsort((seq, t, stream)), np.sort(stream)
+    order = order[packed]
+
+    packed = _packed_argsort(stream[order], int(stream.max()) + 1 if n > 0 else 0)
+    order = order[packed] if packed is not None else order[np.argsort(stream[order], kind="stable")]
+    return order, stream[order]
+
+
+def state_intervals(transitions: pd.DataFrame) -> pd.DataFrame:
+    """Turns transitions into the intervals tasks spent in each state.
+
+    Transitions are ordered by time within each (task, source, ip) stream, ties keeping their `seq` order. Every
+    transition starts an interval in its `finish` state that lasts until the next transition of the same stream;
+    the last interval of a stream is left open, with a NaN `t_end` and `duration`.
+
+    :param transitions: A table with the columns of :data:`TRANSITION_COLUMNS`.
+    :type transitions: pd.DataFrame
+    :return: One row per interval with the columns "key", "source", "ip", "state", "t_begin", "t_end" (epoch
+        seconds) and "duration" (seconds), ordered by stream and time.
+    :rtype: pd.DataFrame
+    """
+    order, stream = _stream_order(transitions)
+    t = transitions["t_event"].to_numpy(dtype=np.float64)[order]
+    t_end = np.full(len(t), np.nan)
+    same = stream[1:] == stream[:-1]
+    t_end[:-1][same] = t[1:][same]
+
+    return pd.DataFrame({
+        "key": transitions["key"].array[order],
+        "source": transitions["source"].array[order],
+        "ip": transitions["ip"].array[order],
+        "state": transitions["finish"].array[order],
+        "t_begin": t,
+        "t_end": t_end,
+        "duration": t_end - t,
+    })
+
+
+def _group_codes(intervals: pd.DataFrame, by: str) -> Tuple[np.ndarray, pd.Index]:
+    if by not in _GROUPINGS:
+        raise ValueError("Invalid grouping {b}; must be one of {g}.".format(b=by, g=list(_GROUPINGS)))
+    if by == "prefix":
+        keys = intervals["key"].cat.categories
+        prefix_codes, prefixes = pd.factorize(pd.Series(key_prefixes(keys), dtype=object))
+        return prefix_codes[_codes(intervals["key"])], pd.Index(prefixes, dtype=object)
+    column = intervals[_GROUPINGS[by]]
+    return _codes(column), column.cat.categories
+
+
+def state_durations(transitions: pd.DataFrame, source: str = "scheduler", by: str = "task",
+                    agg: str = "sum") -> pd.DataFrame:
+    """Aggregates the time spent in each state, per task, key prefix or worker.
+
+    :param transitions: A table with the columns of :data:`TRANSITION_COLUMNS`.
+    :type transitions: pd.DataFrame
+    :param source: Which transitions to use, "scheduler" or "worker". Defaults to "scheduler".
+    :type source: str, optional
+    :param by: "task" (one row per key), "prefix" (per key prefix, see :func:`~dask_md_helpers.key_split`) or
+        "worker" (per ip address the transitions were recorded on). Defaults to "task".
+    :type by: str, optional
+    :param agg: How to combine the intervals of a group, any pandas aggregation such as "sum", "mean", "max" or
+        "count". Defaults to "sum".
+    :type agg: str, optional
+    :raises ValueError: when an invalid source or grouping is provided.
+    :return: One row per group and one column per state that occurs, in :class:`~dask_md_objs.TaskState` order.
+        Open intervals (the last state of each stream) are not counted.
+    :rtype: pd.DataFrame
+    """
+    if source not in SOURCES:
+        raise ValueError("Invalid source {s}; must be one of {v}.".format(s=source, v=SOURCES))
+    intervals = state_intervals(transitions[(transitions["source"] == source).to_numpy()])
+    intervals = intervals[intervals["duration"].notna().to_numpy()]
+
+    group, labels = _group_codes(intervals, by)
+    out = intervals["duration"].groupby([group, _codes(intervals["state"])]).agg(agg).unstack()
+    out.index = labels[out.index]
+    out.index.name = _GROUPINGS[by]
+    out.columns = pd.Index([STATE_VALUES[c] for c in out.columns], name="state")
+    return out
+
+
+def lifecycles(transitions: pd.DataFrame) -> pd.DataFrame:
+    """Summarizes the lifecycle of every task from its transitions.
+
+    :param transitions: A table with the columns of :data:`TRANSITION_COLUMNS`.
+    :type transitions: pd.DataFrame
+    :return: One row per key, in category order, with the first and last transition time ("t_first", "t_last",
+        epoch seconds), the "lifetime" between them in seconds, the number of scheduler and worker transitions
+        ("n_scheduler", "n_worker") and the number of distinct workers that reported transitions ("n_workers").
+    :rtype: pd.DataFrame
+    """
+    keys = transitions["key"].cat.categories
+    key = _codes(transitions["key"])
+    worker = _codes(transitions["source"]) == SOURCES.index("worker")
+    t = transitions["t_event"].to_numpy(dtype=np.float64)
+
+    t_first = np.full(len(keys), np.nan)
+    t_last = np.full(len(keys), np.nan)
+    np.fmin.at(t_first, key, t)
+    np.fmax.at(t_last, key, t)
+    n_worker = np.bincount(key[worker], minlength=len(keys))
+    n_ips = max(len(transitions["ip"].cat.categories), 1)
+    pairs = np.sort(key[worker] * n_ips + _codes(transitions["ip"])[worker])
+    distinct = pairs[np.concatenate(([True], pairs[1:] != pairs[:-1]))] if len(pairs) > 0 else pairs
+    n_workers = np.bincount(distinct // n_ips, minlength=len(keys))
+
+    out = pd.DataFrame({
+        "t_first": t_first,
+        "t_last": t_last,
+        "lifetime": t_last - t_first,
+        "n_scheduler": np.bincount(key, minlength=len(keys)) - n_worker,
+        "n_worker": n_worker,
+        "n_workers": n_workers,
+    }, index=pd.Index(keys, name="key"))
+    return out
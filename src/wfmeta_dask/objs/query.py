@@ -0,0 +1,253 @@
+"""Inverted indexes over the events of a handler, and composable queries on them.
+
+An :class:`EventIndex` lists every event of a handler once per task it belongs to (a transfer of several keys is
+listed under each of their tasks, like in :meth:`~dask_md_objs.TaskHandler.to_df`), ordered by event time. For
+the worker, finish state, event type, key prefix and task of the events it keeps a posting list: the sorted rows
+of the events with each value. A :class:`Query` intersects the posting lists of its filters, smallest first, and
+cuts them to its time window with a binary search, so a drill-down costs about the size of its smallest posting
+list rather than a scan over every event.
+"""
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+from ..helpers import key_prefixes
+from .enums import EventTypeEnum, TaskState
+from .timeindex import Time, _seconds
+
+#: The event types, in the order of their codes in an :class:`EventIndex`.
+EVENT_TYPES: List[EventTypeEnum] = [EventTypeEnum.SCHEDULER, EventTypeEnum.WORKER, EventTypeEnum.WORKER_TRANSFER]
+#: The task states, in the order of their codes in an :class:`EventIndex` and everywhere else states are encoded.
+STATES: List[TaskState] = list(TaskState)
+#: The code of every task state, its position in :data:`STATES`.
+STATE_CODES: Dict[TaskState, int] = {s: i for i, s in enumerate(STATES)}
+
+#: Builds the dataframe of the events of one type from their source rows, see :class:`EventIndex`.
+FrameBuilder = Callable[[EventTypeEnum, np.ndarray], pd.DataFrame]
+
+
+class _Postings:
+    """The sorted rows of every value of one dimension, stored as one array sliced by offsets."""
+
+    def __init__(self, codes: np.ndarray, rows: np.ndarray, values: Sequence[Hashable]):
+        # rows arrive ascending, so a stable sort by code keeps the rows of each value sorted.
+        known = codes >= 0
+        codes, rows = codes[known], rows[known]
+        order = np.argsort(codes, kind="stable")
+        self.rows = rows[order]
+        self.offsets = np.searchsorted(codes[order], np.arange(len(values) + 1))
+        self.codes: Dict[Hashable, int] = {v: i for i, v in enumerate(values)}
+
+    def get(self, value: Hashable) -> np.ndarray:
+        code = self.codes.get(value)
+        if code is None:
+            return self.rows[:0]
+        return self.rows[self.offsets[code]:self.offsets[code + 1]]
+
+    def union(self, values: Iterable[Hashable]) -> np.ndarray:
+        parts = [self.get(v) for v in values]
+        if len(parts) == 1:
+            return parts[0]
+        return np.unique(np.concatenate(parts)) if len(parts) > 0 else self.rows[:0]
+
+
+def _contained(rows: np.ndarray, sorted_rows: np.ndarray) -> np.ndarray:
+    """Which of `rows` occur in `sorted_rows`, with one binary search per row."""
+    at = np.searchsorted(sorted_rows, rows)
+    found = at < len(sorted_rows)
+    found[found] = sorted_rows[at[found]] == rows[found]
+    return found
+
+
+class EventIndex:
+    """Posting lists of the events of a handler by worker, finish state, event type, key prefix and task.
+
+    Use :meth:`TaskHandler.query <dask_md_objs.TaskHandler.query>` rather than constructing one directly. Events
+    are numbered by time (ties and missing times keep the order they were given in), so the rows of every posting
+    list are also in time order.
+    """
+    #: Task key of every row.
+    task_keys: np.ndarray
+    #: Event time of every row in epoch seconds, ascending.
+    t_event: np.ndarray
+
+    def __init__(self, task_codes: npt.ArrayLike, tasks: Sequence[Hashable], type_codes: npt.ArrayLike,
+                 ip_codes: npt.ArrayLike, peer_codes: npt.ArrayLike, ips: Sequence[Hashable],
+                 finish_codes: npt.ArrayLike, t_event: npt.ArrayLike, source_rows: npt.ArrayLike,
+                 frames: FrameBuilder):
+        """
+        :param task_codes: The task of every event, as codes into `tasks`.
+        :type task_codes: array-like of int
+        :param tasks: The task keys.
+        :type tasks: Sequence[Hashable]
+        :param type_codes: The type of every event, as codes into :data:`EVENT_TYPES`.
+        :type type_codes: array-like of int
+        :param ip_codes: The ip that recorded every event (the requestor of transfers), as codes into `ips`.
+        :type ip_codes: array-like of int
+        :param peer_codes: The fulfiller of transfers, as codes into `ips`, and -1 for other events.
+        :type peer_codes: array-like of int
+        :param ips: The ip addresses.
+        :type ips: Sequence[Hashable]
+        :param finish_codes: The finish state of every event, as codes into :data:`STATES`, and -1 for transfers.
+        :type finish_codes: array-like of int
+        :param t_event: The time of every event, in epoch seconds.
+        :type t_event: array-like of float
+        :param source_rows: What `frames` needs to find every event again, e.g. its row in a table of its type.
+        :type source_rows: array-like of int
+        :param frames: Builds the dataframe of the events of one type from their `source_rows`, with the same
+            columns as :meth:`~dask_md_objs.TaskHandler.to_df`.
+        :type frames: Callable[[EventTypeEnum, np.ndarray], pd.DataFrame]
+        :raises ValueError: when the columns differ in length.
+        """
+        t_event = np.asarray(t_event, dtype=np.float64)
+        columns = [np.asarray(c, dtype=np.int64)
+                   for c in (task_codes, type_codes, ip_codes, peer_codes, finish_codes, source_rows)]
+        if any(len(c) != len(t_event) for c in columns):
+            raise ValueError("All columns of an EventIndex must have one entry per event.")
+        # NaN times sort last.
+        order = np.argsort(t_event, kind="stable")
+        task, event_type, ip, peer, finish, self._source_rows = (c[order] for c in columns)
+        self.t_event = t_event[order]
+        self._frames = frames
+
+        self._tasks = np.empty(len(tasks), dtype=object)
+        self._tasks[:] = list(tasks)
+        self._task = task
+        self.task_keys = self._tasks[task]
+        self._event_type = event_type
+
+        rows = np.arange(len(order))
+        self.postings: Dict[str, _Postings] = {
+            "task": _Postings(task, rows, self._tasks),
+            "event_type": _Postings(event_type, rows, EVENT_TYPES),
+            "state": _Postings(finish, rows, STATES),
+        }
+        # a transfer is indexed under both of its workers.
+        both = peer != ip
+        worker_codes = np.concatenate((ip, np.where(both, peer, -1)))
+        worker_rows = np.concatenate((rows, rows))
+        by_row = np.argsort(worker_rows, kind="stable")
+        self.postings["worker"] = _Postings(worker_codes[by_row], worker_rows[by_row], ips)
+        prefix_codes, prefixes = pd.factorize(pd.Series(key_prefixes(self._tasks), dtype=object))
+        self.postings["prefix"] = _Postings(prefix_codes[task], rows, prefixes)
+
+    def __len__(self) -> int:
+        return len(self.t_event)
+
+    def values(self, dimension: str) -> List[Hashable]:
+        """Returns every value of `dimension` ("task", "event_type", "state", "worker" or "prefix") in the index."""
+        return list(self.postings[dimension].codes)
+
+    def query(self) -> 'Query':
+        """Returns a query matching every event, to be narrowed down with its filters."""
+        return Query(self)
+
+    def window(self, t_begin: Optional[Time], t_end: Optional[Time]) -> Tuple[int, int]:
+        """Returns the range of rows with an event time within [t_begin, t_end], either end being open if None."""
+        lo = 0 if t_begin is None else int(np.searchsorted(self.t_event, _seconds(t_begin), side="left"))
+        hi = np.searchsorted(self.t_event, np.inf, side="right") if t_end is None else \
+            np.searchsorted(self.t_event, _seconds(t_end), side="right")
+        return lo, max(lo, int(hi))
+
+    def to_df(self, rows: npt.ArrayLike) -> Dict[EventTypeEnum, pd.DataFrame]:
+        """Returns the events of `rows` as one dataframe per event type, like :meth:`~dask_md_objs.TaskHandler.to_df`."""
+        rows = np.asarray(rows, dtype=np.int64)
+        out: Dict[EventTypeEnum, pd.DataFrame] = {}
+        for code, event_type in enumerate(EVENT_TYPES):
+            of_type = rows[self._event_type[rows] == code]
+            out[event_type] = self._frames(event_type, self._source_rows[of_type])
+        return out
+
+
+class Query:
+    """A composable query on an :class:`EventIndex`, matching the events that pass all of its filters.
+
+    Every filter returns a new query, so queries can be built up and reused::
+
+        in_memory = th.query().state(TaskState.MEMORY)
+        in_memory.worker("tcp://10.0.0.1:40000").between(t0, t1).tasks()
+
+    Filters on different fields must all match the same event; the values given to one filter are alternatives.
+    """
+
+    def __init__(self, index: EventIndex, filters: Tuple[Tuple[str, Tuple[Hashable, ...]], ...] = (),
+                 window: Tuple[Optional[Time], Optional[Time]] = (None, None),
+                 tasks: Optional[Callable[[Hashable], object]] = None):
+        self.index = index
+        self.filters = filters
+        self.window = window
+        self._get_task = tasks
+
+    def _where(self, dimension: str, values: Tuple[Hashable, ...]) -> 'Query':
+        if len(values) == 0:
+            raise ValueError("A {d} filter needs at least one value.".format(d=dimension))
+        return Query(self.index, self.filters + ((dimension, values),), self.window, self._get_task)
+
+    def worker(self, *workers: Hashable) -> 'Query':
+        """Events recorded by one of `workers`, or transfers to or from one of them."""
+        return self._where("worker", workers)
+
+    def state(self, *states: Union[TaskState, str]) -> 'Query':
+        """Scheduler and worker events that finished in one of `states`, given as :class:`TaskState` or its value."""
+        return self._where("state", tuple(s if isinstance(s, TaskState) else TaskState(s) for s in states))
+
+    def event_type(self, *event_types: EventTypeEnum) -> 'Query':
+        """Events of one of `event_types`."""
+        return self._where("event_type", event_types)
+
+    def prefix(self, *prefixes: str) -> 'Query':
+        """Events of tasks whose key has one of `prefixes`, see :func:`~dask_md_helpers.key_split`."""
+        return self._where("prefix", prefixes)
+
+    def task(self, *keys: Hashable) -> 'Query':
+        """Events of the tasks `keys`."""
+        return self._where("task", keys)
+
+    def between(self, t_begin: Optional[Time] = None, t_end: Optional[Time] = None) -> 'Query':
+        """Events with a time within [t_begin, t_end], as epoch seconds or `datetime`; None leaves that end open.
+
+        Replaces the time window of this query, if it had one.
+        """
+        return Query(self.index, self.filters, (t_begin, t_end), self._get_task)
+
+    def rows(self) -> np.ndarray:
+        """Returns the rows of the matching events in the index, in time order."""
+        lo, hi = self.index.window(*self.window)
+        postings = sorted((self.index.postings[d].union(v) for d, v in self.filters), key=len)
+        if len(postings) == 0:
+            return np.arange(lo, hi)
+        rows = postings[0]
+        rows = rows[np.searchsorted(rows, lo):np.searchsorted(rows, hi)]
+        for other in postings[1:]:
+            if len(rows) == 0:
+                break
+            rows = rows[_contained(rows, other)]
+        return rows
+
+    def count(self) -> int:
+        """Returns the number of matching events."""
+        return len(self.rows())
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def task_keys(self) -> List[Hashable]:
+        """Returns the keys of the tasks with at least one matching event, in order of their first matching event."""
+        task = self.index._task[self.rows()]
+        _, first = np.unique(task, return_index=True)
+        return list(self.index._tasks[task[np.sort(first)]])
+
+    def tasks(self) -> List:
+        """Returns the :class:`~dask_md_objs.Task` of every key of :meth:`task_keys`."""
+        if self._get_task is None:
+            raise ValueError("This query was not created from a handler, so it cannot return tasks; use task_keys.")
+        return [self._get_task(k) for k in self.task_keys()]
+
+    def events(self) -> Dict[EventTypeEnum, pd.DataFrame]:
+        """Returns the matching events as one dataframe per event type, in time order.
+
+        :rtype: Dict[EventTypeEnum, pd.DataFrame]
+        """
+        return self.index.to_df(self.rows())
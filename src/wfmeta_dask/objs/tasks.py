@@ -1,27 +1,46 @@
 """Module containing all the custom objects defined to help with parsing the metadata generated by the DASK-Mofka plugins.
 """
-from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
 
+import numpy as np
 import pandas as pd
 
-from .events import Event, WXferEvent, WorkerEvent, SchedulerEvent
+from ..helpers import decompose_keys
+from .events import NAN, EpochTime, Event, WXferEvent, WorkerEvent, SchedulerEvent
 from .enums import TransferTypeEnum, EventTypeEnum
+from . import metrics
+from . import transfers as wxfers
+from .query import STATE_CODES, EventIndex, Query
+from .timeindex import TimeIndex
+
+
+def _event_time(e: Event) -> float:
+    return e._t_event
 
 
 class Task:
+    __slots__ = ("name", "events", "_t_start", "_t_end", "workers", "initiated", "_wxfer_events")
+
     name: str
     events: List[Event]
 
-    t_start: Optional[datetime] = None
-    t_end: Optional[datetime] = None
+    #: The earliest `t_begins` of the task's scheduler events, or None; `_t_start` holds it in epoch seconds.
+    t_start = EpochTime()
+    #: The earliest `t_ends` of the task's scheduler events, or None; `_t_end` holds it in epoch seconds.
+    t_end = EpochTime()
 
-    workers: List[str]
-    initiated: bool = False
+    #: The workers involved with this task, in order of first appearance. Used as an ordered set; the values are unused.
+    workers: Dict[str, None]
+    initiated: bool
 
     def __init__(self, first_event: Optional[Event]):
         self.events = []
-        self.workers = []
+        self.workers = {}
+        self._t_start = NAN
+        self._t_end = NAN
+        self.initiated = False
+        #: The WXferEvents already in `events`, so duplicates are found without scanning the list.
+        self._wxfer_events: Set[WXferEvent] = set()
 
         if first_event is not None:
             if isinstance(first_event, SchedulerEvent):
@@ -46,54 +65,75 @@ class Task:
         if isinstance(event_inp, SchedulerEvent):
             self.add_scheduler_event(event_inp)
         elif isinstance(event_inp, WXferEvent):
-            if event_inp not in self.events:
+            if event_inp not in self._wxfer_events:
                 self.add_wxfer_event(event_inp)
         elif isinstance(event_inp, WorkerEvent):
             self.add_worker_event(event_inp)
         else:
             raise ValueError("Unexpected Event Type in Task.add_event()")
 
-    def add_wxfer_event(self, event_inp: WXferEvent) -> None:
-        worker_req = event_inp.requestor
-        worker_ful = event_inp.fulfiller
+    def add_events(self, events: Iterable[Event]) -> None:
+        """Adds every provided event to this task, in order, as if :meth:`add_event` were called on each.
+
+        :param events: The events to add.
+        :type events: Iterable[Event]
+        """
+        for e in events:
+            self.add_event(e)
+
+    def add_events_in_order(self, events: Iterable[Event]) -> None:
+        """Adds the provided events like :meth:`add_events`, keeping `events` in time order.
+
+        The existing events must already be in time order. New events are placed after existing events with the
+        same time and keep their relative order among themselves, so the result is the same as calling
+        :meth:`add_events` followed by :meth:`sort_events_by_time`. Events that arrive in time order are simply
+        appended.
 
-        if worker_req not in self.workers:
-            self.workers.append(worker_req)
-        if worker_ful not in self.workers:
-            self.workers.append(worker_ful)
+        :param events: The events to add.
+        :type events: Iterable[Event]
+        """
+        n_before = len(self.events)
+        self.add_events(events)
+        events = self.events
+        if len(events) - n_before > 1:
+            tail = events[n_before:]
+            tail.sort(key=_event_time)
+            events[n_before:] = tail
+        if 0 < n_before < len(events) and events[n_before]._t_event < events[n_before - 1]._t_event:
+            # both runs are in order, so the stable sort only has to merge them.
+            events.sort(key=_event_time)
+
+    def add_wxfer_event(self, event_inp: WXferEvent) -> None:
+        # re-adding a known worker keeps its original position.
+        self.workers[event_inp.requestor] = None
+        self.workers[event_inp.fulfiller] = None
 
         self.events.append(event_inp)
+        self._wxfer_events.add(event_inp)
 
     def add_worker_event(self, event_inp: WorkerEvent) -> None:
-        worker_inp = event_inp.ip
-        if worker_inp not in self.workers:
-            self.workers.append(worker_inp)
+        self.workers[event_inp.ip] = None
 
         self.events.append(event_inp)
 
     def add_scheduler_event(self, event_inp: SchedulerEvent) -> None:
         self.events.append(event_inp)
 
-        if event_inp.t_begins is not None:
-            if self.t_start is None:
-                self.t_start = event_inp.t_begins
-            else:
-                if event_inp.t_begins < self.t_start:
-                    self.t_start = event_inp.t_begins
+        # on epoch floats, NaN stands for a missing time: it never replaces a known one, and is always replaced.
+        t_begins = event_inp._t_begins
+        if t_begins == t_begins and not self._t_start <= t_begins:
+            self._t_start = t_begins
 
-        if event_inp.t_ends is not None:
-            if self.t_end is None:
-                self.t_end = event_inp.t_ends
-            else:
-                if event_inp.t_ends < self.t_end:
-                    self.t_end = event_inp.t_ends
+        t_ends = event_inp._t_ends
+        if t_ends == t_ends and not self._t_end <= t_ends:
+            self._t_end = t_ends
 
     def sort_events_by_time(self) -> None:
         """Sorts `events` to be in time order.
 
         Compares events using their `time` attributes to list events in the order the message was sent to MOFKA.
         """
-        self.events.sort(key=lambda x: x.t_event)
+        self.events.sort(key=_event_time)
 
     def return_wxfer_events(self, filter_type: Optional[TransferTypeEnum] = None) -> List[WXferEvent]:
         """Returns a list of worker transfer events associated with the Task.
@@ -114,26 +154,76 @@ class Task:
                     output.append(e)
         return output
 
-    def __str__(self) -> str:
-        event_strs = ""
-        for e in self.events:
-            event_strs += e.__str__()
+    def iter_str(self) -> Iterator[str]:
+        """Yields the text of :meth:`__str__` in pieces, one event at a time, so it can be written out without
+        building the whole string first.
 
-        out = "Task object for task {e.name}:\n".format(e=self)
-        out += "\tEvent objects:\n\t\t{event_info}".format(event_info="\n\t\t".join(event_strs.split("\n")))
-        out = out.strip()
-        out += "\n\tStart time: {e.t_start}\tEnd time: {e.t_end}\n".format(e=self)
+        :return: Pieces that concatenate to `str(task)`.
+        :rtype: Iterator[str]
+        """
+        # the text of every event is indented by two tabs, and trailing whitespace after the last one is dropped.
+        pending = "Task object for task {e.name}:\n\tEvent objects:\n\t\t".format(e=self)
+        for e in self.events:
+            text = e.__str__().replace("\n", "\n\t\t")
+            if text and not text.isspace():
+                yield pending
+                pending = text
+            else:
+                pending += text
+        yield pending.rstrip()
+        yield "\n\tStart time: {e.t_start}\tEnd time: {e.t_end}\n".format(e=self)
 
-        return out
+    def __str__(self) -> str:
+        return "".join(self.iter_str())
 
 
 class TaskHandler:
     tasks: Dict[str, Task]
+    #: Pool of the task keys, IP addresses and stimulus ids seen so far, so every event shares one copy of each.
+    strings: Dict[str, str]
+    #: Whether every task keeps its events in time order as they are added, see :meth:`sort_tasks_by_time`.
+    sorted: bool = False
 
-    def __init__(self):
+    def __init__(self, sorted: bool = False):
+        """
+        :param sorted: Keep the events of every task in time order while they are added, so no separate sort is
+            needed before writing output. Defaults to False, which appends events in the order they are added
+            until :meth:`sort_tasks_by_time` is called.
+        :type sorted: bool, optional
+        """
         self.tasks = {}
+        self.strings = {}
+        self.sorted = sorted
+        #: Keys of the tasks that received events since the last sort, see :meth:`sort_touched_tasks`.
+        self._touched: Set[Hashable] = set()
+        self._time_index: Optional[TimeIndex] = None
+        self._event_index: Optional[EventIndex] = None
+
+    def __getstate__(self) -> Dict:
+        # the event index refers back to the handler and is cheap to rebuild, so it is not pickled.
+        state = self.__dict__.copy()
+        state["_event_index"] = None
+        return state
+
+    def _intern(self, value):
+        if type(value) is str:
+            return self.strings.setdefault(value, value)
+        return value
+
+    def _intern_event(self, event: Event) -> None:
+        if isinstance(event, WXferEvent):
+            event.requestor = self._intern(event.requestor)
+            event.fulfiller = self._intern(event.fulfiller)
+        else:
+            event.key = self._intern(event.key)
+            event.ip = self._intern(event.ip)
+            if isinstance(event, SchedulerEvent):
+                event.stimulus_id = self._intern(event.stimulus_id)
 
     def add_event(self, event: Event) -> None:
+        self._time_index = None
+        self._event_index = None
+        self._intern_event(event)
         if type(event) is SchedulerEvent:
             self._inner_add_event(event.key, event)
         elif type(event) is WXferEvent:
@@ -149,22 +239,122 @@ class TaskHandler:
         else:
             raise NotImplementedError("Unknown type handed to TaskHandler.")
 
+    def add_df(self, eventtype: type, data: pd.DataFrame) -> None:
+        """Adds one event of type `eventtype` per row of the provided dataframe.
+
+        Columns are converted in bulk through `eventtype.from_df`, and events that belong to a single
+        task are grouped by key so each task is looked up once. The resulting TaskHandler is identical
+        to calling :meth:`add_event` on every row in order.
+
+        :param eventtype: One of :class:`SchedulerEvent`, :class:`WorkerEvent` or :class:`WXferEvent`.
+        :type eventtype: type
+        :param data: The dataframe read from the corresponding Mofka-Dask csv file.
+        :type data: pd.DataFrame
+        """
+        self._time_index = None
+        self._event_index = None
+        events: List[Event] = eventtype.from_df(data, self.strings)
+
+        if eventtype is WXferEvent:
+            # Transfer events can belong to several tasks at once, so they can't be grouped by one key column.
+            for e in events:
+                self.add_event(e)
+        elif eventtype is SchedulerEvent or eventtype is WorkerEvent:
+            self._add_grouped([e.key for e in events], events, data["time"].to_numpy(dtype=np.float64))
+        else:
+            raise NotImplementedError("Unknown type handed to TaskHandler.")
+
+    def _add_grouped(self, keys: Sequence[Hashable], events: List[Event], t_event: np.ndarray) -> None:
+        if len(events) == 0:
+            return
+
+        codes, uniques = pd.factorize(pd.Series(keys, dtype=object), use_na_sentinel=False)
+        order = np.argsort(codes, kind="stable")
+        bounds = np.flatnonzero(np.diff(codes[order])) + 1
+        starts = np.concatenate(([0], bounds))
+        ends = np.concatenate((bounds, [len(order)]))
+
+        if self.sorted:
+            # which groups are out of time order, found for all of them at once.
+            t = t_event[order]
+            group_of = np.repeat(np.arange(len(starts)), ends - starts)
+            descending = (t[1:] < t[:-1]) & (group_of[1:] == group_of[:-1])
+            unsorted = np.zeros(len(starts), dtype=bool)
+            unsorted[group_of[1:][descending]] = True
+
+        # groups are visited in order of first appearance, matching the row-by-row insertion order.
+        for i_group, (code_start, code_end) in enumerate(zip(starts, ends)):
+            idxs = order[code_start:code_end]
+            group = [events[i] for i in idxs]
+            id = keys[idxs[0]]
+            self._touched.add(id)
+            if id not in self.tasks.keys():
+                task = self.tasks[id] = Task(group[0])
+                n_before = 0
+                task.add_events(group[1:])
+            else:
+                task = self.tasks[id]
+                n_before = len(task.events)
+                task.add_events(group)
+            if self.sorted and (unsorted[i_group] or 0 < n_before < len(task.events) and
+                                task.events[n_before]._t_event < task.events[n_before - 1]._t_event):
+                task.sort_events_by_time()
+
     def _inner_add_event(self, id: str, event: Event):
+        self._touched.add(id)
         if id not in self.tasks.keys():
             temp_task = Task(event)
             self.tasks[id] = temp_task
+        elif self.sorted:
+            self.tasks[id].add_events_in_order((event,))
         else:
             self.tasks[id].add_event(event)
 
+    def merge(self, other: 'TaskHandler') -> None:
+        """Adds every event of `other` to this TaskHandler, as if its events had been passed to :meth:`add_event` after this handler's own.
+
+        This combines partial TaskHandlers built from different files (or different row ranges of one file) in
+        the order the files would have been read sequentially. Duplicate WXferEvents are dropped and
+        `Task.t_start`/`Task.t_end` are reconciled exactly like :meth:`add_event` would. Tasks only known to `other`
+        are moved over, so `other` should not be used afterwards. The task keys, IP addresses and stimulus ids of
+        `other` are interned into this handler's :attr:`strings` as they are moved, so merged handlers keep one copy
+        of each string.
+
+        When this handler is :attr:`sorted`, the events of both handlers are merged in time order, ties keeping
+        this handler's events first; tasks of an unsorted `other` are sorted as they are moved over.
+
+        :param other: The TaskHandler whose events come after this one's.
+        :type other: TaskHandler
+        """
+        self._time_index = None
+        self._event_index = None
+        for id, task in other.tasks.items():
+            for e in task.events:
+                self._intern_event(e)
+            id = self._intern(id)
+            self._touched.add(id)
+            if id not in self.tasks.keys():
+                if self.sorted and not other.sorted:
+                    task.sort_events_by_time()
+                task.name = self._intern(task.name)
+                task.workers = {self._intern(w): None for w in task.workers}
+                self.tasks[id] = task
+            elif self.sorted:
+                self.tasks[id].add_events_in_order(task.events)
+            else:
+                self.tasks[id].add_events(task.events)
+
     def return_names(self) -> List[str]:
         return list(self.tasks.keys())
 
     def return_all_wxfer_events(self, filter_type: Optional[TransferTypeEnum] = None) -> List[WXferEvent]:
         output: List[WXferEvent] = []
+        seen: Set[WXferEvent] = set()
         for t in self.tasks.values():
             returned = t.return_wxfer_events(filter_type)
             for r in returned:
-                if r not in output:
+                if r not in seen:
+                    seen.add(r)
                     output.append(r)
 
         return output
@@ -193,38 +383,249 @@ class TaskHandler:
 
     def sort_tasks_by_time(self) -> None:
         """Instructs all stored tasks to sort their events by time.
+
+        Afterwards the handler is :attr:`sorted`: events added later are merged into each task in time order as
+        they arrive, and calling this again does nothing. Events added to a :class:`Task` directly, instead of
+        through this handler, are not kept in order.
+        """
+        if not self.sorted:
+            for k, v in self.tasks.items():
+                v.sort_events_by_time()
+            self.sorted = True
+        self._touched.clear()
+
+    def sort_touched_tasks(self) -> None:
+        """Sorts the events of only those tasks that received events since the last sort.
+
+        Tasks that were not touched are still in time order, so the result is the same as :meth:`sort_tasks_by_time`
+        at a cost that depends on the new events rather than on the whole handler. Events added to a
+        :class:`Task` directly, instead of through this handler, are not tracked. A :attr:`sorted` handler has
+        nothing to sort.
+        """
+        if not self.sorted:
+            for id in self._touched:
+                self.tasks[id].sort_events_by_time()
+        self._touched.clear()
+
+    def to_df(self, key_parts: bool = False) -> Dict[EventTypeEnum, pd.DataFrame]:
+        """Builds one dataframe per event type, see :func:`tasks_to_df`.
+
+        :param key_parts: Add the name, prefix, token and chunk indices of every key as categorical columns (see
+            :func:`~dask_md_helpers.decompose_keys`), defaults to False.
+        :type key_parts: bool, optional
+        :rtype: Dict[EventTypeEnum, pd.DataFrame]
+        """
+        return tasks_to_df(self.tasks.values(), key_parts)
+
+    def time_index(self) -> TimeIndex:
+        """Returns the index of the time spans of every task and transfer, building it on first use.
+
+        Tasks span from `Task.t_start` to `Task.t_end` and involve `Task.workers`; tasks missing either time (or
+        ending before they start) are left out. Transfers span from `WXferEvent.start` to `WXferEvent.stop` and
+        involve their requestor and fulfiller. The index is rebuilt after events are added through this handler.
+
+        :return: The index, see :class:`~dask_md_objs.timeindex.TimeIndex` for its queries.
+        :rtype: TimeIndex
+        """
+        if getattr(self, "_time_index", None) is not None:
+            return self._time_index
+
+        kinds, begins, ends, keys, worker_rows, worker_names = [], [], [], [], [], []
+        for id, task in self.tasks.items():
+            if task._t_end >= task._t_start:  # False for NaN on either side
+                for w in task.workers:
+                    worker_rows.append(len(kinds))
+                    worker_names.append(w)
+                kinds.append("task")
+                begins.append(task._t_start)
+                ends.append(task._t_end)
+                keys.append(id)
+        for e in self.return_all_wxfer_events():
+            if e._start == e._start and e._stop == e._stop:
+                worker_rows.extend((len(kinds), len(kinds)))
+                worker_names.extend((e.requestor, e.fulfiller))
+                kinds.append("transfer")
+                begins.append(e._start)
+                ends.append(e._stop)
+                keys.append(tuple(e.return_key_names()))
+        self._time_index = TimeIndex(kinds, begins, ends, keys, worker_rows, worker_names)
+        return self._time_index
+
+    def event_index(self) -> EventIndex:
+        """Returns the posting lists of every event by worker, finish state, event type, key prefix and task.
+
+        The index is built with one pass over the events the first time it is used, and kept until events are added
+        through this handler; queries then only touch the posting lists they filter on. Transfers are listed under
+        every task they belong to and indexed under both their requestor and fulfiller.
+
+        :return: The index, see :class:`~dask_md_objs.query.EventIndex`.
+        :rtype: EventIndex
         """
-        for k, v in self.tasks.items():
-            v.sort_events_by_time()
-
-    def to_df(self) -> Dict[EventTypeEnum, pd.DataFrame]:
-        out: Dict[EventTypeEnum, pd.DataFrame] = {}
-        # want to output 3 dataframes, 1 for each type of event
-        # go task by task and add its events as rows to the df
-        # start by just collecting a list of lists then turn into a df for speed, ig?
-
-        scheduler = []
-        worker = []
-        wxfer = []
-
-        for (_, t) in self.tasks.items():
-            for e in t.events:
-                match e.e_type:
-                    case EventTypeEnum.SCHEDULER:
-                        scheduler.append(e)
-                    case EventTypeEnum.WORKER:
-                        worker.append(e)
-                    case EventTypeEnum.WORKER_TRANSFER:
-                        # We only want to add each wxfer event once per task
-                        # this way we know which key to include, so we don't
-                        # iterate over every key for every wxfer event,
-                        # while also still having 1 entry per key per wxfer event.
-                        wxfer.append((t.name, e))
-                    case _:
-                        raise ValueError("Unknown event type %s encountered while the TaskHandler tried to create a dataframe." % (e.e_type))
-
-        out[EventTypeEnum.SCHEDULER] = SchedulerEvent.to_df(scheduler)
-        out[EventTypeEnum.WORKER] = WorkerEvent.to_df(worker)
-        out[EventTypeEnum.WORKER_TRANSFER] = WXferEvent.to_df(wxfer)
-
-        return out
+        if getattr(self, "_event_index", None) is not None:
+            return self._event_index
+
+        task_codes, type_codes, ip_codes, peer_codes, finish_codes, times, source_rows = [], [], [], [], [], [], []
+        ips: Dict[Hashable, int] = {}
+        sched: List[SchedulerEvent] = []
+        worker: List[WorkerEvent] = []
+        wxfer: List[Tuple[str, WXferEvent]] = []
+        for code, task in enumerate(self.tasks.values()):
+            for e in task.events:
+                if type(e) is SchedulerEvent or type(e) is WorkerEvent:
+                    target = sched if type(e) is SchedulerEvent else worker
+                    type_codes.append(0 if type(e) is SchedulerEvent else 1)
+                    ip_codes.append(ips.setdefault(e.ip, len(ips)))
+                    peer_codes.append(-1)
+                    finish_codes.append(STATE_CODES[e.finish])
+                    source_rows.append(len(target))
+                    target.append(e)
+                elif type(e) is WXferEvent:
+                    type_codes.append(2)
+                    ip_codes.append(ips.setdefault(e.requestor, len(ips)))
+                    peer_codes.append(ips.setdefault(e.fulfiller, len(ips)))
+                    finish_codes.append(-1)
+                    source_rows.append(len(wxfer))
+                    wxfer.append((task.name, e))
+                else:
+                    raise NotImplementedError("Unknown type handed to TaskHandler.")
+                task_codes.append(code)
+                times.append(e._t_event)
+
+        def frames(event_type: EventTypeEnum, rows: np.ndarray) -> pd.DataFrame:
+            if event_type is EventTypeEnum.SCHEDULER:
+                return SchedulerEvent.to_df([sched[r] for r in rows])
+            if event_type is EventTypeEnum.WORKER:
+                return WorkerEvent.to_df([worker[r] for r in rows])
+            return WXferEvent.to_df([wxfer[r] for r in rows])
+
+        self._event_index = EventIndex(task_codes, list(self.tasks), type_codes, ip_codes, peer_codes, list(ips),
+                                       finish_codes, times, source_rows, frames)
+        return self._event_index
+
+    def query(self) -> Query:
+        """Returns a query over every event, to be narrowed down by worker, state, event type, prefix, task and time.
+
+        For example, `th.query().worker(ip).state(TaskState.MEMORY).between(t0, t1).tasks()` lists the tasks that
+        reached memory on a worker within a time window, and `.events()` the matching events as dataframes. See
+        :class:`~dask_md_objs.query.Query`; the index behind it is built on first use, see :meth:`event_index`.
+
+        :rtype: Query
+        """
+        return Query(self.event_index(), tasks=self.get_task_by_name)
+
+    def transfers(self) -> pd.DataFrame:
+        """Lists every distinct transfer event as one table, in the order of :meth:`return_all_wxfer_events`.
+
+        :return: One row per transfer with the columns of :data:`~dask_md_objs.transfers.TRANSFER_COLUMNS`; times
+            are epoch seconds.
+        :rtype: pd.DataFrame
+        """
+        events = self.return_all_wxfer_events()
+        codes = {t: i for i, t in enumerate(TransferTypeEnum)}
+
+        worker_codes, workers = pd.factorize(pd.Series([e.requestor for e in events] + [e.fulfiller for e in events],
+                                                       dtype=object), use_na_sentinel=False)
+        return wxfers.make_transfers(worker_codes[:len(events)], worker_codes[len(events):], workers,
+                                     [codes[e.transfer_type] for e in events], [e.total for e in events],
+                                     [e.bandwidth for e in events], [e.duration for e in events],
+                                     [e._start for e in events], [e._stop for e in events])
+
+    def transfer_matrix(self, transfer_type: Optional[TransferTypeEnum] = TransferTypeEnum.INCOMING,
+                        bins=None, quantile: float = 0.95) -> wxfers.TransferMatrix:
+        """Returns the worker×worker matrix of bytes, counts and bandwidth of the transfers.
+
+        For example, `th.transfer_matrix().to_df().nlargest(10, "bytes")` lists the busiest links. See
+        :func:`~dask_md_objs.transfers.transfer_matrix` for the parameters.
+        """
+        return wxfers.transfer_matrix(self.transfers(), transfer_type, bins, quantile)
+
+    def transitions(self) -> pd.DataFrame:
+        """Lists the scheduler and worker transitions of every task as one table.
+
+        This is the only step that visits events one by one; :meth:`state_intervals`, :meth:`state_durations`
+        and :meth:`lifecycles` work on the table with array operations.
+
+        :return: One row per transition with the columns of :data:`~dask_md_objs.metrics.TRANSITION_COLUMNS`:
+            the task key, the "scheduler" or "worker" source, the ip that recorded it, the start and finish state,
+            the event time in epoch seconds and a sequence number ordering the events of each task.
+        :rtype: pd.DataFrame
+        """
+        keys, sources, ips, starts, finishes, times = [], [], [], [], [], []
+        for id, task in self.tasks.items():
+            for e in task.events:
+                if type(e) is SchedulerEvent or type(e) is WorkerEvent:
+                    keys.append(id)
+                    sources.append(type(e) is WorkerEvent)
+                    ips.append(e.ip)
+                    starts.append(STATE_CODES[e.start])
+                    finishes.append(STATE_CODES[e.finish])
+                    times.append(e._t_event)
+        key_codes, key_values = pd.factorize(pd.Series(keys, dtype=object), use_na_sentinel=False)
+        ip_codes, ip_values = pd.factorize(pd.Series(ips, dtype=object), use_na_sentinel=False)
+        return metrics.make_transitions(key_codes, key_values, sources, ip_codes, ip_values, starts, finishes, times,
+                                        np.arange(len(keys)))
+
+    def state_intervals(self) -> pd.DataFrame:
+        """Returns the intervals every task spent in each state, see :func:`~dask_md_objs.metrics.state_intervals`."""
+        return metrics.state_intervals(self.transitions())
+
+    def state_durations(self, source: str = "scheduler", by: str = "task", agg: str = "sum") -> pd.DataFrame:
+        """Returns the time spent in each state per task, key prefix or worker.
+
+        For example, `th.state_durations("worker", by="prefix")["executing"]` is the total execution time of every
+        key prefix. See :func:`~dask_md_objs.metrics.state_durations` for the parameters.
+        """
+        return metrics.state_durations(self.transitions(), source, by, agg)
+
+    def lifecycles(self) -> pd.DataFrame:
+        """Returns the first and last transition time and transition counts of every task, see
+        :func:`~dask_md_objs.metrics.lifecycles`."""
+        return metrics.lifecycles(self.transitions())
+
+
+def tasks_to_df(tasks: Iterable[Task], key_parts: bool = False) -> Dict[EventTypeEnum, pd.DataFrame]:
+    """Builds one dataframe per event type from the events of the provided tasks, in task order.
+
+    :param tasks: The tasks to include, e.g. `TaskHandler.tasks.values()`.
+    :type tasks: Iterable[Task]
+    :param key_parts: Add the columns of :func:`~dask_md_helpers.decompose_keys` for the "key" column, defaults to
+        False.
+    :type key_parts: bool, optional
+    :return: A dataframe of :class:`SchedulerEvent` s, one of :class:`WorkerEvent` s and one of :class:`WXferEvent` s.
+    :rtype: Dict[EventTypeEnum, pd.DataFrame]
+    """
+    out: Dict[EventTypeEnum, pd.DataFrame] = {}
+    # want to output 3 dataframes, 1 for each type of event: collect the events of each type in task order, then
+    # build every dataframe column by column.
+    scheduler: List[SchedulerEvent] = []
+    worker: List[WorkerEvent] = []
+    wxfer: List[tuple] = []
+    # dispatching on the class is much cheaper than hashing the `e_type` enum of every event.
+    by_class = {SchedulerEvent: scheduler.append, WorkerEvent: worker.append}
+
+    for t in tasks:
+        for e in t.events:
+            add = by_class.get(type(e))
+            if add is not None:
+                add(e)
+            elif e.e_type is EventTypeEnum.SCHEDULER:
+                scheduler.append(e)
+            elif e.e_type is EventTypeEnum.WORKER:
+                worker.append(e)
+            elif e.e_type is EventTypeEnum.WORKER_TRANSFER:
+                # We only want to add each wxfer event once per task
+                # this way we know which key to include, so we don't
+                # iterate over every key for every wxfer event,
+                # while also still having 1 entry per key per wxfer event.
+                wxfer.append((t.name, e))
+            else:
+                raise ValueError("Unknown event type %s encountered while the TaskHandler tried to create a dataframe." % (e.e_type))
+
+    out[EventTypeEnum.SCHEDULER] = SchedulerEvent.to_df(scheduler)
+    out[EventTypeEnum.WORKER] = WorkerEvent.to_df(worker)
+    out[EventTypeEnum.WORKER_TRANSFER] = WXferEvent.to_df(wxfer)
+
+    if key_parts:
+        for event_type, df in out.items():
+            out[event_type] = pd.concat([df, decompose_keys(df["key"])], axis=1)
+    return out
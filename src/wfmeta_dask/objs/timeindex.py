@@ -0,0 +1,189 @@
+"""Time index over the spans of tasks and transfers, for "what was active at time t" queries.
+
+A :class:`TimeIndex` holds one interval per task (from `Task.t_start` to `Task.t_end`) and one per transfer (from
+`WXferEvent.start` to `WXferEvent.stop`), each with the workers involved. Intervals are sorted by their start and
+covered by a static max-end tree, so stabbing and overlap queries only descend into the parts of the tree that can
+contain matches: a query costs O(log n) plus a logarithmic factor per match, instead of a scan over every task.
+Times are epoch seconds.
+"""
+from datetime import datetime
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+from .enums import EventTypeEnum
+
+#: The kinds of intervals, and the event type each is filtered with.
+KINDS: Dict[EventTypeEnum, str] = {EventTypeEnum.SCHEDULER: "task", EventTypeEnum.WORKER_TRANSFER: "transfer"}
+
+Time = Union[float, datetime]
+
+
+def _seconds(t: Time) -> float:
+    return t.timestamp() if isinstance(t, datetime) else float(t)
+
+
+class _IntervalTree:
+    """Intervals sorted by start, with the maximum end of every power-of-two block of them."""
+
+    def __init__(self, starts: np.ndarray, ends: np.ndarray, ids: np.ndarray):
+        # intervals with a missing endpoint can never match.
+        known = ~(np.isnan(starts) | np.isnan(ends))
+        starts, ends, ids = starts[known], ends[known], ids[known]
+        order = np.argsort(starts, kind="stable")
+        self.starts = starts[order]
+        self.ids = ids[order]
+        self.sorted_ends = np.sort(ends)
+
+        size = 1
+        while size < len(order):
+            size *= 2
+        leaves = np.full(size, -np.inf)
+        leaves[:len(order)] = ends[order]
+        #: levels[0] is the root, levels[-1] the leaves.
+        self.levels: List[np.ndarray] = [leaves]
+        while len(self.levels[0]) > 1:
+            self.levels.insert(0, self.levels[0].reshape(-1, 2).max(axis=1))
+
+    def overlapping(self, lo: float, hi: float) -> np.ndarray:
+        """Returns the ids of the intervals with start <= hi and end >= lo, in order of their start."""
+        n_candidates = np.searchsorted(self.starts, hi, side="right")
+        if n_candidates == 0:
+            return self.ids[:0]
+        nodes = np.zeros(1, dtype=np.int64)
+        width = len(self.levels[-1])
+        for level in self.levels:
+            # a node covers leaves [node * width, (node + 1) * width); only those starting before hi can match.
+            keep = (level[nodes] >= lo) & (nodes * width < n_candidates)
+            nodes = nodes[keep]
+            if width == 1 or len(nodes) == 0:
+                break
+            nodes = np.stack((2 * nodes, 2 * nodes + 1), axis=1).reshape(-1)
+            width //= 2
+        return self.ids[nodes]
+
+    def count(self, times: np.ndarray) -> np.ndarray:
+        """Returns how many intervals contain each of `times`, without listing them."""
+        return np.searchsorted(self.starts, times, side="right") - np.searchsorted(self.sorted_ends, times, side="left")
+
+
+class TimeIndex:
+    """Index of the time spans of tasks and transfers, built once per handler.
+
+    Use :meth:`TaskHandler.time_index <dask_md_objs.TaskHandler.time_index>` rather than constructing one directly.
+    Queries can be restricted to one event type (:attr:`EventTypeEnum.SCHEDULER` for task spans, which come from
+    the scheduler's begin and end times, or :attr:`EventTypeEnum.WORKER_TRANSFER` for transfers) and to the
+    intervals a given worker took part in. A separate tree is built the first time each filter is used.
+    """
+    #: Interval kind of every row, "task" or "transfer".
+    kinds: np.ndarray
+    t_begin: np.ndarray
+    t_end: np.ndarray
+    #: The task key of task rows, and the tuple of transferred keys of transfer rows.
+    keys: np.ndarray
+
+    def __init__(self, kinds: npt.ArrayLike, t_begin: npt.ArrayLike, t_end: npt.ArrayLike, keys: Sequence[Hashable],
+                 worker_rows: npt.ArrayLike, worker_names: Sequence[Hashable]):
+        """
+        :param kinds: "task" or "transfer" for every interval.
+        :type kinds: array-like of str
+        :param t_begin: Start of every interval, in epoch seconds.
+        :type t_begin: array-like of float
+        :param t_end: End of every interval, in epoch seconds.
+        :type t_end: array-like of float
+        :param keys: The task key (or keys) of every interval.
+        :type keys: Sequence[Hashable]
+        :param worker_rows: Together with `worker_names`, which workers took part in which interval: the interval
+            `worker_rows[i]` involved worker `worker_names[i]`.
+        :type worker_rows: array-like of int
+        :param worker_names: See `worker_rows`.
+        :type worker_names: Sequence[Hashable]
+        :raises ValueError: when the columns differ in length.
+        """
+        self.kinds = np.asarray(kinds, dtype=object)
+        self.t_begin = np.asarray(t_begin, dtype=np.float64)
+        self.t_end = np.asarray(t_end, dtype=np.float64)
+        self.keys = np.empty(len(keys), dtype=object)
+        self.keys[:] = list(keys)
+        if not len(self.kinds) == len(self.t_begin) == len(self.t_end) == len(self.keys):
+            raise ValueError("All columns of a TimeIndex must have one entry per interval.")
+        if len(worker_rows) != len(worker_names):
+            raise ValueError("worker_rows and worker_names must have the same length.")
+
+        # worker membership sorted by worker, so the intervals of one worker are a contiguous slice.
+        codes, self.workers = pd.factorize(pd.Series(list(worker_names), dtype=object), use_na_sentinel=False)
+        order = np.lexsort((np.asarray(worker_rows, dtype=np.int64), codes))
+        pairs = np.stack((codes[order], np.asarray(worker_rows, dtype=np.int64)[order]), axis=1)
+        distinct = np.concatenate(([True], (pairs[1:] != pairs[:-1]).any(axis=1))) if len(pairs) > 0 else []
+        pairs = pairs[distinct]
+        self._worker_rows = pairs[:, 1]
+        self._worker_offsets = np.searchsorted(pairs[:, 0], np.arange(len(self.workers) + 1))
+        self._worker_codes = {w: i for i, w in enumerate(self.workers)}
+
+        self._trees: Dict[Tuple[Optional[str], Optional[Hashable]], _IntervalTree] = {}
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def rows_of_worker(self, worker: Hashable) -> np.ndarray:
+        """Returns the rows of the intervals `worker` took part in, or none for an unknown worker."""
+        code = self._worker_codes.get(worker)
+        if code is None:
+            return np.empty(0, dtype=np.int64)
+        return self._worker_rows[self._worker_offsets[code]:self._worker_offsets[code + 1]]
+
+    def _tree(self, event_type: Optional[EventTypeEnum], worker: Optional[Hashable]) -> _IntervalTree:
+        if event_type is not None and event_type not in KINDS:
+            raise ValueError("The time index has no intervals of event type {t}; use one of {k}.".format(
+                t=event_type, k=list(KINDS)))
+        kind = KINDS[event_type] if event_type is not None else None
+        tree = self._trees.get((kind, worker))
+        if tree is None:
+            rows = np.arange(len(self)) if worker is None else self.rows_of_worker(worker)
+            if kind is not None:
+                rows = rows[self.kinds[rows] == kind]
+            tree = _IntervalTree(self.t_begin[rows], self.t_end[rows], rows)
+            self._trees[(kind, worker)] = tree
+        return tree
+
+    def overlapping(self, t_begin: Time, t_end: Time, event_type: Optional[EventTypeEnum] = None,
+                    worker: Optional[Hashable] = None) -> np.ndarray:
+        """Returns the rows of the intervals that overlap the window [t_begin, t_end], ends included.
+
+        :param t_begin: Start of the window, as epoch seconds or a `datetime`.
+        :type t_begin: float or datetime
+        :param t_end: End of the window, as epoch seconds or a `datetime`.
+        :type t_end: float or datetime
+        :param event_type: Only return task spans (:attr:`EventTypeEnum.SCHEDULER`) or transfers
+            (:attr:`EventTypeEnum.WORKER_TRANSFER`), defaults to None (both).
+        :type event_type: :class:`~dask_md_objs.EventTypeEnum`, optional
+        :param worker: Only return intervals this worker took part in, defaults to None (any worker).
+        :type worker: Hashable, optional
+        :raises ValueError: when `event_type` is :attr:`EventTypeEnum.WORKER`, which has no intervals.
+        :return: Row numbers into this index, in order of interval start; see :meth:`to_df`.
+        :rtype: np.ndarray
+        """
+        return self._tree(event_type, worker).overlapping(_seconds(t_begin), _seconds(t_end))
+
+    def at(self, t: Time, event_type: Optional[EventTypeEnum] = None, worker: Optional[Hashable] = None) -> np.ndarray:
+        """Returns the rows of the intervals active at time `t`; see :meth:`overlapping` for the parameters."""
+        return self.overlapping(t, t, event_type, worker)
+
+    def concurrency(self, times: npt.ArrayLike, event_type: Optional[EventTypeEnum] = None,
+                    worker: Optional[Hashable] = None) -> np.ndarray:
+        """Counts the intervals active at each of `times`, e.g. to plot how many tasks ran over time.
+
+        :param times: The times to count at, in epoch seconds.
+        :type times: array-like of float
+        :return: The number of active intervals at every time.
+        :rtype: np.ndarray
+        """
+        return self._tree(event_type, worker).count(np.asarray(times, dtype=np.float64))
+
+    def to_df(self, rows: Optional[npt.ArrayLike] = None) -> pd.DataFrame:
+        """Returns the given rows (all by default) as a dataframe of "kind", "key", "t_begin" and "t_end"."""
+        rows = np.arange(len(self)) if rows is None else np.asarray(rows, dtype=np.int64)
+        return pd.DataFrame({"kind": self.kinds[rows], "key": self.keys[rows], "t_begin": self.t_begin[rows],
+                             "t_end": self.t_end[rows]}, index=pd.Index(rows, name="row"))
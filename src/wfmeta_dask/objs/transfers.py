@@ -0,0 +1,260 @@
+"""Worker-to-worker transfer matrices.
+
+Both task handlers can list their (deduplicated) transfer events as one table (see
+:meth:`~dask_md_objs.TaskHandler.transfers`). :func:`transfer_matrix` aggregates that table into a sparse
+sender×receiver matrix of bytes, transfer counts and bandwidth statistics, optionally per time window, with grouped
+array operations. The result can be turned into a long dataframe, dense arrays or (with scipy installed) scipy sparse
+matrices.
+"""
+from typing import Dict, Hashable, List, Optional, Sequence, Union
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+from .enums import TransferTypeEnum
+from .metrics import _packed_argsort
+
+#: Values of every :class:`~dask_md_objs.TransferTypeEnum`, in declaration order.
+TRANSFER_VALUES: List[str] = [t.value for t in TransferTypeEnum]
+#: The columns of a transfers table, and their dtypes.
+TRANSFER_COLUMNS: Dict[str, str] = {"requestor": "category", "fulfiller": "category", "transfer_type": "category",
+                                    "total": "int64", "bandwidth": "float64", "duration": "float64",
+                                    "start": "float64", "stop": "float64"}
+#: The aggregated fields of a :class:`TransferMatrix`.
+FIELDS: List[str] = ["bytes", "count", "duration", "mean_bandwidth", "p95_bandwidth"]
+
+
+def make_transfers(requestor_codes: npt.ArrayLike, fulfiller_codes: npt.ArrayLike, workers: Sequence[Hashable],
+                   transfer_type_codes: npt.ArrayLike, total: npt.ArrayLike, bandwidth: npt.ArrayLike,
+                   duration: npt.ArrayLike, start: npt.ArrayLike, stop: npt.ArrayLike) -> pd.DataFrame:
+    """Builds a transfers table from its columns.
+
+    Requestors and fulfillers are given as codes into `workers`, and transfer types as codes into
+    :data:`TRANSFER_VALUES`. Both worker columns share the same categories, so their codes can be compared.
+
+    :return: One row per transfer event, with the columns of :data:`TRANSFER_COLUMNS`.
+    :rtype: pd.DataFrame
+    """
+    categories = np.empty(len(workers), dtype=object)
+    categories[:] = list(workers)
+    categories = pd.Index(categories, dtype=object)
+    return pd.DataFrame({
+        "requestor": pd.Categorical.from_codes(np.asarray(requestor_codes, dtype=np.int32), categories=categories),
+        "fulfiller": pd.Categorical.from_codes(np.asarray(fulfiller_codes, dtype=np.int32), categories=categories),
+        "transfer_type": pd.Categorical.from_codes(np.asarray(transfer_type_codes, dtype=np.int8),
+                                                   categories=TRANSFER_VALUES),
+        "total": np.asarray(total, dtype=np.int64),
+        "bandwidth": np.asarray(bandwidth, dtype=np.float64),
+        "duration": np.asarray(duration, dtype=np.float64),
+        "start": np.asarray(start, dtype=np.float64),
+        "stop": np.asarray(stop, dtype=np.float64),
+    })
+
+
+def _group_quantile(values: np.ndarray, group: np.ndarray, n_groups: int, q: float) -> np.ndarray:
+    """Per-group quantile with the linear interpolation of `np.percentile`, NaN values ignored."""
+    known = ~np.isnan(values)
+    values, group = values[known], group[known]
+    # equal values are interchangeable, so only the grouping has to be stable.
+    order = np.argsort(values)
+    packed = _packed_argsort(group[order], n_groups)
+    order = order[packed] if packed is not None else order[np.argsort(group[order], kind="stable")]
+    values, group = values[order], group[order]
+    counts = np.bincount(group, minlength=n_groups)
+    first = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    out = np.full(n_groups, np.nan)
+    has = counts > 0
+    pos = (counts[has] - 1) * q
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, counts[has] - 1)
+    frac = pos - lo
+    v_lo = values[first[has] + lo]
+    v_hi = values[first[has] + hi]
+    out[has] = v_lo + frac * (v_hi - v_lo)
+    return out
+
+
+class TransferMatrix:
+    """A sparse sender×receiver matrix of aggregated transfers, in coordinate (COO) form.
+
+    Entry `i` aggregates the transfers from `workers[senders[i]]` to `workers[receivers[i]]` (in time window
+    `bins[i]`, when binned). Only pairs that exchanged data have an entry.
+    """
+    #: Every worker that sent or received data; rows and columns of the matrix.
+    workers: pd.Index
+    senders: np.ndarray
+    receivers: np.ndarray
+    #: Time window of every entry, or None when the matrix is not binned.
+    bins: Optional[np.ndarray]
+    #: Edges of the time windows (epoch seconds), or None.
+    bin_edges: Optional[np.ndarray]
+    #: The aggregated value of every entry, for every field of :data:`FIELDS`.
+    values: Dict[str, np.ndarray]
+
+    def __init__(self, workers: pd.Index, senders: np.ndarray, receivers: np.ndarray, values: Dict[str, np.ndarray],
+                 bins: Optional[np.ndarray] = None, bin_edges: Optional[np.ndarray] = None):
+        self.workers = workers
+        self.senders = senders
+        self.receivers = receivers
+        self.values = values
+        self.bins = bins
+        self.bin_edges = bin_edges
+
+    def __len__(self) -> int:
+        return len(self.senders)
+
+    @property
+    def shape(self) -> tuple:
+        return (len(self.workers), len(self.workers))
+
+    def _check_field(self, field: str) -> None:
+        if field not in self.values:
+            raise ValueError("Invalid field {f}; must be one of {v}.".format(f=field, v=list(self.values)))
+
+    def to_df(self) -> pd.DataFrame:
+        """Returns one row per entry, with "sender", "receiver", the "bin" and its "t_begin" when binned, and every
+        field."""
+        out = {"sender": self.workers[self.senders], "receiver": self.workers[self.receivers]}
+        if self.bins is not None:
+            out["bin"] = self.bins
+            out["t_begin"] = self.bin_edges[self.bins]
+        out.update(self.values)
+        return pd.DataFrame(out)
+
+    def dense(self, field: str = "bytes", fill: float = 0.0) -> np.ndarray:
+        """Returns `field` as a dense workers×workers array, or bins×workers×workers when binned.
+
+        Meant for small clusters; with hundreds of workers prefer :meth:`to_scipy` or :meth:`to_df`.
+
+        :param field: One of :data:`FIELDS`, defaults to "bytes".
+        :type field: str, optional
+        :param fill: Value of the pairs that did not exchange data, defaults to 0.0
+        :type fill: float, optional
+        :raises ValueError: when an invalid field is provided.
+        :rtype: np.ndarray
+        """
+        self._check_field(field)
+        if self.bins is None:
+            out = np.full(self.shape, fill, dtype=np.float64)
+            out[self.senders, self.receivers] = self.values[field]
+        else:
+            out = np.full((len(self.bin_edges) - 1,) + self.shape, fill, dtype=np.float64)
+            out[self.bins, self.senders, self.receivers] = self.values[field]
+        return out
+
+    def to_scipy(self, field: str = "bytes"):
+        """Returns `field` as a `scipy.sparse.coo_array` (one per time window when binned). Requires scipy.
+
+        :param field: One of :data:`FIELDS`, defaults to "bytes".
+        :type field: str, optional
+        :raises ImportError: when scipy is not installed.
+        :raises ValueError: when an invalid field is provided.
+        :rtype: scipy.sparse.coo_array or List[scipy.sparse.coo_array]
+        """
+        try:
+            from scipy import sparse
+        except ImportError as e:
+            raise ImportError("TransferMatrix.to_scipy requires scipy. "
+                              "Install it with `pip install wfmeta_dask[sparse]`.") from e
+        self._check_field(field)
+
+        if self.bins is None:
+            return sparse.coo_array((self.values[field], (self.senders, self.receivers)), shape=self.shape)
+        out = []
+        for b in range(len(self.bin_edges) - 1):
+            entries = self.bins == b
+            out.append(sparse.coo_array((self.values[field][entries], (self.senders[entries], self.receivers[entries])),
+                                        shape=self.shape))
+        return out
+
+
+def transfer_matrix(transfers: pd.DataFrame, transfer_type: Optional[TransferTypeEnum] = TransferTypeEnum.INCOMING,
+                    bins: Union[None, float, npt.ArrayLike] = None, quantile: float = 0.95) -> TransferMatrix:
+    """Aggregates transfers into a sender×receiver :class:`TransferMatrix`.
+
+    A transfer event is recorded by the worker at one end (`fulfiller`, the `called_from` column) about the worker
+    at the other end (`requestor`, the `who` column): data flows from the requestor to the fulfiller for incoming
+    transfers and the other way around for outgoing ones. Since both ends usually record the same transfer, only
+    incoming transfers are counted by default.
+
+    :param transfers: A table with the columns of :data:`TRANSFER_COLUMNS`.
+    :type transfers: pd.DataFrame
+    :param transfer_type: Only count transfers of this type, defaults to :attr:`TransferTypeEnum.INCOMING`. None
+        counts both, so transfers recorded at both ends are counted twice.
+    :type transfer_type: :class:`~dask_md_objs.TransferTypeEnum`, optional
+    :param bins: Aggregate per time window of the transfer start: a window width in seconds or an array of window
+        edges in epoch seconds. Defaults to None (no windows). Transfers outside the edges are left out.
+    :type bins: float or array-like, optional
+    :param quantile: The bandwidth quantile reported as "p95_bandwidth", defaults to 0.95
+    :type quantile: float, optional
+    :raises ValueError: when the window width is not positive, the edges are not increasing, or the worker columns
+        do not share their categories.
+    :return: Per sender, receiver (and window): the bytes sent, the number of transfers, their total duration, and
+        the mean and `quantile` of their bandwidth.
+    :rtype: TransferMatrix
+    """
+    if transfer_type is not None:
+        transfers = transfers[(transfers["transfer_type"] == transfer_type.value).to_numpy()]
+
+    incoming = (transfers["transfer_type"] == TransferTypeEnum.INCOMING.value).to_numpy()
+    requestor = transfers["requestor"].cat.codes.to_numpy().astype(np.int64)
+    fulfiller = transfers["fulfiller"].cat.codes.to_numpy().astype(np.int64)
+    if not transfers["requestor"].cat.categories.equals(transfers["fulfiller"].cat.categories):
+        raise ValueError("The requestor and fulfiller columns must share their categories.")
+    workers = transfers["requestor"].cat.categories
+    sender = np.where(incoming, requestor, fulfiller)
+    receiver = np.where(incoming, fulfiller, requestor)
+    n_workers = max(len(workers), 1)
+    cell = sender * n_workers + receiver
+
+    window = None
+    edges = None
+    if bins is not None:
+        start = transfers["start"].to_numpy(dtype=np.float64)
+        if np.ndim(bins) == 0:
+            if not bins > 0:
+                raise ValueError("The window width must be positive, got {b}.".format(b=bins))
+            lo = np.nanmin(start) if len(start) > 0 else 0.0
+            hi = np.nanmax(start) if len(start) > 0 else 0.0
+            edges = lo + bins * np.arange(int((hi - lo) // bins) + 2)
+        else:
+            edges = np.asarray(bins, dtype=np.float64)
+            if len(edges) < 2 or (np.diff(edges) <= 0).any():
+                raise ValueError("Window edges must be at least two increasing times.")
+        window = np.searchsorted(edges, start, side="right") - 1
+        # the last edge closes the last window.
+        window[start == edges[-1]] = len(edges) - 2
+        inside = (window >= 0) & (window < len(edges) - 1)
+        cell = window[inside] * (n_workers * n_workers) + cell[inside]
+        transfers = transfers[inside]
+
+    # numbering the runs of one sort is much faster than np.unique(return_inverse=True) on millions of transfers.
+    order = _packed_argsort(cell, int(cell.max()) + 1) if len(cell) > 0 else None
+    if order is None:
+        order = np.argsort(cell, kind="stable")
+    ordered = cell[order]
+    first = np.concatenate(([True], ordered[1:] != ordered[:-1])) if len(ordered) > 0 else np.empty(0, dtype=bool)
+    entries = ordered[first]
+    group = np.empty(len(cell), dtype=np.int64)
+    group[order] = np.cumsum(first) - 1
+    n = len(entries)
+    total = transfers["total"].to_numpy(dtype=np.float64)
+    bandwidth = transfers["bandwidth"].to_numpy(dtype=np.float64)
+    known_bw = ~np.isnan(bandwidth)
+    n_bw = np.bincount(group[known_bw], minlength=n)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_bw = np.bincount(group[known_bw], weights=bandwidth[known_bw], minlength=n) / n_bw
+
+    values = {
+        "bytes": np.bincount(group, weights=total, minlength=n).astype(np.int64),
+        "count": np.bincount(group, minlength=n),
+        "duration": np.bincount(group, weights=np.nan_to_num(transfers["duration"].to_numpy(dtype=np.float64)),
+                                minlength=n),
+        "mean_bandwidth": mean_bw,
+        "p95_bandwidth": _group_quantile(bandwidth, group, n, quantile),
+    }
+    pairs = entries % (n_workers * n_workers)
+    return TransferMatrix(workers, pairs // n_workers, pairs % n_workers, values,
+                          None if window is None else entries // (n_workers * n_workers), edges)
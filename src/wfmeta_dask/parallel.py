@@ -0,0 +1,150 @@
+"""Parallel ingestion of Mofka-Dask csv files.
+
+Each file (or byte range of a file) is parsed into its own partial TaskHandler in a worker process, and the
+partials are combined with `merge` in the order the files would have been read sequentially.
+"""
+import io
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import List, Optional, Sequence, Tuple, Union
+
+from .objs import ColumnarTaskHandler, TaskHandler
+
+
+def split_csv(filename: str, n_parts: int) -> List[Tuple[int, int]]:
+    """Splits the data rows of a csv file into at most `n_parts` byte ranges of similar size.
+
+    Every range starts at the beginning of a line, and the header line is excluded. Fields must not
+    contain newlines, which holds for all files written by the Mofka-Dask coupler.
+
+    :param filename: The csv file to split.
+    :type filename: str
+    :param n_parts: The desired number of ranges.
+    :type n_parts: int
+    :return: (start, end) byte offsets of each range; `end` is exclusive.
+    :rtype: List[Tuple[int, int]]
+    """
+    size = os.path.getsize(filename)
+    with open(filename, "rb") as f:
+        f.readline()
+        data_start = f.tell()
+
+        bounds = [data_start]
+        for i in range(1, n_parts):
+            target = data_start + (size - data_start) * i // n_parts
+            if target <= bounds[-1]:
+                continue
+            # finish the line that target falls in, so the next range starts on a fresh line.
+            f.seek(target - 1)
+            f.readline()
+            pos = f.tell()
+            if bounds[-1] < pos < size:
+                bounds.append(pos)
+        bounds.append(size)
+
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+class _CsvRange(io.RawIOBase):
+    """Read-only stream over the header line of a csv file followed by the bytes in [start, end)."""
+
+    def __init__(self, filename: str, start: int, end: int):
+        self._f = open(filename, "rb")
+        self._pending = self._f.readline()
+        self._f.seek(start)
+        self._remaining = end - start
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        if self._pending:
+            n = min(len(b), len(self._pending))
+            b[:n] = self._pending[:n]
+            self._pending = self._pending[n:]
+            return n
+
+        n = min(len(b), self._remaining)
+        if n <= 0:
+            return 0
+        data = self._f.read(n)
+        b[:len(data)] = data
+        self._remaining -= len(data)
+        return len(data)
+
+    def close(self) -> None:
+        self._f.close()
+        super().close()
+
+
+def _extract_part(filename: str, filecategory: str, byte_range: Optional[Tuple[int, int]], columnar: bool,
+                  chunksize: Optional[int], sorted: bool = False) -> Union[TaskHandler, ColumnarTaskHandler]:
+    from . import extract_metadata
+
+    th: Union[TaskHandler, ColumnarTaskHandler] = ColumnarTaskHandler(sorted) if columnar else TaskHandler(sorted)
+    if byte_range is None:
+        extract_metadata(filename, filecategory, False, th, chunksize)
+    else:
+        with io.BufferedReader(_CsvRange(filename, *byte_range)) as stream:
+            extract_metadata(stream, filecategory, False, th, chunksize)
+    return th
+
+
+def _plan_parts(filenames: Sequence[str], jobs: int) -> List[int]:
+    """Splits `jobs` workers across the files in proportion to their sizes, with at least one part per file."""
+    sizes = [os.path.getsize(f) for f in filenames]
+    total = sum(sizes) or 1
+    return [max(1, round(jobs * s / total)) for s in sizes]
+
+
+def extract_parallel(files: Sequence[Tuple[str, str]], jobs: Optional[int] = None,
+                     parts: Optional[Sequence[int]] = None, columnar: bool = False,
+                     chunksize: Optional[int] = None, sorted: bool = False) -> Union[TaskHandler, ColumnarTaskHandler]:
+    """Parses several Mofka-Dask csv files in a process pool and merges the results.
+
+    The result is the same as calling :func:`~wfmeta_dask.extract_metadata` on every file in order with a single
+    TaskHandler. Returning partial handlers from worker processes is much cheaper for
+    :class:`~dask_md_objs.ColumnarTaskHandler`, whose state is a handful of arrays, than for
+    :class:`~dask_md_objs.TaskHandler`, whose state has to be pickled object by object.
+
+    :param files: (filename, filecategory) pairs, in the order they would be read sequentially.
+    :type files: Sequence[Tuple[str, str]]
+    :param jobs: number of worker processes, defaults to None (one per CPU).
+    :type jobs: int, optional
+    :param parts: how many row ranges to split each file into, defaults to None (spread `jobs` over the files by size).
+    :type parts: Sequence[int], optional
+    :param columnar: build :class:`~dask_md_objs.ColumnarTaskHandler` partials instead of TaskHandlers, defaults to False
+    :type columnar: bool, optional
+    :param chunksize: passed on to :func:`~wfmeta_dask.extract_metadata` in each worker, defaults to None
+    :type chunksize: int, optional
+    :param sorted: keep every partial handler time-ordered while it is built, so merging them is a k-way merge of
+        sorted event lists and the result is already :attr:`~dask_md_objs.TaskHandler.sorted`. Defaults to False.
+    :type sorted: bool, optional
+    :return: The merged handler.
+    :rtype: :class:`~dask_md_objs.TaskHandler` or :class:`~dask_md_objs.ColumnarTaskHandler`
+    """
+    if len(files) == 0:
+        raise ValueError("No files provided to extract_parallel.")
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    if parts is None:
+        parts = _plan_parts([f for f, _ in files], jobs)
+    elif len(parts) != len(files):
+        raise ValueError("Expected one entry in parts per file, got {p} for {f} files.".format(p=len(parts), f=len(files)))
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures: List[Future] = []
+        for (filename, filecategory), n_parts in zip(files, parts):
+            ranges: List[Optional[Tuple[int, int]]] = [None]
+            if n_parts > 1:
+                ranges = list(split_csv(filename, n_parts))
+            for byte_range in ranges:
+                futures.append(pool.submit(_extract_part, filename, filecategory, byte_range, columnar, chunksize,
+                                           sorted))
+
+        # merge in submission order so the result matches reading the files one after another.
+        th = futures[0].result()
+        for fut in futures[1:]:
+            th.merge(fut.result())
+
+    return th
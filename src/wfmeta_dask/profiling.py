@@ -0,0 +1,266 @@
+"""Per-stage profiling of the extraction pipeline.
+
+The pipeline marks its stages with :func:`stage` (reading a csv file, adding the rows to a TaskHandler, sorting,
+building dataframes, writing each output format). Stages cost nothing unless a :class:`Profiler` is active, in which
+case it records the wall time, CPU time, rows per second and peak RSS of every stage and file category::
+
+    with Profiler() as profiler:
+        process_run(directory, output)
+    profiler.write_json("profile.json")
+
+A :class:`Profiler` can additionally run `cProfile` over everything it measures, or record the peak traced Python
+memory of every stage (and the largest allocation sites) with `tracemalloc`.
+"""
+import contextlib
+import cProfile
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional, Tuple
+
+_active: Optional['Profiler'] = None
+
+_CLEAR_REFS = "/proc/self/clear_refs"
+_STATUS = "/proc/self/status"
+
+
+def _read_hwm() -> Optional[int]:
+    """Returns the peak RSS since the last reset from /proc, or None when it is not available."""
+    try:
+        with open(_STATUS) as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _reset_hwm() -> bool:
+    try:
+        with open(_CLEAR_REFS, "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def max_rss() -> int:
+    """Returns the peak RSS of the process in bytes, or 0 where the `resource` module is not available (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return 0
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+class Stage:
+    """One measured run of a pipeline stage. Set :attr:`rows` inside the `with` block if it is only known then."""
+    name: str
+    category: Optional[str]
+    rows: Optional[int]
+
+    def __init__(self, profiler: 'Profiler', name: str, category: Optional[str], rows: Optional[int]):
+        self.profiler = profiler
+        self.name = name
+        self.category = category
+        self.rows = rows
+        self.peak_rss = 0
+        self.peak_traced = 0
+
+    def __enter__(self) -> 'Stage':
+        self.profiler._enter(self)
+        self.t_wall = time.perf_counter()
+        self.t_cpu = time.process_time()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        wall = time.perf_counter() - self.t_wall
+        cpu = time.process_time() - self.t_cpu
+        self.profiler._exit(self, wall, cpu)
+
+
+class _NoStage:
+    """Stand-in for :class:`Stage` when no profiler is active."""
+    rows: Optional[int] = None
+
+    def __enter__(self) -> '_NoStage':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+def stage(name: str, category: Optional[str] = None, rows: Optional[int] = None):
+    """Marks a pipeline stage for the active :class:`Profiler`, if any.
+
+    :param name: The stage, e.g. "read_csv", "add_df", "sort", "to_df" or "write".
+    :type name: str
+    :param category: The file category ("SCHED", "WXFER", "WTRANS") or output format the stage works on, defaults to None
+    :type category: str, optional
+    :param rows: Number of rows the stage processes, if known up front. Defaults to None.
+    :type rows: int, optional
+    :return: A context manager; its `rows` attribute can be set inside the `with` block.
+    """
+    if _active is None:
+        return _NoStage()
+    return Stage(_active, name, category, rows)
+
+
+class Profiler:
+    """Collects the measurements of every :func:`stage` run while it is active.
+
+    Runs of the same stage and category are summed up. Peak RSS is measured per stage where the kernel allows
+    resetting the RSS high-water mark (Linux); elsewhere the process-wide peak reached by the end of the stage is
+    reported, which `meta.rss_peak_per_stage` in the report tells apart.
+    """
+
+    def __init__(self, cprofile: bool = False, trace_memory: bool = False, top_allocations: int = 20):
+        """
+        :param cprofile: Run `cProfile` while the profiler is active, defaults to False
+        :type cprofile: bool, optional
+        :param trace_memory: Record peak traced Python memory per stage with `tracemalloc` (slow), defaults to False
+        :type trace_memory: bool, optional
+        :param top_allocations: With `trace_memory`, how many of the largest allocation sites to report, defaults to 20
+        :type top_allocations: int, optional
+        """
+        self.cprofile: Optional[cProfile.Profile] = cProfile.Profile() if cprofile else None
+        self.trace_memory = trace_memory
+        self.top_allocations = top_allocations
+        self.stats: Dict[Tuple[str, Optional[str]], Dict[str, Any]] = {}
+        self.allocations: List[Dict[str, Any]] = []
+        self._stack: List[Stage] = []
+        self._per_stage_rss = False
+        self._previous: Optional[Profiler] = None
+        #: Whether this profiler started tracemalloc, and so has to stop it again.
+        self._started_tracing = False
+
+    def __enter__(self) -> 'Profiler':
+        global _active
+        self._previous, _active = _active, self
+        self._per_stage_rss = _read_hwm() is not None and _reset_hwm()
+        self._started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start()
+        self.t_wall = time.perf_counter()
+        self.t_cpu = time.process_time()
+        if self.cprofile is not None:
+            self.cprofile.enable()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        global _active
+        if self.cprofile is not None:
+            self.cprofile.disable()
+        self.wall = time.perf_counter() - self.t_wall
+        self.cpu = time.process_time() - self.t_cpu
+        if self.trace_memory:
+            snapshot = tracemalloc.take_snapshot()
+            self.allocations = [{"where": str(s.traceback), "bytes": s.size, "count": s.count}
+                                for s in snapshot.statistics("lineno")[:self.top_allocations]]
+            if self._started_tracing:
+                tracemalloc.stop()
+        _active = self._previous
+
+    def _peaks(self) -> Tuple[int, int]:
+        rss = _read_hwm() if self._per_stage_rss else max_rss()
+        traced = tracemalloc.get_traced_memory()[1] if self.trace_memory else 0
+        return rss or 0, traced
+
+    def _enter(self, s: Stage) -> None:
+        if self._stack:
+            # fold the outer stage's peak so far in before resetting the high-water marks for this one.
+            parent = self._stack[-1]
+            rss, traced = self._peaks()
+            parent.peak_rss = max(parent.peak_rss, rss)
+            parent.peak_traced = max(parent.peak_traced, traced)
+        if self._per_stage_rss:
+            _reset_hwm()
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        self._stack.append(s)
+
+    def _exit(self, s: Stage, wall: float, cpu: float) -> None:
+        self._stack.pop()
+        rss, traced = self._peaks()
+        s.peak_rss = max(s.peak_rss, rss)
+        s.peak_traced = max(s.peak_traced, traced)
+        if self._stack:
+            parent = self._stack[-1]
+            parent.peak_rss = max(parent.peak_rss, s.peak_rss)
+            parent.peak_traced = max(parent.peak_traced, s.peak_traced)
+
+        entry = self.stats.setdefault((s.name, s.category), {
+            "stage": s.name, "category": s.category, "calls": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0,
+            "rows": None, "peak_rss_bytes": 0})
+        entry["calls"] += 1
+        entry["wall_seconds"] += wall
+        entry["cpu_seconds"] += cpu
+        if s.rows is not None:
+            entry["rows"] = (entry["rows"] or 0) + s.rows
+        entry["peak_rss_bytes"] = max(entry["peak_rss_bytes"], s.peak_rss)
+        if self.trace_memory:
+            entry["peak_traced_bytes"] = max(entry.get("peak_traced_bytes", 0), s.peak_traced)
+
+    def report(self) -> Dict[str, Any]:
+        """Returns the measurements as a JSON-serializable dict.
+
+        :return: "meta" about the process, "total" wall/CPU time and peak RSS, one entry per (stage, category) in
+            "stages" (in the order they first ran) with their rows per second, and the largest "allocations" when
+            tracing memory.
+        :rtype: Dict[str, Any]
+        """
+        stages = []
+        for entry in self.stats.values():
+            entry = dict(entry)
+            if entry["rows"] is not None and entry["wall_seconds"] > 0:
+                entry["rows_per_second"] = entry["rows"] / entry["wall_seconds"]
+            stages.append(entry)
+        out: Dict[str, Any] = {
+            "meta": {"python": platform.python_version(), "platform": platform.platform(), "pid": os.getpid(),
+                     "rss_peak_per_stage": self._per_stage_rss},
+            "total": {"wall_seconds": getattr(self, "wall", None), "cpu_seconds": getattr(self, "cpu", None),
+                      "max_rss_bytes": max_rss()},
+            "stages": stages,
+        }
+        if self.trace_memory:
+            out["allocations"] = self.allocations
+        return out
+
+    def write_json(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def dump_cprofile(self, path: str) -> None:
+        """Writes the `cProfile` statistics, readable with `pstats` or tools like snakeviz.
+
+        :raises ValueError: when the profiler was created without `cprofile=True`.
+        """
+        if self.cprofile is None:
+            raise ValueError("This Profiler was not created with cprofile=True.")
+        self.cprofile.dump_stats(path)
+
+
+@contextlib.contextmanager
+def profiled(json_path: Optional[str] = None, cprofile_path: Optional[str] = None, trace_memory: bool = False):
+    """Profiles the enclosed block and writes the reports to the given paths when it ends.
+
+    :param json_path: Where to write :meth:`Profiler.report` as JSON, defaults to None (not written).
+    :type json_path: str, optional
+    :param cprofile_path: Where to dump `cProfile` statistics, defaults to None (cProfile is not run).
+    :type cprofile_path: str, optional
+    :param trace_memory: Record peak traced memory per stage with `tracemalloc`, defaults to False
+    :type trace_memory: bool, optional
+    """
+    profiler = Profiler(cprofile=cprofile_path is not None, trace_memory=trace_memory)
+    with profiler:
+        yield profiler
+    if json_path is not None:
+        profiler.write_json(json_path)
+    if cprofile_path is not None:
+        profiler.dump_cprofile(cprofile_path)
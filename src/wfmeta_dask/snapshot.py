@@ -0,0 +1,476 @@
+"""Versioned, compressed snapshots of a TaskHandler, stored as column blocks rather than pickled objects.
+
+A snapshot holds the tasks of a handler in chunks of consecutive tasks. Every chunk is written as one block of
+NumPy columns: the distinct strings it uses, its tasks, their workers, and its scheduler, worker and transfer
+events. A transfer shared by several tasks is stored once per chunk that refers to it, so every block can be
+decoded on its own. Only plain arrays, strings and literals are written, so a snapshot does not depend on the
+layout of the Python classes, and :class:`SnapshotReader` rebuilds tasks one block at a time.
+
+File layout (all integers little-endian)::
+
+    header  b"WFSNAP\\0\\0", version (u32), codec (u32, index into :data:`CODECS`)
+    body    compressed with the codec: a "META" block, one "TASK" block per chunk of tasks and an "END\\0" block
+
+Every block is its kind (4 bytes) and number of columns (u32), followed by the columns: the lengths of the name
+and dtype (u16, u8) and the number of items (u64), then the name, the dtype string and the raw items.
+"""
+import contextlib
+import io
+import json
+import math
+import pathlib
+import struct
+from typing import Any, BinaryIO, Dict, Hashable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .helpers import _KeysParser, parse_wxfer_keys
+from .objs import ColumnarTaskHandler, Task, TaskHandler
+from .objs.enums import TaskState, TransferTypeEnum
+from .objs.query import STATE_CODES
+from .objs.events import Event, SchedulerEvent, WorkerEvent, WXferEvent, _epoch_column
+
+MAGIC = b"WFSNAP\0\0"
+#: Version of the snapshot layout written by :func:`write_snapshot`.
+SNAPSHOT_VERSION = 1
+#: The supported codecs; "zstd" requires the zstandard package.
+CODECS: List[str] = ["none", "gzip", "bz2", "lzma", "zstd"]
+#: Compression level used for every codec when none is given.
+DEFAULT_LEVELS: Dict[str, int] = {"gzip": 6, "bz2": 9, "lzma": 6, "zstd": 3}
+
+_HEADER = struct.Struct("<8sII")
+_BLOCK = struct.Struct("<4sI")
+_COLUMN = struct.Struct("<HBQ")
+
+# how the values of a block's dictionary are encoded
+_STR, _LITERAL = 0, 1
+# kinds of the entries of a task's event list
+_SCHED, _WORKER, _XFER = 0, 1, 2
+
+
+def _require_zstandard():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError("The zstd codec requires zstandard. Install it with `pip install wfmeta_dask[zstd]`.") from e
+    return zstandard
+
+
+@contextlib.contextmanager
+def _body(f: BinaryIO, codec: str, mode: str, level: Optional[int] = None) -> Iterator[BinaryIO]:
+    """Opens the (de)compressing stream of the snapshot body on `f`, leaving `f` open when done."""
+    if level is None:
+        level = DEFAULT_LEVELS.get(codec)
+    if codec == "none":
+        yield f
+        return
+    if codec == "gzip":
+        import gzip
+        stream = gzip.GzipFile(fileobj=f, mode=mode, compresslevel=level) if mode == "wb" else \
+            gzip.GzipFile(fileobj=f, mode=mode)
+    elif codec == "bz2":
+        import bz2
+        stream = bz2.BZ2File(f, mode, compresslevel=level) if mode == "wb" else bz2.BZ2File(f, mode)
+    elif codec == "lzma":
+        import lzma
+        stream = lzma.LZMAFile(f, mode, preset=level) if mode == "wb" else lzma.LZMAFile(f, mode)
+    elif codec == "zstd":
+        zstandard = _require_zstandard()
+        if mode == "wb":
+            stream = zstandard.ZstdCompressor(level=level).stream_writer(f, closefd=False)
+        else:
+            stream = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(f, closefd=False))
+    else:
+        raise ValueError("Unknown codec {c}; must be one of {v}.".format(c=codec, v=CODECS))
+    try:
+        yield stream
+    finally:
+        stream.close()
+
+
+def _write_block(f: BinaryIO, kind: bytes, columns: Dict[str, np.ndarray]) -> None:
+    f.write(_BLOCK.pack(kind, len(columns)))
+    for name, values in columns.items():
+        values = np.ascontiguousarray(values)
+        if values.dtype.kind not in "biuf":
+            raise ValueError("Column {n} of dtype {d} cannot be stored in a snapshot.".format(n=name, d=values.dtype))
+        name_bytes = name.encode()
+        dtype_bytes = values.dtype.newbyteorder("<").str.encode() if values.dtype.byteorder != "|" else \
+            values.dtype.str.encode()
+        f.write(_COLUMN.pack(len(name_bytes), len(dtype_bytes), len(values)))
+        f.write(name_bytes)
+        f.write(dtype_bytes)
+        f.write(values.astype(dtype_bytes.decode(), copy=False).tobytes())
+
+
+def _read_exact(f: BinaryIO, n: int) -> bytes:
+    data = f.read(n)
+    while len(data) < n:
+        more = f.read(n - len(data))
+        if not more:
+            raise ValueError("Snapshot is truncated.")
+        data += more
+    return data
+
+
+def _read_block(f: BinaryIO) -> Tuple[bytes, Dict[str, np.ndarray]]:
+    kind, n_columns = _BLOCK.unpack(_read_exact(f, _BLOCK.size))
+    columns: Dict[str, np.ndarray] = {}
+    for _ in range(n_columns):
+        name_length, dtype_length, n = _COLUMN.unpack(_read_exact(f, _COLUMN.size))
+        name = _read_exact(f, name_length).decode()
+        dtype = np.dtype(_read_exact(f, dtype_length).decode())
+        columns[name] = np.frombuffer(_read_exact(f, n * dtype.itemsize), dtype=dtype)
+    return kind, columns
+
+
+def _is_literal(value: Any) -> bool:
+    """Whether `repr(value)` parses back into `value` with the literal parser of the `keys` column."""
+    if type(value) in (str, int, bool) or value is None:
+        return True
+    if type(value) is float:
+        return math.isfinite(value)
+    if type(value) in (tuple, list):
+        return all(_is_literal(v) for v in value)
+    return False
+
+
+class _Values:
+    """The distinct values used by one block, in order of first use."""
+
+    def __init__(self):
+        self.codes: Dict[Tuple[type, Any], int] = {}
+        self.values: List[Any] = []
+
+    def code(self, value: Any) -> int:
+        # the type is part of the key, so that e.g. 1 and True stay apart.
+        k = (value.__class__, value)
+        c = self.codes.get(k)
+        if c is None:
+            c = self.codes[k] = len(self.values)
+            self.values.append(value)
+        return c
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        kinds = np.empty(len(self.values), dtype=np.uint8)
+        parts: List[bytes] = []
+        for i, v in enumerate(self.values):
+            if type(v) is str:
+                kinds[i] = _STR
+                parts.append(v.encode("utf-8", "surrogatepass"))
+            elif _is_literal(v):
+                kinds[i] = _LITERAL
+                parts.append(repr(v).encode("utf-8", "surrogatepass"))
+            else:
+                raise ValueError("Value {v!r} of type {t} cannot be stored in a snapshot; task keys, IP addresses and "
+                                 "stimulus ids must be strings or literals.".format(v=v, t=type(v).__name__))
+        offsets = np.zeros(len(parts) + 1, dtype=np.int64)
+        np.cumsum([len(p) for p in parts], out=offsets[1:])
+        return {"values.kind": kinds, "values.offsets": offsets,
+                "values.data": np.frombuffer(b"".join(parts), dtype=np.uint8)}
+
+
+def _decode_values(columns: Dict[str, np.ndarray], pool: Optional[Dict[str, str]]) -> np.ndarray:
+    data = columns["values.data"].tobytes()
+    offsets = columns["values.offsets"]
+    out = np.empty(len(columns["values.kind"]), dtype=object)
+    for i, kind in enumerate(columns["values.kind"].tolist()):
+        raw = data[offsets[i]:offsets[i + 1]]
+        if kind == _STR:
+            value = raw.decode("utf-8", "surrogatepass")
+            if pool is not None:
+                value = pool.setdefault(value, value)
+        elif kind == _LITERAL:
+            value = _KeysParser(raw.decode("utf-8", "surrogatepass")).parse()
+        else:
+            raise ValueError("Unknown value encoding {k} in snapshot.".format(k=kind))
+        out[i] = value
+    return out
+
+
+def _xfer_identity(e: WXferEvent) -> Tuple:
+    """Every field of a transfer; unlike `WXferEvent.__eq__`, transfers that differ in any field stay apart."""
+    fields = (e._start, e._stop, e._middle, e.duration, repr(e.keys), e.total, e.bandwidth, e.compressed, e.requestor,
+              e.fulfiller, e.transfer_type, e._t_event)
+    # NaN never equals itself, so missing numbers are compared as None.
+    return tuple(None if f != f else f for f in fields)
+
+
+def _chunk_columns(chunk: Sequence[Tuple[Hashable, Task]]) -> Dict[str, np.ndarray]:
+    """Turns a chunk of tasks into the columns of one block, with a table of the transfers the chunk refers to."""
+    values = _Values()
+    xfer_ids: Dict[Tuple, int] = {}
+    type_codes = {t: i for i, t in enumerate(TransferTypeEnum)}
+
+    task_key, task_name, initiated, t_start, t_end, n_events, n_workers, workers = [], [], [], [], [], [], [], []
+    event_kind, event_row = [], []
+    sched: List[SchedulerEvent] = []
+    worker: List[WorkerEvent] = []
+    xfers: List[WXferEvent] = []
+    for key, task in chunk:
+        task_key.append(values.code(key))
+        task_name.append(values.code(task.name) if hasattr(task, "name") else -1)
+        initiated.append(task.initiated)
+        t_start.append(task._t_start)
+        t_end.append(task._t_end)
+        n_events.append(len(task.events))
+        n_workers.append(len(task.workers))
+        workers.extend(values.code(w) for w in task.workers)
+        for e in task.events:
+            if type(e) is SchedulerEvent:
+                event_kind.append(_SCHED)
+                event_row.append(len(sched))
+                sched.append(e)
+            elif type(e) is WorkerEvent:
+                event_kind.append(_WORKER)
+                event_row.append(len(worker))
+                worker.append(e)
+            elif type(e) is WXferEvent:
+                identity = _xfer_identity(e)
+                xfer_id = xfer_ids.get(identity)
+                if xfer_id is None:
+                    xfer_id = xfer_ids[identity] = len(xfer_ids)
+                    xfers.append(e)
+                event_kind.append(_XFER)
+                event_row.append(xfer_id)
+            else:
+                raise NotImplementedError("Unknown event type {t} in task {k}.".format(t=type(e), k=key))
+
+    def floats(events: List[Event], attribute: str) -> np.ndarray:
+        return np.array([getattr(e, attribute) for e in events], dtype=np.float64)
+
+    columns = {
+        "task.key": np.array(task_key, dtype=np.int64),
+        "task.name": np.array(task_name, dtype=np.int64),
+        "task.initiated": np.array(initiated, dtype=bool),
+        "task.t_start": np.array(t_start, dtype=np.float64),
+        "task.t_end": np.array(t_end, dtype=np.float64),
+        "task.n_events": np.array(n_events, dtype=np.int64),
+        "task.n_workers": np.array(n_workers, dtype=np.int64),
+        "workers": np.array(workers, dtype=np.int64),
+        "event.kind": np.array(event_kind, dtype=np.uint8),
+        "event.row": np.array(event_row, dtype=np.int64),
+        "sched.key": np.array([values.code(e.key) for e in sched], dtype=np.int64),
+        "sched.ip": np.array([values.code(e.ip) for e in sched], dtype=np.int64),
+        "sched.stimulus_id": np.array([values.code(e.stimulus_id) for e in sched], dtype=np.int64),
+        "sched.start": np.array([STATE_CODES[e.start] for e in sched], dtype=np.int8),
+        "sched.finish": np.array([STATE_CODES[e.finish] for e in sched], dtype=np.int8),
+        "sched.t_event": floats(sched, "_t_event"),
+        "sched.t_begins": floats(sched, "_t_begins"),
+        "sched.t_ends": floats(sched, "_t_ends"),
+        "worker.key": np.array([values.code(e.key) for e in worker], dtype=np.int64),
+        "worker.ip": np.array([values.code(e.ip) for e in worker], dtype=np.int64),
+        "worker.start": np.array([STATE_CODES[e.start] for e in worker], dtype=np.int8),
+        "worker.finish": np.array([STATE_CODES[e.finish] for e in worker], dtype=np.int8),
+        "worker.t_event": floats(worker, "_t_event"),
+        "xfer.start": floats(xfers, "_start"),
+        "xfer.stop": floats(xfers, "_stop"),
+        "xfer.middle": floats(xfers, "_middle"),
+        "xfer.t_event": floats(xfers, "_t_event"),
+        # numbers keep the dtype they were read with, e.g. integer or float totals.
+        "xfer.duration": np.array([e.duration for e in xfers]),
+        "xfer.total": np.array([e.total for e in xfers]),
+        "xfer.bandwidth": np.array([e.bandwidth for e in xfers]),
+        "xfer.compressed": np.array([e.compressed for e in xfers]),
+        "xfer.keys": np.array([values.code(repr(e.keys)) for e in xfers], dtype=np.int64),
+        "xfer.requestor": np.array([values.code(e.requestor) for e in xfers], dtype=np.int64),
+        "xfer.fulfiller": np.array([values.code(e.fulfiller) for e in xfers], dtype=np.int64),
+        "xfer.transfer_type": np.array([type_codes[e.transfer_type] for e in xfers], dtype=np.int8),
+    }
+    columns.update(values.columns())
+    return columns
+
+
+def write_snapshot(th: Union[TaskHandler, ColumnarTaskHandler], path: Union[str, pathlib.Path], codec: str = "gzip",
+                   level: Optional[int] = None, chunk_tasks: int = 10000) -> None:
+    """Writes every task of `th` into a compressed snapshot file, `chunk_tasks` tasks per block.
+
+    :param th: The TaskHandler to write out.
+    :type th: :class:`~dask_md_objs.TaskHandler` or :class:`~dask_md_objs.ColumnarTaskHandler`
+    :param path: The file to write.
+    :type path: str or pathlib.Path
+    :param codec: One of :data:`CODECS`, defaults to "gzip".
+    :type codec: str, optional
+    :param level: Compression level of the codec, defaults to None (see :data:`DEFAULT_LEVELS`).
+    :type level: int, optional
+    :param chunk_tasks: Number of tasks per block, which bounds the memory used to write and read the snapshot.
+        Defaults to 10000.
+    :type chunk_tasks: int, optional
+    :raises ValueError: when an unknown codec is provided, or a task key, IP address or stimulus id is neither a
+        string nor a literal (a number, None, or a tuple or list of those).
+    :raises ImportError: when the "zstd" codec is used without zstandard installed.
+    """
+    if codec not in CODECS:
+        raise ValueError("Unknown codec {c}; must be one of {v}.".format(c=codec, v=CODECS))
+    if codec == "zstd":
+        _require_zstandard()
+    if chunk_tasks < 1:
+        raise ValueError("chunk_tasks must be a positive number of tasks, got {c}.".format(c=chunk_tasks))
+
+    meta = {"handler": type(th).__name__, "sorted": bool(getattr(th, "sorted", False)), "n_tasks": len(th.tasks),
+            "states": [s.value for s in TaskState], "transfer_types": [t.value for t in TransferTypeEnum]}
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, SNAPSHOT_VERSION, CODECS.index(codec)))
+        with _body(f, codec, "wb", level) as body:
+            _write_block(body, b"META", {"json": np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8)})
+            chunk: List[Tuple[Hashable, Task]] = []
+            for key, task in th.tasks.items():
+                chunk.append((key, task))
+                if len(chunk) == chunk_tasks:
+                    _write_block(body, b"TASK", _chunk_columns(chunk))
+                    chunk = []
+            if len(chunk) > 0:
+                _write_block(body, b"TASK", _chunk_columns(chunk))
+            _write_block(body, b"END\0", {})
+
+
+class SnapshotReader:
+    """Reads a snapshot written by :func:`write_snapshot` one block at a time.
+
+    Iterating over the reader yields (task key, :class:`~dask_md_objs.Task`) pairs in the order of the handler that
+    was written; only the block being decoded is held in memory, plus the transfers of the previous block. A
+    transfer stored again in the next block is replaced by the same object, so tasks on either side of a block
+    boundary share it like they did when written.
+    """
+    #: Layout version and codec of the file.
+    version: int
+    codec: str
+    #: What was recorded about the handler: its "handler" class name, whether it was "sorted" and "n_tasks".
+    meta: Dict[str, Any]
+
+    def __init__(self, path: Union[str, pathlib.Path], pool: Optional[Dict[str, str]] = None):
+        """
+        :param path: The snapshot file.
+        :type path: str or pathlib.Path
+        :param pool: String pool to share repeated strings (keys, IP addresses, ...) through, defaults to None
+        :type pool: Dict[str, str], optional
+        :raises ValueError: when the file is not a snapshot, was written by a newer version or is truncated.
+        """
+        self.path = pathlib.Path(path)
+        self.pool = pool
+        self._file = open(self.path, "rb")
+        header = self._file.read(_HEADER.size)
+        if len(header) < _HEADER.size or header[:len(MAGIC)] != MAGIC:
+            self._file.close()
+            raise ValueError("{p} is not a snapshot.".format(p=self.path))
+        _, self.version, codec = _HEADER.unpack(header)
+        if self.version > SNAPSHOT_VERSION:
+            self._file.close()
+            raise ValueError("{p} was written with snapshot version {v}, but only versions up to {s} can be read.".format(
+                p=self.path, v=self.version, s=SNAPSHOT_VERSION))
+        if codec >= len(CODECS):
+            self._file.close()
+            raise ValueError("{p} uses an unknown codec ({c}).".format(p=self.path, c=codec))
+        self.codec = CODECS[codec]
+
+        self._body_context = _body(self._file, self.codec, "rb")
+        self._body = self._body_context.__enter__()
+        kind, columns = _read_block(self._body)
+        if kind != b"META":
+            self.close()
+            raise ValueError("{p} is corrupt: it does not start with a META block.".format(p=self.path))
+        self.meta = json.loads(columns["json"].tobytes())
+        self._states = np.empty(len(self.meta["states"]), dtype=object)
+        self._states[:] = [TaskState(s) for s in self.meta["states"]]
+        self._transfer_types = np.empty(len(self.meta["transfer_types"]), dtype=object)
+        self._transfer_types[:] = [TransferTypeEnum(t) for t in self.meta["transfer_types"]]
+        #: Transfers of the previous block, by :func:`_xfer_identity`.
+        self._previous_xfers: Dict[Tuple, WXferEvent] = {}
+
+    def close(self) -> None:
+        self._body_context.__exit__(None, None, None)
+        self._file.close()
+
+    def __enter__(self) -> 'SnapshotReader':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @property
+    def sorted(self) -> bool:
+        return bool(self.meta.get("sorted", False))
+
+    def __iter__(self) -> Iterator[Tuple[Hashable, Task]]:
+        while True:
+            kind, columns = _read_block(self._body)
+            if kind == b"END\0":
+                return
+            if kind != b"TASK":
+                raise ValueError("{p} is corrupt: unexpected {k} block.".format(p=self.path, k=kind))
+            yield from self._tasks(columns)
+
+    def _tasks(self, c: Dict[str, np.ndarray]) -> Iterator[Tuple[Hashable, Task]]:
+        values = _decode_values(c, self.pool)
+        states = self._states
+
+        sched: List[Event] = []
+        for row in zip(_epoch_column(c["sched.t_event"]), _epoch_column(c["sched.t_begins"]),
+                       _epoch_column(c["sched.t_ends"]), states[c["sched.start"]], states[c["sched.finish"]],
+                       values[c["sched.ip"]], values[c["sched.stimulus_id"]], values[c["sched.key"]]):
+            e = SchedulerEvent.__new__(SchedulerEvent)
+            e._t_event, e._t_begins, e._t_ends, e.start, e.finish, e.ip, e.stimulus_id, e.key = row
+            sched.append(e)
+
+        worker: List[Event] = []
+        for row in zip(states[c["worker.start"]], states[c["worker.finish"]], values[c["worker.ip"]],
+                       _epoch_column(c["worker.t_event"]), values[c["worker.key"]]):
+            e = WorkerEvent.__new__(WorkerEvent)
+            e.start, e.finish, e.ip, e._t_event, e.key = row
+            worker.append(e)
+
+        xfers: List[Event] = []
+        known: Dict[Tuple, WXferEvent] = {}
+        for row in zip(_epoch_column(c["xfer.start"]), _epoch_column(c["xfer.stop"]), _epoch_column(c["xfer.middle"]),
+                       c["xfer.duration"], values[c["xfer.keys"]], c["xfer.total"], c["xfer.bandwidth"],
+                       c["xfer.compressed"], values[c["xfer.requestor"]], values[c["xfer.fulfiller"]],
+                       self._transfer_types[c["xfer.transfer_type"]], _epoch_column(c["xfer.t_event"])):
+            e = WXferEvent.__new__(WXferEvent)
+            e._start, e._stop, e._middle, e.duration, e.keys, e.total, e.bandwidth, e.compressed, \
+                e.requestor, e.fulfiller, e.transfer_type, e._t_event = row
+            e.keys = parse_wxfer_keys(e.keys)
+            identity = _xfer_identity(e)
+            e = self._previous_xfers.get(identity, e)
+            known[identity] = e
+            xfers.append(e)
+        self._previous_xfers = known
+
+        tables = (sched, worker, xfers)
+        kinds = c["event.kind"].tolist()
+        rows = c["event.row"].tolist()
+        workers = values[c["workers"]].tolist()
+        e_begin = w_begin = 0
+        for key, name, initiated, t_start, t_end, n_events, n_workers in zip(
+                values[c["task.key"]], c["task.name"].tolist(), c["task.initiated"].tolist(),
+                _epoch_column(c["task.t_start"]), _epoch_column(c["task.t_end"]), c["task.n_events"].tolist(),
+                c["task.n_workers"].tolist()):
+            task = Task(None)
+            if name >= 0:
+                task.name = values[name]
+            task.initiated = initiated
+            task._t_start, task._t_end = t_start, t_end
+            task.events = [tables[k][r] for k, r in zip(kinds[e_begin:e_begin + n_events], rows[e_begin:e_begin + n_events])]
+            task.workers = dict.fromkeys(workers[w_begin:w_begin + n_workers])
+            task._wxfer_events = {e for e in task.events if type(e) is WXferEvent}
+            e_begin += n_events
+            w_begin += n_workers
+            yield key, task
+
+
+def load_snapshot(path: Union[str, pathlib.Path]) -> TaskHandler:
+    """Loads a snapshot written by :func:`write_snapshot` into a new TaskHandler, one block at a time.
+
+    Snapshots of a :class:`~dask_md_objs.ColumnarTaskHandler` load as a TaskHandler with the same tasks.
+
+    :param path: The snapshot file.
+    :type path: str or pathlib.Path
+    :raises ValueError: when the file is not a snapshot, was written by a newer version or is truncated.
+    :return: The handler, :attr:`~dask_md_objs.TaskHandler.sorted` if the written one was.
+    :rtype: TaskHandler
+    """
+    th = TaskHandler()
+    with SnapshotReader(path, th.strings) as reader:
+        th.sorted = reader.sorted
+        for key, task in reader:
+            th.tasks[key] = task
+    return th
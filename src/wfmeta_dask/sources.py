@@ -0,0 +1,214 @@
+"""Sources of Mofka-Dask events that a TaskHandler can consume from.
+
+An event source produces batches of rows of one filecategory ("SCHED", "WXFER" or "WTRANS") as dataframes with the
+columns of the corresponding Mofka-Dask csv file, which are handed to `TaskHandler.add_df`. :class:`CsvSource` reads
+the csv files the Mofka-Dask coupler writes. :class:`QueueSource` and :class:`StreamSource` consume batches of event
+records as they arrive, from an in-process asyncio queue or a socket, without going through a csv file first; they
+stand in for consuming from the Mofka broker directly.
+"""
+import asyncio
+import json
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from .objs import ColumnarTaskHandler, Event, SchedulerEvent, TaskHandler, WorkerEvent, WXferEvent
+from .profiling import stage
+
+#: A batch of event records: a dataframe, or a list of {csv column: value} dicts.
+Records = Union[pd.DataFrame, List[Dict[str, Any]]]
+
+#: Longest batch line :class:`StreamSource` accepts, in bytes.
+_LINE_LIMIT = 2**26
+
+
+def _event_type(filecategory: str) -> type:
+    # validate that provided filecategory is valid
+    # this is only used internally so it's okay that it's just a magic value (for now).
+    if filecategory not in ["SCHED", "WXFER", "WTRANS"]:
+        # TODO : add examples of valid filecategories.
+        raise ValueError("Invalid filecategory provided: {c}.".format(c=filecategory))
+
+    # store what type constructor to use based on filecategory
+    eventtype: type = Event
+    if filecategory == "SCHED":
+        eventtype = SchedulerEvent
+    elif filecategory == "WTRANS":
+        eventtype = WorkerEvent
+    elif filecategory == "WXFER":
+        eventtype = WXferEvent
+    return eventtype
+
+
+def _category(eventtype: type) -> Optional[str]:
+    return {SchedulerEvent: "SCHED", WorkerEvent: "WTRANS", WXferEvent: "WXFER"}.get(eventtype)
+
+
+def records_to_df(filecategory: str, records: Records) -> Tuple[type, pd.DataFrame]:
+    """Converts a batch of event records into the event type and dataframe `TaskHandler.add_df` expects.
+
+    :param filecategory: The kind of events in the batch; one of ["SCHED", "WXFER", "WTRANS"].
+    :type filecategory: str
+    :param records: The events, with the same fields (and string formats) as the rows of the Mofka-Dask csv files.
+    :type records: pd.DataFrame or List[Dict[str, Any]]
+    :raises ValueError: when an invalid filecategory is provided.
+    :return: The event type and a dataframe of the columns it is built from.
+    :rtype: Tuple[type, pd.DataFrame]
+    """
+    eventtype = _event_type(filecategory)
+    if isinstance(records, pd.DataFrame):
+        return eventtype, records
+    return eventtype, pd.DataFrame.from_records(records, columns=eventtype.csv_columns)
+
+
+class EventSource:
+    """A source of event batches, consumed synchronously."""
+
+    def batches(self) -> Iterator[Tuple[type, pd.DataFrame]]:
+        """Yields (event type, dataframe) batches in the order they should be added to a TaskHandler."""
+        raise NotImplementedError()
+
+    def feed(self, th: Union[TaskHandler, ColumnarTaskHandler]) -> int:
+        """Adds every batch of this source to `th`.
+
+        :param th: The handler to add the events to.
+        :type th: :class:`~dask_md_objs.TaskHandler` or :class:`~dask_md_objs.ColumnarTaskHandler`
+        :return: The number of rows added.
+        :rtype: int
+        """
+        n_rows = 0
+        for eventtype, df in self.batches():
+            with stage("add_df", _category(eventtype), len(df)):
+                th.add_df(eventtype, df)
+            n_rows += len(df)
+        return n_rows
+
+
+class CsvSource(EventSource):
+    """Reads the events of one Mofka-Dask csv file, whole or `chunksize` rows at a time."""
+
+    def __init__(self, filename, filecategory: str, chunksize: Optional[int] = None):
+        """
+        :param filename: the file to parse events from, or an open binary file object positioned at its header
+        :type filename: str
+        :param filecategory: the type of file being provided; must be one of ["SCHED", "WXFER", "WTRANS"]
+        :type filecategory: str
+        :param chunksize: if provided, read the file this many rows at a time. Defaults to None.
+        :type chunksize: int, optional
+        :raises ValueError: when an invalid filecategory or chunksize is provided.
+        """
+        self.eventtype = _event_type(filecategory)
+        self.filecategory = filecategory
+        if chunksize is not None and chunksize < 1:
+            raise ValueError("chunksize must be a positive number of rows, got {c}.".format(c=chunksize))
+        self.filename = filename
+        self.chunksize = chunksize
+
+    def batches(self) -> Iterator[Tuple[type, pd.DataFrame]]:
+        # only the columns the events are built from are read, the rest would just cost memory.
+        if self.chunksize is None:
+            with stage("read_csv", self.filecategory) as s:
+                df = pd.read_csv(self.filename, usecols=self.eventtype.csv_columns)
+                s.rows = len(df)
+            yield self.eventtype, df
+            return
+
+        with pd.read_csv(self.filename, usecols=self.eventtype.csv_columns, chunksize=self.chunksize) as reader:
+            while True:
+                with stage("read_csv", self.filecategory) as s:
+                    chunk = next(reader, None)
+                    s.rows = 0 if chunk is None else len(chunk)
+                if chunk is None:
+                    return
+                yield self.eventtype, chunk
+
+
+class AsyncEventSource:
+    """A source of event batches that arrive over time, consumed with asyncio."""
+
+    def batches(self) -> AsyncIterator[Tuple[type, pd.DataFrame]]:
+        """Yields (event type, dataframe) batches as they arrive, until the source is exhausted."""
+        raise NotImplementedError()
+
+    async def feed(self, th: Union[TaskHandler, ColumnarTaskHandler]) -> int:
+        """Adds every batch to `th` as soon as it arrives, until the source is exhausted.
+
+        :param th: The handler to add the events to.
+        :type th: :class:`~dask_md_objs.TaskHandler` or :class:`~dask_md_objs.ColumnarTaskHandler`
+        :return: The number of rows added.
+        :rtype: int
+        """
+        n_rows = 0
+        async for eventtype, df in self.batches():
+            with stage("add_df", _category(eventtype), len(df)):
+                th.add_df(eventtype, df)
+            n_rows += len(df)
+        return n_rows
+
+
+class QueueSource(AsyncEventSource):
+    """Consumes (filecategory, records) batches put on an asyncio queue; a `None` item ends the stream."""
+
+    def __init__(self, queue: asyncio.Queue):
+        self.queue = queue
+
+    async def batches(self) -> AsyncIterator[Tuple[type, pd.DataFrame]]:
+        while True:
+            item = await self.queue.get()
+            try:
+                if item is None:
+                    return
+                yield records_to_df(*item)
+            finally:
+                self.queue.task_done()
+
+
+def encode_batch(filecategory: str, records: Records) -> bytes:
+    """Encodes a batch of event records as one line of the protocol :class:`StreamSource` reads.
+
+    :param filecategory: The kind of events in the batch; one of ["SCHED", "WXFER", "WTRANS"].
+    :type filecategory: str
+    :param records: The events, with the same fields as the rows of the Mofka-Dask csv files.
+    :type records: pd.DataFrame or List[Dict[str, Any]]
+    :return: A newline-terminated JSON object.
+    :rtype: bytes
+    """
+    _event_type(filecategory)
+    if isinstance(records, pd.DataFrame):
+        records = records.to_dict(orient="records")
+    return (json.dumps({"category": filecategory, "records": records}) + "\n").encode()
+
+
+class StreamSource(AsyncEventSource):
+    """Consumes newline-delimited JSON batches (see :func:`encode_batch`) from a stream, until it is closed."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: Optional[asyncio.StreamWriter] = None):
+        """
+        :param reader: The stream to read batches from.
+        :type reader: asyncio.StreamReader
+        :param writer: The other half of the connection, closed once the stream ends. Defaults to None.
+        :type writer: asyncio.StreamWriter, optional
+        """
+        self.reader = reader
+        # the connection is closed once the writer is garbage collected, so it has to be kept around.
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, host: str, port: int) -> 'StreamSource':
+        """Connects to a producer listening on a TCP socket."""
+        return cls(*await asyncio.open_connection(host, port, limit=_LINE_LIMIT))
+
+    @classmethod
+    async def connect_unix(cls, path: str) -> 'StreamSource':
+        """Connects to a producer listening on a unix domain socket."""
+        return cls(*await asyncio.open_unix_connection(path, limit=_LINE_LIMIT))
+
+    async def batches(self) -> AsyncIterator[Tuple[type, pd.DataFrame]]:
+        try:
+            while line := await self.reader.readline():
+                if line.strip():
+                    batch = json.loads(line)
+                    yield records_to_df(batch["category"], batch["records"])
+        finally:
+            if self.writer is not None:
+                self.writer.close()
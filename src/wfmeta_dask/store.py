@@ -0,0 +1,252 @@
+"""Indexed on-disk task store with random access by task key.
+
+Unlike the `pickle` output, which has to be loaded as a whole, a task store keeps every :class:`~dask_md_objs.Task`
+in its own pickled block and ends with an index from task key to block offset. :class:`TaskStore` memory-maps the
+file and only unpickles the tasks that are asked for.
+
+File layout (all integers little-endian)::
+
+    header   b"WFSTORE\\0", version (u32), flags (u32, see :data:`FLAG_SORTED`)
+    blocks   one pickled (key, Task) tuple per task, in TaskHandler order
+    names    one pickled list of every task key, in TaskHandler order
+    offsets  int64[n_tasks + 1], start of every block plus the end of the last one
+    hashes   (uint64 key hash, int64 task number)[n_tasks], sorted by hash
+    times    int64[3], the number of events of every type of :data:`~dask_md_objs.query.EVENT_TYPES`, then the
+             sorted float64 times of the events of every type, one array after the other
+    footer   names offset, names length, offsets offset, hashes offset, n_tasks, times offset (u64 each),
+             b"WFSTORE\\0"
+"""
+import hashlib
+import mmap
+import pathlib
+import pickle
+import struct
+from collections.abc import Mapping
+from typing import Dict, Hashable, Iterator, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from .objs import ColumnarTaskHandler, Task, TaskHandler, WXferEvent
+from .objs.enums import EventTypeEnum, TransferTypeEnum
+from .objs.query import EVENT_TYPES
+from .objs.tasks import tasks_to_df
+
+MAGIC = b"WFSTORE\0"
+#: Version of the task store layout written by :func:`write_store`.
+STORE_VERSION = 1
+#: Header flag of stores whose tasks were written with their events in time order.
+FLAG_SORTED = 1
+
+_HEADER = struct.Struct("<8sII")
+_FOOTER = struct.Struct("<6Q8s")
+_HASH_DTYPE = np.dtype([("hash", "<u8"), ("task", "<i8")])
+
+
+def key_hash(key: Hashable) -> int:
+    """Returns a 64 bit hash of a task key that is stable across processes, unlike the builtin `hash`."""
+    return int.from_bytes(hashlib.blake2b(repr(key).encode(), digest_size=8).digest(), "little")
+
+
+def write_store(th: Union[TaskHandler, ColumnarTaskHandler], path: Union[str, pathlib.Path]) -> None:
+    """Writes every task of `th` into an indexed task store file.
+
+    Whether `th` is :attr:`~dask_md_objs.TaskHandler.sorted` is recorded in the header, so readers of a sorted
+    store never sort its tasks again. The sorted times of the events of every type are written after the index,
+    so :meth:`TaskStore.event_times` does not have to read the tasks.
+
+    :param th: The TaskHandler to write out.
+    :type th: :class:`~dask_md_objs.TaskHandler` or :class:`~dask_md_objs.ColumnarTaskHandler`
+    :param path: The file to write.
+    :type path: str or pathlib.Path
+    """
+    names: List[Hashable] = []
+    offsets: List[int] = []
+    times: Dict[EventTypeEnum, List[float]] = {t: [] for t in EVENT_TYPES}
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, STORE_VERSION, FLAG_SORTED if getattr(th, "sorted", False) else 0))
+        for key, task in th.tasks.items():
+            offsets.append(f.tell())
+            names.append(key)
+            f.write(pickle.dumps((key, task), pickle.HIGHEST_PROTOCOL))
+            for e in task.events:
+                times[e.e_type].append(e._t_event)
+        offsets.append(f.tell())
+
+        names_offset = f.tell()
+        f.write(pickle.dumps(names, pickle.HIGHEST_PROTOCOL))
+        names_length = f.tell() - names_offset
+
+        offsets_offset = f.tell()
+        f.write(np.asarray(offsets, dtype="<i8").tobytes())
+
+        hashes = np.empty(len(names), dtype=_HASH_DTYPE)
+        hashes["hash"] = [key_hash(k) for k in names]
+        hashes["task"] = np.arange(len(names))
+        hashes.sort(order="hash", kind="stable")
+        hashes_offset = f.tell()
+        f.write(hashes.tobytes())
+
+        times_offset = f.tell()
+        f.write(np.asarray([len(times[t]) for t in EVENT_TYPES], dtype="<i8").tobytes())
+        for t in EVENT_TYPES:
+            f.write(np.sort(np.asarray(times[t], dtype="<f8")).tobytes())
+
+        f.write(_FOOTER.pack(names_offset, names_length, offsets_offset, hashes_offset, len(names), times_offset,
+                             MAGIC))
+
+
+class _StoreTasks(Mapping):
+    """Read-only mapping of task key to :class:`~dask_md_objs.Task`, unpickling each Task on access."""
+
+    def __init__(self, store: 'TaskStore'):
+        self._store = store
+
+    def __getitem__(self, key: Hashable) -> Task:
+        return self._store.get_task_by_name(key)
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self._store.return_names())
+
+    def __len__(self) -> int:
+        return self._store.n_tasks
+
+    def __contains__(self, key: object) -> bool:
+        return self._store._find(key) is not None
+
+    def values(self):
+        return (task for _, task in self._store._iter_blocks())
+
+    def items(self):
+        return self._store._iter_blocks()
+
+
+class TaskStore:
+    """Read-only, TaskHandler-compatible view of a task store file written by :func:`write_store`.
+
+    Opening a store only reads its fixed-size footer; the index arrays are memory-mapped and the task names are
+    loaded on first use. Individual tasks are unpickled when they are requested and are not kept in memory.
+    """
+    n_tasks: int
+
+    def __init__(self, path: Union[str, pathlib.Path]):
+        self.path = pathlib.Path(path)
+        self._file = open(self.path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError("{p} is empty, not a task store.".format(p=self.path))
+
+        magic, version, flags = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError("{p} is not a task store.".format(p=self.path))
+        if version > STORE_VERSION:
+            self.close()
+            raise ValueError("{p} was written with task store version {v}, but only versions up to {s} can be read.".format(
+                p=self.path, v=version, s=STORE_VERSION))
+
+        names_offset, names_length, offsets_offset, hashes_offset, n_tasks, times_offset, magic = \
+            _FOOTER.unpack_from(self._mm, len(self._mm) - _FOOTER.size)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError("{p} is truncated or corrupt.".format(p=self.path))
+
+        self.n_tasks = n_tasks
+        self._names_range = (names_offset, names_offset + names_length)
+        self._offsets = np.frombuffer(self._mm, dtype="<i8", count=n_tasks + 1, offset=offsets_offset)
+        self._hashes = np.frombuffer(self._mm, dtype=_HASH_DTYPE, count=n_tasks, offset=hashes_offset)
+        self._times_offset = times_offset
+        self._names: Optional[List[Hashable]] = None
+        #: Whether the tasks in the file already have their events in time order.
+        self.sorted = bool(flags & FLAG_SORTED)
+        self._sorted = False
+
+    def close(self) -> None:
+        # drop the numpy views first, mmap refuses to close while buffers into it exist.
+        self._offsets = self._hashes = None
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self) -> 'TaskStore':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @property
+    def tasks(self) -> Mapping:
+        return _StoreTasks(self)
+
+    def _load_block(self, i: int) -> tuple:
+        key, task = pickle.loads(self._mm[self._offsets[i]:self._offsets[i + 1]])
+        if self._sorted and not self.sorted:
+            task.sort_events_by_time()
+        return key, task
+
+    def _iter_blocks(self) -> Iterator[tuple]:
+        for i in range(self.n_tasks):
+            yield self._load_block(i)
+
+    def _find(self, key: Hashable) -> Optional[Task]:
+        h = key_hash(key)
+        lo = np.searchsorted(self._hashes["hash"], h, side="left")
+        hi = np.searchsorted(self._hashes["hash"], h, side="right")
+        for i in self._hashes["task"][lo:hi]:
+            stored_key, task = self._load_block(int(i))
+            if stored_key == key:
+                return task
+        return None
+
+    def get_task_by_name(self, taskname: Hashable) -> Task:
+        task = self._find(taskname)
+        if task is None:
+            raise KeyError(taskname)
+        return task
+
+    def return_names(self) -> List[Hashable]:
+        if self._names is None:
+            start, end = self._names_range
+            self._names = pickle.loads(self._mm[start:end])
+        return list(self._names)
+
+    def event_times(self) -> Dict[EventTypeEnum, np.ndarray]:
+        """Returns the sorted times of the events of every type in epoch seconds, NaN last.
+
+        Events are counted once per task they belong to, like in :meth:`to_df`. The times are read from the
+        store without unpickling any task.
+
+        :rtype: Dict[EventTypeEnum, np.ndarray]
+        """
+        counts = np.frombuffer(self._mm, dtype="<i8", count=len(EVENT_TYPES), offset=self._times_offset)
+        offset = self._times_offset + counts.nbytes
+        out: Dict[EventTypeEnum, np.ndarray] = {}
+        for t, n in zip(EVENT_TYPES, counts.tolist()):
+            # copied out of the file, so the arrays outlive the store.
+            out[t] = np.frombuffer(self._mm, dtype="<f8", count=n, offset=offset).astype(np.float64)
+            offset += 8 * n
+        return out
+
+    def _get_arbitrary_task(self) -> Task:
+        return self._load_block(0)[1]
+
+    def sort_tasks_by_time(self) -> None:
+        """Makes every task handed out from now on have its events sorted by time. The file itself is not changed.
+
+        Tasks of a :attr:`sorted` store are handed out as they are stored.
+        """
+        self._sorted = True
+
+    def return_all_wxfer_events(self, filter_type: Optional[TransferTypeEnum] = None) -> List[WXferEvent]:
+        output: List[WXferEvent] = []
+        seen = set()
+        for t in self.tasks.values():
+            for r in t.return_wxfer_events(filter_type):
+                if r not in seen:
+                    seen.add(r)
+                    output.append(r)
+        return output
+
+    def to_df(self, key_parts: bool = False) -> Dict[EventTypeEnum, pd.DataFrame]:
+        return tasks_to_df(self.tasks.values(), key_parts)
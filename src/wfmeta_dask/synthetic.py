@@ -0,0 +1,243 @@
+"""Seeded generator of synthetic Mofka-Dask runs, for tests and benchmarks at any scale.
+
+:func:`generate_run` writes `scheduler_transition.csv`, `worker_transition.csv` and `worker_transfer.csv` in the
+format written by the Mofka-Dask coupler. Tasks follow the transitions seen in real runs (released, waiting, queued,
+processing, memory, released on the scheduler; released, waiting, ready, executing, memory, released on the worker),
+have dask-style tuple keys, and a share of their results is fetched by other workers in transfers of one to five
+keys. Rows are generated in blocks of tasks, so memory use does not depend on the size of the run.
+"""
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+#: Task prefixes, how often they occur and how many indices their keys have, loosely following a dask array workflow.
+PREFIXES = [("block-info-_map_read_frame", 0.30, 4), ("array", 0.17, 1), ("chunk_min", 0.12, 1),
+            ("chunk_max", 0.12, 1), ("map_read_frame", 0.09, 1), ("chunk_min-partial", 0.09, 2),
+            ("chunk_max-partial", 0.09, 2), ("save_file", 0.02, 1)]
+#: How often a transfer carries 1, 2, 3, 4 or 5 keys.
+KEYS_PER_TRANSFER = [0.897, 0.056, 0.021, 0.013, 0.013]
+
+_SCHED_COLUMNS = ["key", "thread", "worker", "prefix", "group", "start", "finish", "stimulus_id", "called_from",
+                  "begins", "ends", "duration", "size", "time"]
+_WORKER_COLUMNS = ["key", "start", "finish", "called_from", "time"]
+_XFER_COLUMNS = ["start", "stop", "middle", "duration", "keys", "total", "bandwidth", "who", "type", "called_from",
+                 "time", "compressed"]
+
+
+def events_per_task(p_queued: float = 0.3, p_released: float = 0.8, p_transfer: float = 0.3) -> float:
+    """Returns the average number of csv rows :func:`generate_run` writes per task with these probabilities.
+
+    Useful to size a run by its number of events: `n_tasks = int(n_events / events_per_task())`.
+    """
+    mean_keys = sum((i + 1) * p for i, p in enumerate(KEYS_PER_TRANSFER))
+    scheduler = 3 + p_queued + p_released
+    worker = 4 + p_released
+    transfer = 2 * p_transfer / mean_keys
+    return scheduler + worker + transfer
+
+
+class _Run:
+    """The per-run constants shared by every block of tasks."""
+
+    def __init__(self, rng: np.random.Generator, n_workers: int):
+        self.tokens = [rng.bytes(16).hex() for _ in PREFIXES]
+        self.weights = np.array([w for _, w, _ in PREFIXES]) / sum(w for _, w, _ in PREFIXES)
+        ports = rng.choice(np.arange(30000, 50000), size=n_workers, replace=False)
+        self.workers = np.array(["tcp://10.201.{a}.{b}:{p}".format(a=i // 200, b=12 + i % 200, p=port)
+                                 for i, port in enumerate(ports)], dtype=object)
+        self.threads = rng.integers(2**44, 2**45, size=n_workers).astype(np.float64)
+        self.scheduler = "tcp://10.201.0.220:8786"
+
+
+def _task_keys(run: _Run, first: int, prefix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    keys = np.empty(len(prefix), dtype=object)
+    groups = np.empty(len(prefix), dtype=object)
+    for p, (name, _, ndim) in enumerate(PREFIXES):
+        idx = np.flatnonzero(prefix == p)
+        group = "{n}-{t}".format(n=name, t=run.tokens[p])
+        tail = ", 0" * (ndim - 1)
+        keys[idx] = ["('{g}', {i}{tail})".format(g=group, i=first + i, tail=tail) for i in idx]
+        groups[idx] = group
+    return keys, groups
+
+
+def _block(rng: np.random.Generator, run: _Run, first: int, n: int, t_first: float, rate: float,
+           p_queued: float, p_released: float, p_transfer: float) -> Dict[str, pd.DataFrame]:
+    n_workers = len(run.workers)
+    prefix = rng.choice(len(PREFIXES), size=n, p=run.weights)
+    key, group = _task_keys(run, first, prefix)
+    prefix_names = np.array([name.split("-_")[0] if name.startswith("block-info") else name for name, _, _ in PREFIXES],
+                            dtype=object)[prefix]
+    worker = rng.integers(0, n_workers, size=n)
+    size = rng.choice([336.0, 3324.0, 8192.0, 1048576.0], size=n, p=[0.5, 0.3, 0.15, 0.05])
+
+    # scheduler-side timeline of every task.
+    t_submit = t_first + np.arange(n) / rate
+    t_waiting = t_submit + rng.exponential(0.02, n)
+    queued = rng.random(n) < p_queued
+    t_queued = t_waiting + rng.exponential(0.01, n)
+    t_processing = np.where(queued, t_queued + rng.exponential(0.2, n), t_waiting + rng.exponential(0.02, n))
+    t_begins = t_processing + rng.exponential(0.005, n)
+    duration = rng.lognormal(-8.5, 1.0, n)
+    t_ends = t_begins + duration
+    t_memory = t_ends + rng.exponential(0.003, n)
+    released = rng.random(n) < p_released
+    t_released = t_memory + rng.exponential(1.0, n)
+    graph = np.floor(t_submit / 10) * 10
+
+    def sched(mask, start, finish, stim, t, done=False):
+        idx = np.flatnonzero(mask)
+        frame = {"key": key[idx], "thread": np.nan, "worker": None, "prefix": prefix_names[idx], "group": group[idx],
+                 "start": start, "finish": finish, "stimulus_id": stim[idx], "called_from": run.scheduler,
+                 "begins": np.nan, "ends": np.nan, "duration": np.nan, "size": np.nan, "time": t[idx]}
+        if done:
+            frame.update({"thread": run.threads[worker[idx]], "worker": run.workers[worker[idx]], "begins": t_begins[idx],
+                          "ends": t_ends[idx], "duration": duration[idx], "size": size[idx]})
+        return pd.DataFrame(frame, columns=_SCHED_COLUMNS)
+
+    update_graph = np.array(["update-graph-{g}".format(g=g) for g in graph], dtype=object)
+    task_finished = np.array(["task-finished-{t}".format(t=t) for t in t_memory], dtype=object)
+    every = np.ones(n, dtype=bool)
+    scheduler = pd.concat([
+        sched(every, "released", "waiting", update_graph, t_waiting),
+        sched(queued, "waiting", "queued", update_graph, t_queued),
+        sched(queued, "queued", "processing", update_graph, t_processing),
+        sched(~queued, "waiting", "processing", update_graph, t_processing),
+        sched(every, "processing", "memory", task_finished, t_memory, done=True),
+        sched(released, "memory", "released", task_finished, t_released),
+    ], ignore_index=True)
+
+    def trans(mask, start, finish, t):
+        idx = np.flatnonzero(mask)
+        return pd.DataFrame({"key": key[idx], "start": start, "finish": finish, "called_from": run.workers[worker[idx]],
+                             "time": t[idx]}, columns=_WORKER_COLUMNS)
+
+    worker_rows = pd.concat([
+        trans(every, "released", "waiting", t_processing + 0.001),
+        trans(every, "waiting", "ready", t_processing + 0.0015),
+        trans(every, "ready", "executing", t_begins),
+        trans(every, "executing", "memory", t_ends),
+        trans(released, "memory", "released", t_released + 0.001),
+    ], ignore_index=True)
+
+    # results fetched by another worker, several keys from the same worker at a time.
+    fetched = np.flatnonzero(rng.random(n) < p_transfer)
+    fetched = fetched[np.argsort(worker[fetched], kind="stable")]
+    n_keys = rng.choice(len(KEYS_PER_TRANSFER), size=len(fetched), p=KEYS_PER_TRANSFER) + 1
+    bounds = np.cumsum(n_keys)
+    bounds = bounds[bounds < len(fetched)]
+    groups_of_keys = [g for g in np.split(fetched, bounds) if len(g) > 0]
+    # split groups that span two workers, a transfer only ever comes from one worker.
+    transfers: List[np.ndarray] = []
+    for g in groups_of_keys:
+        cuts = np.flatnonzero(np.diff(worker[g])) + 1
+        transfers.extend(np.split(g, cuts))
+
+    n_xfers = len(transfers)
+    sender = np.array([worker[g[0]] for g in transfers], dtype=np.int64)
+    receiver = (sender + rng.integers(1, max(n_workers, 2), size=n_xfers)) % n_workers
+    total = np.array([size[g].sum() for g in transfers], dtype=np.int64)
+    start = np.array([t_memory[g].max() for g in transfers]) + rng.exponential(0.05, n_xfers)
+    xfer_duration = rng.lognormal(-4.5, 1.0, n_xfers)
+    stop = start + xfer_duration
+    keys = np.array(["{" + ", ".join("{k}: {s}".format(k=key[i], s=int(size[i])) for i in g) + "}" for g in transfers],
+                    dtype=object)
+    common = {"start": start, "stop": stop, "middle": (start + stop) / 2, "duration": xfer_duration, "keys": keys,
+              "total": total, "bandwidth": total / xfer_duration}
+    # every transfer is noted by the receiving worker (incoming) and by the sending worker (outgoing).
+    incoming = pd.DataFrame(dict(common, who=run.workers[sender], type="incoming_transfer",
+                                 called_from=run.workers[receiver], time=stop + rng.exponential(0.001, n_xfers),
+                                 compressed=np.nan), columns=_XFER_COLUMNS)
+    outgoing = pd.DataFrame(dict(common, who=run.workers[receiver], type="outgoing_transfer",
+                                 called_from=run.workers[sender], time=stop + rng.exponential(0.001, n_xfers),
+                                 compressed=(total + rng.integers(0, 64, size=n_xfers)).astype(np.float64)),
+                            columns=_XFER_COLUMNS)
+    transfer = pd.concat([incoming, outgoing], ignore_index=True)
+
+    return {"SCHED": scheduler.sort_values("time", kind="stable"),
+            "WTRANS": worker_rows.sort_values("time", kind="stable"),
+            "WXFER": transfer.sort_values("time", kind="stable")}
+
+
+def generate_run(directory: str, n_tasks: int, n_workers: int = 8, seed: int = 0, start_time: float = 1713455680.0,
+                 tasks_per_second: float = 2000.0, p_queued: float = 0.3, p_released: float = 0.8,
+                 p_transfer: float = 0.3, block_size: int = 100000) -> Dict[str, int]:
+    """Writes a synthetic Mofka-Dask run of `n_tasks` tasks into `directory`.
+
+    The same arguments always produce byte-identical files.
+
+    :param directory: The directory to write the three csv files to; created if missing.
+    :type directory: str
+    :param n_tasks: Number of tasks; see :func:`events_per_task` to size a run by events.
+    :type n_tasks: int
+    :param n_workers: Number of workers, defaults to 8
+    :type n_workers: int, optional
+    :param seed: Seed of the random number generator, defaults to 0
+    :type seed: int, optional
+    :param start_time: Epoch time of the first task submission, defaults to 1713455680.0
+    :type start_time: float, optional
+    :param tasks_per_second: Rate at which tasks are submitted, defaults to 2000.0
+    :type tasks_per_second: float, optional
+    :param p_queued: Probability that a task is queued before processing, defaults to 0.3
+    :type p_queued: float, optional
+    :param p_released: Probability that a task's result is released before the run ends, defaults to 0.8
+    :type p_released: float, optional
+    :param p_transfer: Probability that a task's result is fetched by another worker, defaults to 0.3
+    :type p_transfer: float, optional
+    :param block_size: Number of tasks generated (and held in memory) at a time, defaults to 100000
+    :type block_size: int, optional
+    :raises ValueError: when `n_tasks` or `n_workers` is not positive.
+    :return: Number of rows written per filecategory ("SCHED", "WTRANS", "WXFER").
+    :rtype: Dict[str, int]
+    """
+    if n_tasks < 1:
+        raise ValueError("n_tasks must be positive, got {n}.".format(n=n_tasks))
+    if n_workers < 1:
+        raise ValueError("n_workers must be positive, got {n}.".format(n=n_workers))
+
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    run = _Run(rng, n_workers)
+
+    filenames = {"SCHED": "scheduler_transition.csv", "WTRANS": "worker_transition.csv",
+                 "WXFER": "worker_transfer.csv"}
+    rows = {category: 0 for category in filenames}
+    files = {category: open(os.path.join(directory, name), "w", newline="") for category, name in filenames.items()}
+    try:
+        for first in range(0, n_tasks, block_size):
+            n = min(block_size, n_tasks - first)
+            frames = _block(rng, run, first, n, start_time + first / tasks_per_second, tasks_per_second,
+                            p_queued, p_released, p_transfer)
+            for category, df in frames.items():
+                # the coupler writes the dataframe index as an unnamed first column.
+                df.index = pd.RangeIndex(rows[category], rows[category] + len(df))
+                df.to_csv(files[category], header=(first == 0))
+                rows[category] += len(df)
+    finally:
+        for f in files.values():
+            f.close()
+    return rows
+
+
+def generate_events(directory: str, n_events: int, seed: int = 0, n_workers: Optional[int] = None,
+                    **kwargs) -> Dict[str, int]:
+    """Writes a synthetic run with about `n_events` csv rows in total, see :func:`generate_run`.
+
+    :param directory: The directory to write the three csv files to.
+    :type directory: str
+    :param n_events: Approximate total number of rows across the three files.
+    :type n_events: int
+    :param seed: Seed of the random number generator, defaults to 0
+    :type seed: int, optional
+    :param n_workers: Number of workers, defaults to None (8 workers per million events, at least 8).
+    :type n_workers: int, optional
+    :return: Number of rows written per filecategory.
+    :rtype: Dict[str, int]
+    """
+    probabilities = {k: kwargs[k] for k in ("p_queued", "p_released", "p_transfer") if k in kwargs}
+    n_tasks = max(1, int(round(n_events / events_per_task(**probabilities))))
+    if n_workers is None:
+        n_workers = max(8, 8 * n_events // 10**6)
+    return generate_run(directory, n_tasks, n_workers=n_workers, seed=seed, **kwargs)
@@ -0,0 +1,164 @@
+"""Output writers for the consolidated TaskHandler data, beyond the plain csv/txt/pickle dumps.
+"""
+import collections
+import itertools
+import pathlib
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque, Dict, Hashable, Iterable, Iterator, List, Mapping, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from .objs import ColumnarTaskHandler, Task, TaskHandler
+from .objs.enums import EventTypeEnum, TaskState, TransferTypeEnum
+from .profiling import stage
+
+_STATE_VALUES = [s.value for s in TaskState]
+_TRANSFER_VALUES = [t.value for t in TransferTypeEnum]
+
+#: Columns stored as dictionary-encoded strings in the columnar output formats.
+_DICTIONARY_COLUMNS = ["key", "ip", "requestor", "fulfiller", "stimulus_id"]
+
+
+def _require_pyarrow() -> None:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise ImportError("The parquet output format requires pyarrow. Install it with `pip install wfmeta_dask[parquet]`.") from e
+
+
+def _enum_categorical(column: pd.Series, categories: list) -> pd.Categorical:
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        # already categorical (as `to_df` returns them); only the categories have to be mapped to their values.
+        codes, uniques = column.cat.codes.to_numpy(), column.cat.categories
+    else:
+        codes, uniques = pd.factorize(column, use_na_sentinel=True)
+    lookup = {v: i for i, v in enumerate(categories)}
+    mapping = np.array([lookup[u.value] for u in uniques] + [-1], dtype=np.int64)
+    return pd.Categorical.from_codes(mapping[codes], categories=categories)
+
+
+def _string_categorical(column: pd.Series) -> pd.Categorical:
+    # task keys of transfer-only tasks are tuples; store them in the same "('name', i, ...)" form scheduler keys use.
+    codes, uniques = pd.factorize(column, use_na_sentinel=True)
+    str_codes, categories = pd.factorize(np.array([str(u) for u in uniques], dtype=object))
+    return pd.Categorical.from_codes(np.where(codes >= 0, np.append(str_codes, -1)[codes], -1), categories=categories)
+
+
+def to_arrow_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Converts one of the dataframes produced by `TaskHandler.to_df` into typed columns suitable for Arrow/Parquet.
+
+    `TaskState` and `TransferTypeEnum` columns become categoricals of their values, times become native timestamp
+    columns, and keys/IP addresses become dictionary-encoded (categorical) strings.
+
+    :param df: A dataframe from :meth:`~dask_md_objs.TaskHandler.to_df`.
+    :type df: pd.DataFrame
+    :return: A new dataframe with the same columns and rows.
+    :rtype: pd.DataFrame
+    """
+    out: Dict[str, object] = {}
+    for name in df.columns:
+        column = df[name]
+        if name in ("start", "finish") and not pd.api.types.is_datetime64_any_dtype(column):
+            out[name] = _enum_categorical(column, _STATE_VALUES)
+        elif name == "transfer_type":
+            out[name] = _enum_categorical(column, _TRANSFER_VALUES)
+        elif name in ("t_begins", "t_ends", "t_event"):
+            out[name] = pd.to_datetime(column).astype("datetime64[us]")
+        elif name in _DICTIONARY_COLUMNS:
+            out[name] = _string_categorical(column)
+        else:
+            out[name] = column.to_numpy()
+    return pd.DataFrame(out)
+
+
+def write_parquet(th: Union[TaskHandler, ColumnarTaskHandler], output: pathlib.Path) -> Dict[EventTypeEnum, pathlib.Path]:
+    """Writes one Parquet file per event type, named like the df_csv output (e.g. `SCHEDULER_df.parquet`).
+
+    :param th: The TaskHandler to write out.
+    :type th: :class:`~dask_md_objs.TaskHandler` or :class:`~dask_md_objs.ColumnarTaskHandler`
+    :param output: The directory to write the files to.
+    :type output: pathlib.Path
+    :raises ImportError: when pyarrow is not installed.
+    :return: The path written for each event type.
+    :rtype: Dict[EventTypeEnum, pathlib.Path]
+    """
+    _require_pyarrow()
+    paths: Dict[EventTypeEnum, pathlib.Path] = {}
+    with stage("to_df"):
+        dfs = th.to_df()
+    for event_type, df in dfs.items():
+        path = pathlib.Path(output).joinpath(event_type.name + "_df.parquet")
+        to_arrow_frame(df).to_parquet(path, index=False, compression="zstd")
+        paths[event_type] = path
+    return paths
+
+
+def read_parquet(directory: Union[str, pathlib.Path]) -> Dict[EventTypeEnum, pd.DataFrame]:
+    """Loads the dataframes written by :func:`write_parquet`, keeping their categorical and timestamp columns.
+
+    :param directory: The directory :func:`write_parquet` wrote to.
+    :type directory: str or pathlib.Path
+    :raises ImportError: when pyarrow is not installed.
+    :return: One dataframe per event type.
+    :rtype: Dict[EventTypeEnum, pd.DataFrame]
+    """
+    _require_pyarrow()
+    return {event_type: pd.read_parquet(pathlib.Path(directory).joinpath(event_type.name + "_df.parquet"))
+            for event_type in EventTypeEnum}
+
+
+def iter_txt(tasks: Iterable[Task]) -> Iterator[str]:
+    """Yields the txt output of `tasks` piece by piece; the pieces concatenate to the `str` of every task in turn.
+
+    :param tasks: The tasks to format, e.g. `th.tasks.values()`.
+    :type tasks: Iterable[Task]
+    :rtype: Iterator[str]
+    """
+    for task in tasks:
+        yield from task.iter_str()
+
+
+#: The tasks being written by :func:`write_txt`, inherited by (or sent once to) every formatting process.
+_txt_tasks: Optional[Mapping] = None
+
+
+def _init_txt_worker(tasks: Mapping) -> None:
+    global _txt_tasks
+    _txt_tasks = tasks
+
+
+def _format_tasks(keys: List[Hashable]) -> str:
+    return "".join(iter_txt(_txt_tasks[k] for k in keys))
+
+
+def write_txt(th: Union[TaskHandler, ColumnarTaskHandler], path: Union[str, pathlib.Path], jobs: int = 1,
+              chunksize: int = 2000) -> None:
+    """Writes the txt output of `th`, streaming it to the file one event at a time instead of building it in memory.
+
+    The file is the same, byte for byte, as writing `str(task)` for every task in order.
+
+    :param th: The TaskHandler to write out.
+    :type th: :class:`~dask_md_objs.TaskHandler` or :class:`~dask_md_objs.ColumnarTaskHandler`
+    :param path: The file to write.
+    :type path: str or pathlib.Path
+    :param jobs: Format chunks of `chunksize` tasks in this many processes, defaults to 1 (format while writing).
+        The processes get the handler once, when they start, and only a few chunks are in flight at a time.
+    :type jobs: int, optional
+    :param chunksize: Tasks per chunk when formatting in parallel, defaults to 2000.
+    :type chunksize: int, optional
+    """
+    with open(path, "w") as f:
+        if jobs <= 1:
+            f.writelines(iter_txt(th.tasks.values()))
+            return
+
+        keys = iter(th.tasks.keys())
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_txt_worker, initargs=(th.tasks,)) as pool:
+            pending: Deque[Future] = collections.deque()
+            while chunk := list(itertools.islice(keys, chunksize)):
+                pending.append(pool.submit(_format_tasks, chunk))
+                if len(pending) >= 2 * jobs:
+                    f.write(pending.popleft().result())
+            while pending:
+                f.write(pending.popleft().result())
@@ -0,0 +1,55 @@
+import pathlib
+from typing import Callable, Optional, Union
+
+import pytest
+
+from wfmeta_dask import RUN_FILES, extract_metadata
+from wfmeta_dask.objs import ColumnarTaskHandler, TaskHandler
+
+#: The run in the repository that tests load unless they generate their own.
+TEST_DATA = pathlib.Path("./tests/test_data")
+
+Handler = Union[TaskHandler, ColumnarTaskHandler]
+
+
+def _load_run(th: Optional[Handler] = None, directory: Union[str, pathlib.Path] = TEST_DATA,
+              chunksize: Optional[int] = None) -> Handler:
+    """Reads the three csv files of the run in `directory` into `th` (a new TaskHandler by default)."""
+    th = TaskHandler() if th is None else th
+    for name, category in RUN_FILES:
+        extract_metadata(str(pathlib.Path(directory, name)), category, False, th, chunksize=chunksize)
+    return th
+
+
+def _assert_same_tasks(a: Handler, b: Handler, ordered: bool = True) -> None:
+    """Asserts that two handlers hold the same tasks.
+
+    With `ordered`, the tasks and the events of every task must also come in the same order. Otherwise every task
+    only needs the same events, times and workers, as when the events were added in a different order (which can
+    also change the name a task got from its first event).
+    """
+    if ordered:
+        assert list(a.tasks.keys()) == list(b.tasks.keys())
+    else:
+        assert set(a.tasks.keys()) == set(b.tasks.keys())
+    for name, t_a in a.tasks.items():
+        t_b = b.tasks[name]
+        assert (t_a.t_start, t_a.t_end, t_a.initiated, set(t_a.workers)) == \
+            (t_b.t_start, t_b.t_end, t_b.initiated, set(t_b.workers))
+        if ordered:
+            assert t_a.name == t_b.name
+            assert [(type(e), e.__str__()) for e in t_a.events] == [(type(e), e.__str__()) for e in t_b.events]
+        else:
+            assert sorted(e.__str__() for e in t_a.events) == sorted(e.__str__() for e in t_b.events)
+
+
+@pytest.fixture
+def load_run() -> Callable[..., Handler]:
+    """Loads a run into a handler: `load_run(th=None, directory=TEST_DATA, chunksize=None)`."""
+    return _load_run
+
+
+@pytest.fixture
+def assert_same_tasks() -> Callable[..., None]:
+    """Compares the tasks of two handlers: `assert_same_tasks(a, b, ordered=True)`."""
+    return _assert_same_tasks
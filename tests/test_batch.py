@@ -0,0 +1,44 @@
+import json
+from pathlib import Path
+from shutil import copytree
+
+from wfmeta_dask.batch import MANIFEST_NAME, find_runs, run_batch
+
+def _make_campaign(tmpdir) -> Path :
+    root = Path(tmpdir / "campaign")
+    copytree("./tests/test_data", root / "D2024-04-18_15:54:02_R1_W8")
+    copytree("./tests/test_data", root / "nested" / "D2024-04-18_16:10:30_R2_W8")
+    # missing worker_transition.csv, so not a run
+    copytree("./tests/test_data", root / "incomplete")
+    (root / "incomplete" / "worker_transition.csv").unlink()
+    # all files present, but unreadable
+    bad = root / "D2024-04-18_17:00:00_R3_W8"
+    copytree("./tests/test_data", bad)
+    (bad / "scheduler_transition.csv").write_text("not,a,scheduler\nfile,at,all\n")
+    return root
+
+def test_findRuns(tmpdir) :
+    root = _make_campaign(tmpdir)
+
+    runs = find_runs(str(root))
+    assert [Path(r).name for r in runs] == ["D2024-04-18_15:54:02_R1_W8", "D2024-04-18_17:00:00_R3_W8",
+                                            "D2024-04-18_16:10:30_R2_W8"]
+    assert find_runs(str(root / "D2024-04-18_1*")) == runs[:2]
+    assert find_runs(str(root / "incomplete")) == []
+
+def test_batchKeepsGoingPastBadRun(tmpdir) :
+    root = _make_campaign(tmpdir)
+    out = Path(tmpdir / "out")
+
+    manifest = run_batch(find_runs(str(root)), out, "df_csv", jobs=2)
+
+    assert manifest["n_runs"] == 3 and manifest["n_failed"] == 1
+    assert json.loads((out / MANIFEST_NAME).read_text()) == manifest
+    ok = [e for e in manifest["runs"] if e["status"] == "ok"]
+    assert len(ok) == 2
+    for entry in ok :
+        assert entry["rows"] == {"SCHED": 99, "WXFER": 99, "WTRANS": 99}
+        assert Path(entry["output"]).joinpath("SCHEDULER_df.csv").is_file()
+    assert (out / "nested" / "D2024-04-18_16:10:30_R2_W8" / "WORKER_df.csv").is_file()
+    failed = [e for e in manifest["runs"] if e["status"] == "failed"][0]
+    assert failed["run"].endswith("R3_W8") and "ValueError" in failed["error"]
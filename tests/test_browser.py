@@ -0,0 +1,101 @@
+import threading
+
+import numpy as np
+import pytest
+
+from wfmeta_dask.browser import TaskBrowser
+from wfmeta_dask.objs import TaskHandler
+from wfmeta_dask.objs.enums import EventTypeEnum
+from wfmeta_dask.store import write_store
+
+
+def test_browserStore(tmp_path, load_run):
+    th = load_run()
+    path = tmp_path / "output.wfstore"
+    write_store(th, path)
+
+    rendered = []
+
+    def render(key, task):
+        rendered.append(key)
+        return task.__str__()
+
+    with TaskBrowser(path, render, panel_cache_size=2) as browser:
+        # nothing is read before it is asked for.
+        assert browser._names is None and browser._times is None
+
+        page = browser.search(page_size=10)
+        assert page.total == len(th.tasks) and page.n_pages == -(-len(th.tasks) // 10)
+        assert page.keys == th.return_names()[:10]
+        last = browser.search(page=page.n_pages - 1, page_size=10)
+        assert last.keys == th.return_names()[(page.n_pages - 1) * 10:]
+        assert browser.search(page=page.n_pages, page_size=10).keys == []
+
+        name = th.return_names()[3]
+        text = str(name)[2:12].upper()
+        found = browser.search(text, page_size=len(th.tasks)).keys
+        assert name in found and all(text.lower() in str(k).lower() for k in found)
+        with pytest.raises(ValueError):
+            browser.search(page=-1)
+
+        a, b, c = th.return_names()[:3]
+        assert browser.panel(a) == th.tasks[a].__str__()
+        browser.panel(b)
+        browser.panel(a)
+        browser.panel(c)  # evicts b, the least recently used
+        browser.panel(a)
+        browser.panel(b)
+        assert rendered == [a, b, c, b]
+        with pytest.raises(KeyError):
+            browser.panel("not-a-task")
+
+        rates = browser.event_rates(50)
+        assert len(rates.edges) == 51
+        n_events = {t: len(df) for t, df in th.to_df().items()}
+        for event_type in EventTypeEnum:
+            assert rates.counts[event_type].sum() == n_events[event_type]
+
+
+def test_browserHandlerZoom(load_run):
+    th = load_run()
+    browser = TaskBrowser(th)
+    first, last = browser.time_range()
+    whole = browser.event_rates(100)
+    # a zoomed-in window counts the same events as the matching slice of the coarse bins.
+    zoomed = browser.event_rates(10, whole.edges[20], whole.edges[30])
+    counts = whole.counts[EventTypeEnum.WORKER]
+    assert zoomed.counts[EventTypeEnum.WORKER].sum() == counts[20:30].sum() + \
+        np.sum(browser._times[EventTypeEnum.WORKER] == whole.edges[30])
+    assert zoomed.edges[0] == whole.edges[20] and first == whole.edges[0] and last == whole.edges[-1]
+    assert browser.search("", page_size=5).keys == th.return_names()[:5]
+
+
+def test_browserEmpty():
+    browser = TaskBrowser(TaskHandler())
+    assert browser.search().keys == [] and browser.search().n_pages == 1
+    assert all(len(c) == 0 for c in browser.event_rates().counts.values())
+
+
+class _SlowHandler(TaskHandler):
+    """A handler whose event index is only built once it is released."""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def event_index(self):
+        assert self.release.wait(10)
+        return super().event_index()
+
+
+def test_browserPreloadDoesNotBlock(load_run):
+    th = load_run(_SlowHandler())
+    browser = TaskBrowser(th)
+    thread = browser.preload()
+    # searches and panels are served while the event times are still being read.
+    assert browser.search(page_size=5).keys == th.return_names()[:5]
+    assert browser.panel(th.return_names()[0]) == th.tasks[th.return_names()[0]].__str__()
+    assert browser._times is None
+    th.release.set()
+    thread.join(10)
+    assert sum(len(t) for t in browser._times.values()) == len(th.event_index())
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+
+from wfmeta_dask import RUN_FILES
+from wfmeta_dask.sources import _event_type
+from wfmeta_dask.objs import ColumnarTaskHandler, TaskHandler, WXferEvent
+from wfmeta_dask.objs.enums import EventTypeEnum, TaskState
+
+
+def test_columnarMatchesTaskHandler(load_run, assert_same_tasks):
+    th = load_run(TaskHandler())
+    cth = load_run(ColumnarTaskHandler())
+
+    assert_same_tasks(th, cth)
+    for e_type, df in th.to_df().items():
+        pd.testing.assert_frame_equal(df, cth.to_df()[e_type])
+    for e_type, df in th.to_df(key_parts=True).items():
+        pd.testing.assert_frame_equal(df, cth.to_df(key_parts=True)[e_type])
+
+
+def test_columnarChunkedMatchesTaskHandler(load_run, assert_same_tasks):
+    th = load_run(TaskHandler())
+    cth = load_run(ColumnarTaskHandler(), chunksize=7)
+
+    # the NaN and keyset codes grow with every chunk instead of being rebuilt.
+    assert len(cth._keyset_codes) == len(cth._xfer_keys) and len(cth._ip_is_nan) <= len(cth._ips)
+    assert_same_tasks(th, cth)
+    assert len(th.return_all_wxfer_events()) == len(cth.return_all_wxfer_events())
+
+
+def test_columnarDedupsMissingTimesLikeTaskHandler():
+    df = pd.read_csv("./tests/test_data/worker_transfer.csv", usecols=WXferEvent.csv_columns).head(3)
+    df["start"] = np.nan
+    df.loc[1, "time"] = np.nan
+    df.loc[2, "duration"] = np.nan
+    # missing times compare equal, a missing duration never does.
+    data = pd.concat([df, df], ignore_index=True)
+
+    th = TaskHandler()
+    th.add_df(WXferEvent, data)
+    cth = ColumnarTaskHandler()
+    cth.add_df(WXferEvent, data)
+    assert len(cth._wxfer) == 4
+    assert [e.__str__() for e in th.return_all_wxfer_events()] == [e.__str__() for e in cth.return_all_wxfer_events()]
+
+
+def test_columnarSortTasksByTime(load_run, assert_same_tasks):
+    th = load_run(TaskHandler())
+    cth = load_run(ColumnarTaskHandler())
+    th.sort_tasks_by_time()
+    cth.sort_tasks_by_time()
+
+    assert_same_tasks(th, cth)
+    assert [e.__str__() for e in th.return_all_wxfer_events()] == [e.__str__() for e in cth.return_all_wxfer_events()]
+
+
+def test_toDfTypedColumns(load_run):
+    for th in (load_run(TaskHandler()), load_run(ColumnarTaskHandler())):
+        dfs = th.to_df()
+        sched = dfs[EventTypeEnum.SCHEDULER]
+        assert sched["finish"].dtype == "category"
+        assert list(sched["finish"].cat.categories) == list(TaskState)
+        assert (sched["finish"] == TaskState.PROCESSING).sum() == (sched["finish"].astype(object) == TaskState.PROCESSING).sum() > 0
+        assert str(sched["t_begins"].dtype) == "datetime64[us]"
+        assert str(sched["t_event"].dtype) == "datetime64[us]"
+        assert "t_event" in dfs[EventTypeEnum.WORKER].columns
+        assert dfs[EventTypeEnum.WORKER_TRANSFER]["transfer_type"].dtype == "category"
+
+
+def test_sortedAtIngest(assert_same_tasks):
+    # rows in reverse order put every task's events out of time order, so they have to be merged in.
+    frames = [(category, pd.read_csv("./tests/test_data/" + name).iloc[::-1]) for name, category in RUN_FILES]
+    expected = TaskHandler()
+    for category, df in frames:
+        expected.add_df(_event_type(category), df)
+    expected.sort_tasks_by_time()
+
+    for th in (TaskHandler(sorted=True), ColumnarTaskHandler(sorted=True)):
+        for category, df in frames:
+            th.add_df(_event_type(category), df)
+        th.sort_tasks_by_time()
+        assert_same_tasks(expected, th)
+
+    # a handler sorted halfway through keeps the events added afterwards in order, including merged ones.
+    for th, other in ((TaskHandler(), TaskHandler()), (ColumnarTaskHandler(), ColumnarTaskHandler(sorted=True))):
+        th.add_df(_event_type(frames[0][0]), frames[0][1])
+        th.sort_tasks_by_time()
+        for category, df in frames[1:]:
+            other.add_df(_event_type(category), df)
+        th.merge(other)
+        assert th.sorted
+        assert_same_tasks(expected, th)
@@ -0,0 +1,114 @@
+import pickle
+from pathlib import Path
+
+from wfmeta_dask import RUN_FILES
+from wfmeta_dask.follow import CHECKPOINT_LOG_NAME, CHECKPOINT_NAME, CsvTail, Follower
+from wfmeta_dask.objs import SchedulerEvent
+
+def _write_prefix(run: Path, fraction: float) -> None :
+    """Writes the first `fraction` of every test data file, cutting the last line in half."""
+    for name, _ in RUN_FILES :
+        data = Path("./tests/test_data", name).read_bytes()
+        (run / name).write_bytes(data[:int(len(data) * fraction)])
+
+def _assert_follows_run(th, load_run, assert_same_tasks) -> None :
+    """Asserts that a follower ingested the whole test run, with every task in time order."""
+    expected = load_run()
+    expected.sort_tasks_by_time()
+    assert_same_tasks(th, expected, ordered=False)
+    for task in th.tasks.values() :
+        times = [e.t_event for e in task.events]
+        assert times == sorted(times)
+
+def test_csvTailOnlyReadsCompleteLines(tmpdir) :
+    path = Path(tmpdir / "scheduler_transition.csv")
+    data = Path("./tests/test_data/scheduler_transition.csv").read_bytes()
+    lines = data.splitlines(keepends=True)
+    tail = CsvTail(str(path), SchedulerEvent.csv_columns)
+
+    assert tail.read() is None
+    path.write_bytes(lines[0][:10])
+    assert tail.read() is None
+    path.write_bytes(b"".join(lines[:3]) + lines[3][:20])
+    assert len(tail.read()) == 2
+    assert len(tail.read()) == 2  # not advanced yet
+    tail.advance()
+    assert tail.read() is None
+    path.write_bytes(data)
+    assert len(tail.read()) == len(lines) - 3
+
+def test_followMatchesFullRead(tmpdir, load_run, assert_same_tasks) :
+    run = Path(tmpdir / "run")
+    run.mkdir()
+    follower = Follower(str(run), Path(tmpdir / "out"), "df_csv", checkpoint=False)
+    for fraction in (0.3, 0.5, 0.9, 1.0) :
+        _write_prefix(run, fraction)
+        follower.poll()
+    _assert_follows_run(follower.th, load_run, assert_same_tasks)
+
+def test_followResumesFromCheckpoint(tmpdir, load_run, assert_same_tasks) :
+    run = Path(tmpdir / "run")
+    out = Path(tmpdir / "out")
+    run.mkdir()
+
+    _write_prefix(run, 0.6)
+    Follower(str(run), out, "df_csv").run(interval=0, max_polls=1)
+    assert (out / CHECKPOINT_NAME).is_file() and (out / "SCHEDULER_df.csv").is_file()
+
+    _write_prefix(run, 1.0)
+    follower = Follower(str(run), out, "df_csv")
+    assert len(follower.th.tasks) > 0
+    follower.run(interval=0, max_polls=1)
+    _assert_follows_run(follower.th, load_run, assert_same_tasks)
+
+def test_followCheckpointLogsOnlyNewRows(tmpdir, load_run, assert_same_tasks) :
+    run = Path(tmpdir / "run")
+    out = Path(tmpdir / "out")
+    run.mkdir()
+
+    follower = Follower(str(run), out, "df_csv")
+    out.mkdir()
+    sizes = []
+    for fraction in (0.3, 0.6) :
+        _write_prefix(run, fraction)
+        follower.poll()
+        follower.write_checkpoint()
+        sizes.append((out / CHECKPOINT_LOG_NAME).stat().st_size)
+    # the second checkpoint appends the rows of the second poll, it does not rewrite the first ones.
+    assert 0 < sizes[0] < sizes[1] < 2.5 * sizes[0]
+    assert (out / CHECKPOINT_NAME).stat().st_size < 4096
+
+    # rows logged by a checkpoint that never finished are dropped, and read again from the run files.
+    _write_prefix(run, 1.0)
+    follower.poll()
+    with open(out / CHECKPOINT_LOG_NAME, "ab") as f :
+        f.write(pickle.dumps(follower._pending))
+    follower = Follower(str(run), out, "df_csv")
+    follower.poll()
+    _assert_follows_run(follower.th, load_run, assert_same_tasks)
+
+def test_followRateLimitsOutputs(tmpdir, load_run, assert_same_tasks) :
+    run = Path(tmpdir / "run")
+    out = Path(tmpdir / "out")
+    run.mkdir()
+    fractions = [0.3, 0.6, 1.0]
+    calls = []
+
+    class Growing(Follower) :
+        def poll(self) :
+            if fractions :
+                _write_prefix(run, fractions.pop(0))
+            return super().poll()
+
+        def refresh(self) :
+            calls.append("refresh")
+            super().refresh()
+
+        def write_checkpoint(self) :
+            calls.append("checkpoint")
+            super().write_checkpoint()
+
+    Growing(str(run), out, "df_csv").run(interval=0, max_polls=4, write_interval=3600)
+    # outputs are written on the first new rows and when stopping, every poll with new rows is checkpointed.
+    assert calls == ["refresh", "checkpoint", "checkpoint", "checkpoint", "refresh", "checkpoint"]
+    _assert_follows_run(Follower(str(run), out, "df_csv").th, load_run, assert_same_tasks)
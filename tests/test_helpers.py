@@ -0,0 +1,64 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from wfmeta_dask.helpers import (KeyParts, decompose_keys, epoch_to_datetimes, key_prefixes, key_split, parse_key,
+                                 parse_wxfer_keys)
+
+
+def test_epochToDatetimesMatchesFromtimestamp():
+    stamps = np.array([1713455684.735809, 1713455684.7617555, 0.9999995, 1.0000005, np.nan])
+    converted = epoch_to_datetimes(stamps)
+
+    for ts, dt in zip(stamps[:-1], converted[:-1]):
+        assert dt == datetime.fromtimestamp(ts)
+    assert converted[-1] is None
+
+
+def test_parseWxferKeysMatchesEval():
+    samples = ["{('array-8838909ee9756e34565341881e2e6f0c', 120): 336}",
+               "{('save_file-331f', 140, 0, 0, 0): 34047720, ('save_file-331f', 119, 0, 0, 0): 111165768}",
+               "{\"('array-8838909ee9756e34565341881e2e6f0c', 12)\": 336}",
+               "{('a',): -1, 'b\\'c': 2.5e3}",
+               "{}"]
+    for s in samples:
+        assert parse_wxfer_keys(s) == eval(s)
+
+
+def test_parseWxferKeysRejectsCode():
+    for s in ["__import__('os').getcwd()", "{1: 2}}", "[1, 2]"]:
+        with pytest.raises(ValueError):
+            parse_wxfer_keys(s)
+
+
+def test_parseWxferKeysReturnsCopies():
+    s = "{('array-8838909ee9756e34565341881e2e6f0c', 120): 336}"
+    first = parse_wxfer_keys(s)
+    first.clear()
+    assert parse_wxfer_keys(s) == eval(s)
+
+
+def test_keySplit():
+    keys = ["('block-info-_map_read_frame-c50155175b03e4c1ec9664317841e345', 127, 0, 0, 0)",
+            "('chunk_max-partial-80f8e741f300d2a084fb2c4c7220e333', 60, 0, 0, 0)", "('x-abc', 1)",
+            "finalize-abcdef12", "c50155175b03e4c1ec9664317841e345", ("tuple-key", 1), ""]
+    expected = ["block-info", "chunk_max-partial", "x", "finalize", "data", "tuple-key", "Other"]
+    assert [key_split(k) for k in keys] == expected
+    assert list(key_prefixes(keys)) == expected
+
+
+def test_parseKey():
+    token = "c50155175b03e4c1ec9664317841e345"
+    assert parse_key("('block-info-_map_read_frame-{t}', 127, 0, 0, 0)".format(t=token)) == \
+        KeyParts("block-info-_map_read_frame-" + token, "block-info", token, (127, 0, 0, 0))
+    assert parse_key(("x-1234abcd", 3)) == KeyParts("x-1234abcd", "x", "1234abcd", (3,))
+    assert parse_key("finalize") == KeyParts("finalize", "finalize", None, ())
+    assert parse_key("('unclosed") == KeyParts("('unclosed", "unclosed", None, ())
+
+    keys = ["('x-1234abcd', 0, 1)", "('x-1234abcd', 1, 1)", "('y', 0, 1)", "('x-1234abcd', 0, 1)"]
+    df = decompose_keys(keys)
+    assert list(df["key_name"]) == ["x-1234abcd", "x-1234abcd", "y", "x-1234abcd"]
+    assert list(df["key_index"].cat.categories) == [(0, 1), (1, 1)]
+    assert df["key_token"].isna().tolist() == [False, False, True, False]
+    assert df.groupby("key_prefix", observed=True).size().to_dict() == {"x": 3, "y": 1}
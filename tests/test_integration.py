@@ -1,9 +1,13 @@
 # Should eventually be moved into the combination repository
 import pytest
-from wfmeta_dask import extract_metadata
+from wfmeta_dask import RUN_FILES, extract_metadata, extract_parallel
+from wfmeta_dask.parallel import split_csv
 from pathlib import Path
 from shutil import copy
 
+import pandas as pd
+
+from wfmeta_dask.objs import ColumnarTaskHandler, SchedulerEvent, WorkerEvent, WXferEvent
 from wfmeta_dask.objs.tasks import TaskHandler
 
 def test_simple(tmpdir) :
@@ -33,4 +37,64 @@ def test_simple(tmpdir) :
     extract_metadata(*options_wo)
     extract_metadata(*options_wx)
 
-    pass
\ No newline at end of file
+    assert len(th.tasks) == 118
+    events = [e for t in th.tasks.values() for e in t.events]
+    assert sum(isinstance(e, SchedulerEvent) for e in events) == 99
+    assert sum(isinstance(e, WorkerEvent) for e in events) == 99
+    assert len(th.return_all_wxfer_events()) == 99
+
+    task = th.get_task_by_name("('block-info-_map_read_frame-c50155175b03e4c1ec9664317841e345', 127, 0, 0, 0)")
+    assert len(task.events) == 5
+    assert list(task.workers) == ["tcp://10.201.0.212:34699"]
+
+def _row_by_row(filename, eventtype, th: TaskHandler) -> TaskHandler:
+    dat = pd.read_csv(filename)
+    for i in range(0, dat.shape[0]):
+        th.add_event(eventtype(dat.iloc(axis=0)[i]))
+    return th
+
+
+def test_extract_matches_row_loop(assert_same_tasks):
+    files = [("./tests/test_data/scheduler_transition.csv", "SCHED", SchedulerEvent),
+             ("./tests/test_data/worker_transfer.csv", "WXFER", WXferEvent),
+             ("./tests/test_data/worker_transition.csv", "WTRANS", WorkerEvent)]
+
+    expected = TaskHandler()
+    th = TaskHandler()
+    for filename, category, eventtype in files:
+        _row_by_row(filename, eventtype, expected)
+        extract_metadata(filename, category, False, th)
+
+    assert_same_tasks(expected, th)
+
+
+def test_extract_chunked_matches_whole_file(load_run, assert_same_tasks):
+    for handler_type in (TaskHandler, ColumnarTaskHandler):
+        assert_same_tasks(load_run(handler_type()), load_run(handler_type(), chunksize=7))
+
+
+def test_extract_parallel_matches_sequential(load_run, assert_same_tasks):
+    files = [("./tests/test_data/" + name, category) for name, category in RUN_FILES]
+
+    for columnar in (False, True):
+        sequential = load_run(ColumnarTaskHandler() if columnar else TaskHandler())
+
+        merged = extract_parallel(files, jobs=2, parts=[3, 2, 1], columnar=columnar)
+        assert_same_tasks(sequential, merged)
+
+        sequential.sort_tasks_by_time()
+        merged = extract_parallel(files, jobs=2, parts=[3, 2, 1], columnar=columnar, sorted=True)
+        assert merged.sorted
+        assert_same_tasks(sequential, merged)
+
+
+def test_split_csv_covers_every_row():
+    filename = "./tests/test_data/worker_transfer.csv"
+    ranges = split_csv(filename, 4)
+    assert len(ranges) == 4
+
+    with open(filename, "rb") as f:
+        f.readline()
+        assert ranges[0][0] == f.tell()
+    for (_, end), (start, _) in zip(ranges[:-1], ranges[1:]):
+        assert end == start
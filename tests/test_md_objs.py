@@ -3,7 +3,7 @@ import random
 from typing import Any, Dict, Optional
 import json
 
-from wfmeta_dask.objs.tasks import TransferTypeEnum, WXferEvent
+from wfmeta_dask.objs.tasks import TaskHandler, TransferTypeEnum, WXferEvent
 
 def generate_random_taskname() -> str :
     output: str = "('array-8838909ee9756e34565341881e2e6f0c', {n})".format(n=str(random.randint(0,500)))
@@ -99,9 +99,82 @@ def test_equivalencyXfer() :
     assert not (dummy_out == dummy_out_2)
 
 
+def test_hashXfer() :
+    dummy_out_data = generate_dummy_wxfer_data(TransferTypeEnum.OUTGOING, n_keys=3)
+    dummy_out = WXferEvent(dummy_out_data)
+    dummy_out_clone = WXferEvent(dummy_out_data)
+    dummy_out_2 = generate_dummy_wxfer(TransferTypeEnum.OUTGOING)
+
+    assert hash(dummy_out) == hash(dummy_out_clone)
+    assert len({dummy_out, dummy_out_clone, dummy_out_2}) == 2
+
+def test_dedupXferInTaskHandler() :
+    data = generate_dummy_wxfer_data(TransferTypeEnum.INCOMING, n_keys=2)
+    th = TaskHandler()
+    th.add_event(WXferEvent(data))
+    th.add_event(WXferEvent(data))
+    th.add_event(generate_dummy_wxfer(TransferTypeEnum.INCOMING))
+
+    for key in WXferEvent(data).return_key_names() :
+        assert len(th.get_task_by_name(key).events) == 1
+    assert len(th.return_all_wxfer_events()) == 2
+    assert len(th.return_all_wxfer_events(TransferTypeEnum.OUTGOING)) == 0
+
+def test_internedStringsAndWorkers() :
+    data = generate_dummy_wxfer_data(TransferTypeEnum.INCOMING, n_keys=2)
+    first = WXferEvent(data)
+    second = WXferEvent(dict(data, who="".join(data["who"]), called_from="".join(data["called_from"])))
+    assert not hasattr(first, "__dict__")
+
+    th = TaskHandler()
+    th.add_event(first)
+    th.add_event(generate_dummy_wxfer(TransferTypeEnum.INCOMING))
+    th.add_event(second)
+
+    assert second.requestor is first.requestor and second.fulfiller is first.fulfiller
+    task = th.get_task_by_name(first.get_key_name())
+    assert list(task.workers) == [first.requestor, first.fulfiller]
+
+def test_mergeInternsStrings() :
+    data = generate_dummy_wxfer_data(TransferTypeEnum.INCOMING, n_keys=2)
+    first = WXferEvent(data)
+    moved = generate_dummy_wxfer(TransferTypeEnum.INCOMING)
+    moved.requestor = "".join(first.requestor)
+    second = WXferEvent(dict(data, who="".join(data["who"]), called_from="".join(data["called_from"]),
+                             start=data["start"] + 1))
+
+    th = TaskHandler()
+    th.add_event(first)
+    other = TaskHandler()
+    other.add_event(moved)
+    other.add_event(second)
+    assert moved.requestor is not first.requestor
+    th.merge(other)
+
+    assert second.requestor is first.requestor and second.fulfiller is first.fulfiller
+    assert moved.requestor is first.requestor
+    task = th.get_task_by_name(moved.get_key_name())
+    assert next(iter(task.workers)) is first.requestor
+
 def test_creatingTaskHandler() :
     assert True
 
 def test_SchedulerEventToDF() :
 
-    pass
\ No newline at end of file
+    pass
+def test_lazyEpochTimes() :
+    data = generate_dummy_wxfer_data(TransferTypeEnum.INCOMING)
+    event = WXferEvent(data)
+    assert type(event._start) is float and event._start == data["start"]
+    assert event.start == datetime.fromtimestamp(data["start"])
+    assert event.t_event == datetime.fromtimestamp(data["time"])
+
+    event.stop = datetime.fromtimestamp(data["stop"] + 1.5)
+    assert event._stop == data["stop"] + 1.5
+    event.middle = None
+    assert event.middle is None and event._middle != event._middle
+
+    th = TaskHandler()
+    th.add_event(event)
+    task = th.get_task_by_name(event.get_key_name())
+    assert task.t_start is None and task.t_end is None
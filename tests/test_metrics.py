@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from wfmeta_dask.objs import ColumnarTaskHandler, TaskHandler
+from wfmeta_dask.objs.metrics import STATE_VALUES, lifecycles, make_transitions, state_durations, state_intervals
+
+
+def _state(*names):
+    return [STATE_VALUES.index(n) for n in names]
+
+
+def _transitions():
+    # task a: waiting at 0, processing at 1, memory at 4 on the scheduler; ready at 2, executing at 2.5, memory at 4
+    # on worker w1. task b: waiting at 1, processing at 3 on the scheduler. Rows are deliberately out of order.
+    keys = ["('a-1', 0)", "('b-2', 0)"]
+    ips = ["sched", "w1"]
+    rows = [(0, 0, 0, "released", "waiting", 0.0), (0, 0, 0, "processing", "memory", 4.0),
+            (0, 1, 1, "waiting", "ready", 2.0), (1, 0, 0, "released", "waiting", 1.0),
+            (0, 0, 0, "waiting", "processing", 1.0), (0, 1, 1, "ready", "executing", 2.5),
+            (0, 1, 1, "executing", "memory", 4.0), (1, 0, 0, "waiting", "processing", 3.0)]
+    key, source, ip, start, finish, t = zip(*rows)
+    return make_transitions(key, keys, source, ip, ips, _state(*start), _state(*finish), t, np.arange(len(rows)))
+
+
+def test_stateIntervals():
+    intervals = state_intervals(_transitions())
+    a = intervals[(intervals["key"] == "('a-1', 0)") & (intervals["source"] == "scheduler")]
+    assert list(a["state"]) == ["waiting", "processing", "memory"]
+    np.testing.assert_array_equal(a["duration"], [1.0, 3.0, np.nan])
+
+
+def test_stateDurations():
+    tr = _transitions()
+    by_task = state_durations(tr)
+    assert list(by_task.columns) == ["waiting", "processing"]
+    assert by_task.loc["('a-1', 0)", "processing"] == 3.0
+    assert by_task.loc["('b-2', 0)", "waiting"] == 2.0
+    assert np.isnan(by_task.loc["('b-2', 0)", "processing"])
+
+    by_prefix = state_durations(tr, by="prefix")
+    assert by_prefix.loc["a", "waiting"] == 1.0 and by_prefix.loc["b", "waiting"] == 2.0
+    by_worker = state_durations(tr, "worker", by="worker")
+    assert by_worker.loc["w1"].to_dict() == {"ready": 0.5, "executing": 1.5}
+
+    with pytest.raises(ValueError):
+        state_durations(tr, source="nanny")
+    with pytest.raises(ValueError):
+        state_durations(tr, by="group")
+
+
+def test_lifecycles():
+    out = lifecycles(_transitions())
+    assert out.loc["('a-1', 0)"].to_dict() == {"t_first": 0.0, "t_last": 4.0, "lifetime": 4.0, "n_scheduler": 3,
+                                               "n_worker": 3, "n_workers": 1}
+    assert out.loc["('b-2', 0)", "n_workers"] == 0
+
+
+def test_handlersAgree(load_run):
+    th = load_run(TaskHandler())
+    cth = load_run(ColumnarTaskHandler())
+
+    # TaskHandler events only keep microseconds, so times differ by rounding; the handlers number ips differently.
+    for source in ["scheduler", "worker"]:
+        for by in ["task", "prefix", "worker"]:
+            pd.testing.assert_frame_equal(th.state_durations(source, by).sort_index(),
+                                          cth.state_durations(source, by).sort_index(), atol=1e-5)
+    pd.testing.assert_frame_equal(th.lifecycles(), cth.lifecycles(), atol=1e-5)
+    assert len(th.state_intervals()) == len(cth.state_intervals()) == 2 * 99
@@ -0,0 +1,49 @@
+import json
+import pathlib
+import tracemalloc
+
+from wfmeta_dask import RUN_FILES, process_run
+from wfmeta_dask.profiling import Profiler, profiled, stage
+
+def test_stageWithoutProfiler() :
+    with stage("read_csv", "SCHED") as s :
+        s.rows = 3
+    assert s.rows == 3
+
+def test_profilerRecordsStages(load_run) :
+    with Profiler(trace_memory=True) as profiler :
+        load_run()
+        with stage("outer") :
+            with stage("inner", rows=10) :
+                data = [0] * 100000
+            del data
+
+    report = json.loads(json.dumps(profiler.report()))
+    stages = {(s["stage"], s["category"]): s for s in report["stages"]}
+    for _, category in RUN_FILES :
+        assert stages[("read_csv", category)]["rows"] == 99
+        assert stages[("add_df", category)]["calls"] == 1
+        assert stages[("add_df", category)]["rows_per_second"] > 0
+    assert stages[("outer", None)]["peak_traced_bytes"] >= stages[("inner", None)]["peak_traced_bytes"] > 800000
+    assert report["total"]["wall_seconds"] >= stages[("outer", None)]["wall_seconds"]
+    assert len(report["allocations"]) > 0
+    assert not tracemalloc.is_tracing()
+
+def test_profilerKeepsCallersTracing() :
+    tracemalloc.start()
+    try :
+        with Profiler(trace_memory=True) :
+            with stage("inner") :
+                pass
+        assert tracemalloc.is_tracing()
+    finally :
+        tracemalloc.stop()
+
+def test_profiledProcessRun(tmpdir) :
+    out = pathlib.Path(tmpdir)
+    with profiled(str(out / "profile.json"), str(out / "run.prof")) :
+        process_run("./tests/test_data", out, "df_csv")
+
+    stages = [(s["stage"], s["category"]) for s in json.loads((out / "profile.json").read_text())["stages"]]
+    assert stages[-3:] == [("sort", None), ("to_df", None), ("write", "df_csv")]
+    assert (out / "run.prof").stat().st_size > 0
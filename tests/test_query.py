@@ -0,0 +1,90 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from wfmeta_dask import extract_metadata
+from wfmeta_dask.helpers import key_split
+from wfmeta_dask.objs import ColumnarTaskHandler, TaskHandler, WXferEvent
+from wfmeta_dask.objs.enums import EventTypeEnum, TaskState
+from wfmeta_dask.synthetic import generate_run
+
+
+def _scan(th, worker=None, state=None, event_type=None, prefix=None, window=None):
+    """Keys of the tasks with a matching event, found by visiting every event."""
+    found = []
+    for key, task in th.tasks.items():
+        if prefix is not None and key_split(key) != prefix:
+            continue
+        for e in task.events:
+            if isinstance(e, WXferEvent):
+                ok = (worker is None or worker in (e.requestor, e.fulfiller)) and state is None
+            else:
+                ok = (worker is None or e.ip == worker) and (state is None or e.finish == state)
+            ok = ok and (event_type is None or e.e_type == event_type)
+            ok = ok and (window is None or window[0] <= e._t_event <= window[1])
+            if ok:
+                found.append(key)
+                break
+    return found
+
+
+@pytest.mark.parametrize("handler_type", [TaskHandler, ColumnarTaskHandler])
+def test_queryMatchesScan(tmpdir, handler_type, load_run):
+    generate_run(str(tmpdir), 300, n_workers=4, seed=3)
+    th = load_run(handler_type(), tmpdir)
+    index = th.event_index()
+    workers = [w for w in index.values("worker")]
+    prefixes = index.values("prefix")
+    t = index.t_event[~np.isnan(index.t_event)]
+    window = (np.quantile(t, 0.3), np.quantile(t, 0.6))
+
+    for worker in workers[:3] + [None]:
+        for state in [TaskState.MEMORY, TaskState.EXECUTING, None]:
+            for prefix in prefixes[:2] + [None]:
+                for w in [window, None]:
+                    q = th.query()
+                    if worker is not None:
+                        q = q.worker(worker)
+                    if state is not None:
+                        q = q.state(state.value)
+                    if prefix is not None:
+                        q = q.prefix(prefix)
+                    if w is not None:
+                        q = q.between(*w)
+                    assert set(q.task_keys()) == set(_scan(th, worker, state, None, prefix, w))
+
+    q = th.query().event_type(EventTypeEnum.WORKER_TRANSFER).worker(workers[0])
+    assert set(q.task_keys()) == set(_scan(th, workers[0], event_type=EventTypeEnum.WORKER_TRANSFER))
+    assert [task.name for task in q.tasks()] == [th.tasks[k].name for k in q.task_keys()]
+    assert th.query().worker("not-a-worker").count() == 0
+    with pytest.raises(ValueError):
+        th.query().state()
+
+
+def test_queryEvents(tmpdir, load_run):
+    generate_run(str(tmpdir), 200, n_workers=4, seed=4)
+    th = load_run(TaskHandler(), tmpdir)
+    cth = load_run(ColumnarTaskHandler(), tmpdir)
+    assert th.query().count() == cth.query().count() == sum(len(df) for df in th.to_df().values())
+
+    worker = th.event_index().values("worker")[1]
+    for q in (th.query(), cth.query()):
+        events = q.worker(worker).state(TaskState.MEMORY).events()
+        assert len(events[EventTypeEnum.WORKER_TRANSFER]) == 0
+        df = events[EventTypeEnum.WORKER]
+        assert len(df) > 0 and (df["ip"] == worker).all() and (df["finish"] == TaskState.MEMORY).all()
+        assert df["t_event"].is_monotonic_increasing
+
+    a = th.query().worker(worker).events()
+    b = cth.query().worker(worker).events()
+    for event_type in a:
+        assert sorted(zip(a[event_type]["key"].map(str), a[event_type]["t_event"])) == \
+            sorted(zip(b[event_type]["key"].map(str), b[event_type]["t_event"]))
+
+    # the index is rebuilt after events are added, and left out when pickling.
+    index = th.event_index()
+    assert th.event_index() is index
+    pickle.loads(pickle.dumps(th))
+    extract_metadata("./tests/test_data/worker_transfer.csv", "WXFER", False, th)
+    assert len(th.event_index()) > len(index)
@@ -0,0 +1,108 @@
+import struct
+
+import pytest
+
+from wfmeta_dask.objs import ColumnarTaskHandler, TaskHandler, WXferEvent
+from wfmeta_dask.snapshot import CODECS, SNAPSHOT_VERSION, SnapshotReader, load_snapshot, write_snapshot
+
+
+@pytest.mark.parametrize("codec", ["none", "gzip", "bz2", "lzma"])
+def test_snapshotRoundTrip(tmp_path, codec, load_run, assert_same_tasks):
+    th = load_run()
+    path = tmp_path / "output.wfsnap"
+    # a small chunk size spreads shared transfers over several blocks.
+    write_snapshot(th, path, codec=codec, chunk_tasks=7)
+
+    loaded = load_snapshot(path)
+    assert not loaded.sorted
+    assert_same_tasks(th, loaded)
+    assert all(list(loaded.tasks[key].workers) == list(task.workers) for key, task in th.tasks.items())
+
+    # a transfer of several keys stays one object shared by all of its tasks, also across neighbouring blocks.
+    shared = {}
+    for task in loaded.tasks.values():
+        for e in task.events:
+            if isinstance(e, WXferEvent):
+                shared.setdefault(id(e), set()).add(task)
+    assert max(len(tasks) for tasks in shared.values()) > 1
+    assert len(shared) == len(loaded.return_all_wxfer_events())
+
+    for event_type, df in th.to_df().items():
+        assert loaded.to_df()[event_type].equals(df)
+
+
+def test_snapshotSortedColumnar(tmp_path, load_run, assert_same_tasks):
+    th = load_run(ColumnarTaskHandler())
+    th.sort_tasks_by_time()
+    path = tmp_path / "output.wfsnap"
+    write_snapshot(th, path)
+
+    with SnapshotReader(path) as reader:
+        assert reader.codec == "gzip"
+        assert reader.meta["handler"] == "ColumnarTaskHandler"
+        assert reader.meta["n_tasks"] == len(th.tasks)
+    loaded = load_snapshot(path)
+    assert loaded.sorted
+    assert_same_tasks(th, loaded)
+
+
+def test_snapshotZstd(tmp_path, load_run, assert_same_tasks):
+    pytest.importorskip("zstandard")
+    th = load_run()
+    path = tmp_path / "output.wfsnap"
+    write_snapshot(th, path, codec="zstd")
+    assert_same_tasks(th, load_snapshot(path))
+
+
+def test_snapshotInvalid(tmp_path, load_run):
+    th = load_run()
+    path = tmp_path / "output.wfsnap"
+    with pytest.raises(ValueError):
+        write_snapshot(th, path, codec="brotli")
+
+    path.write_bytes(b"not a snapshot")
+    with pytest.raises(ValueError):
+        load_snapshot(path)
+
+    path.write_bytes(struct.pack("<8sII", b"WFSNAP\0\0", SNAPSHOT_VERSION + 1, CODECS.index("none")))
+    with pytest.raises(ValueError):
+        load_snapshot(path)
+
+    write_snapshot(th, path, codec="none")
+    path.write_bytes(path.read_bytes()[:-100])
+    with pytest.raises(ValueError):
+        load_snapshot(path)
+
+
+def test_snapshotBlocksStandAlone(tmp_path, load_run):
+    th = load_run()
+    path = tmp_path / "output.wfsnap"
+    write_snapshot(th, path, codec="none", chunk_tasks=5)
+
+    # every block refers only to its own transfers, so the reader keeps no more than one block of them.
+    with SnapshotReader(path) as reader:
+        n_xfers = []
+        for key, task in reader:
+            n_xfers.append(len(reader._previous_xfers))
+            assert task.__str__() == th.tasks[key].__str__()
+    assert max(n_xfers) < len(th.return_all_wxfer_events())
+
+
+def test_snapshotRejectsUnknownValues(tmp_path, load_run):
+    th = load_run()
+    key = th.return_names()[0]
+    th.tasks[object()] = th.tasks.pop(key)
+    with pytest.raises(ValueError):
+        write_snapshot(th, tmp_path / "output.wfsnap")
+
+    th = load_run()
+    task = th.tasks[key]
+    task.events[0].ip = float("nan")
+    with pytest.raises(ValueError):
+        write_snapshot(th, tmp_path / "output.wfsnap")
+
+
+def test_snapshotEmpty(tmp_path):
+    path = tmp_path / "output.wfsnap"
+    write_snapshot(TaskHandler(), path)
+    assert len(load_snapshot(path).tasks) == 0
@@ -0,0 +1,54 @@
+import asyncio
+
+import pandas as pd
+
+from wfmeta_dask import RUN_FILES
+from wfmeta_dask.objs.tasks import TaskHandler
+from wfmeta_dask.sources import CsvSource, QueueSource, StreamSource, encode_batch
+
+def _record_batches(size: int = 16) :
+    for name, category in RUN_FILES :
+        df = pd.read_csv("./tests/test_data/" + name)
+        for start in range(0, len(df), size) :
+            yield category, df.iloc[start:start + size].to_dict(orient="records")
+
+def test_csvSource(load_run, assert_same_tasks) :
+    th = TaskHandler()
+    n_rows = sum(CsvSource("./tests/test_data/" + name, category, chunksize=7).feed(th) for name, category in RUN_FILES)
+    assert n_rows == 297
+    assert_same_tasks(th, load_run())
+
+def test_queueSource(load_run, assert_same_tasks) :
+    async def run() -> TaskHandler :
+        queue: asyncio.Queue = asyncio.Queue(maxsize=4)
+        th = TaskHandler()
+
+        async def produce() :
+            for batch in _record_batches() :
+                await queue.put(batch)
+            await queue.put(None)
+
+        producer = asyncio.create_task(produce())
+        assert await QueueSource(queue).feed(th) == 297
+        await producer
+        return th
+
+    assert_same_tasks(asyncio.run(run()), load_run())
+
+def test_streamSource(load_run, assert_same_tasks) :
+    async def run() -> TaskHandler :
+        async def produce(reader, writer) :
+            for category, records in _record_batches() :
+                writer.write(encode_batch(category, records))
+                await writer.drain()
+            writer.close()
+
+        server = await asyncio.start_server(produce, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        th = TaskHandler()
+        async with server :
+            source = await StreamSource.connect("127.0.0.1", port)
+            assert await source.feed(th) == 297
+        return th
+
+    assert_same_tasks(asyncio.run(run()), load_run())
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from wfmeta_dask.objs import TaskHandler
+from wfmeta_dask.objs.enums import EventTypeEnum
+from wfmeta_dask.store import TaskStore, write_store
+
+
+def test_storeRoundTrip(tmp_path, load_run):
+    th = load_run()
+    path = tmp_path / "output.wfstore"
+    write_store(th, path)
+
+    with TaskStore(path) as store:
+        assert not store.sorted
+        assert store.return_names() == th.return_names()
+        assert len(store.tasks) == len(th.tasks)
+        for name in reversed(th.return_names()):
+            assert store.get_task_by_name(name).__str__() == th.get_task_by_name(name).__str__()
+
+        th.sort_tasks_by_time()
+        store.sort_tasks_by_time()
+        name = th.return_names()[1]
+        assert store.tasks[name].__str__() == th.tasks[name].__str__()
+
+        for event_type, df in th.to_df().items():
+            assert store.to_df()[event_type].equals(df)
+
+    # a sorted handler marks the store, whose tasks are then never sorted again.
+    write_store(th, path)
+    with TaskStore(path) as store:
+        assert store.sorted
+        assert store.tasks[name].__str__() == th.tasks[name].__str__()
+
+
+def test_storeMissingTask(tmp_path, load_run):
+    path = tmp_path / "output.wfstore"
+    write_store(load_run(), path)
+
+    with TaskStore(path) as store:
+        assert "not-a-task" not in store.tasks
+        with pytest.raises(KeyError):
+            store.get_task_by_name("not-a-task")
+
+
+def test_storeEmpty(tmp_path):
+    path = tmp_path / "output.wfstore"
+    write_store(TaskHandler(), path)
+
+    with TaskStore(path) as store:
+        assert store.return_names() == []
+        assert all(len(t) == 0 for t in store.event_times().values())
+
+
+def test_storeEventTimes(tmp_path, load_run):
+    th = load_run()
+    path = tmp_path / "output.wfstore"
+    write_store(th, path)
+    expected = {t: np.sort([e._t_event for task in th.tasks.values() for e in task.events if e.e_type == t])
+                for t in EventTypeEnum}
+
+    with TaskStore(path) as store:
+        times = store.event_times()
+    for event_type in EventTypeEnum:
+        np.testing.assert_array_equal(times[event_type], expected[event_type])
@@ -0,0 +1,42 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from wfmeta_dask import RUN_FILES
+from wfmeta_dask.objs import ColumnarTaskHandler
+from wfmeta_dask.synthetic import events_per_task, generate_events, generate_run
+
+def test_generateRunIsSeeded(tmpdir) :
+    a = generate_run(str(tmpdir / "a"), 300, seed=3, block_size=128)
+    b = generate_run(str(tmpdir / "b"), 300, seed=3, block_size=128)
+    generate_run(str(tmpdir / "c"), 300, seed=4, block_size=128)
+    assert a == b
+    for name, _ in RUN_FILES :
+        assert Path(tmpdir / "a" / name).read_bytes() == Path(tmpdir / "b" / name).read_bytes()
+        assert Path(tmpdir / "a" / name).read_bytes() != Path(tmpdir / "c" / name).read_bytes()
+
+def test_generatedRunParses(tmpdir, load_run) :
+    rows = generate_run(str(tmpdir), 500, n_workers=4, block_size=200)
+    assert sum(rows.values()) == pytest.approx(500 * events_per_task(), rel=0.1)
+
+    th = load_run(directory=tmpdir)
+    # transfers name their keys as tuples, so fetched tasks get a second, tuple-keyed Task.
+    scheduled = {k: t for k, t in th.tasks.items() if isinstance(k, str)}
+    assert len(scheduled) == 500
+    for task in scheduled.values() :
+        assert task.t_start is not None and task.t_end is not None
+    assert all(1 <= len(t.workers) <= 4 for t in th.tasks.values())
+
+    transfers = th.return_all_wxfer_events()
+    assert len(transfers) == rows["WXFER"]
+    assert max(e.n_tasks() for e in transfers) > 1
+
+    columnar = load_run(ColumnarTaskHandler(), tmpdir)
+    assert columnar.return_names() == th.return_names()
+
+def test_generateEventsScale(tmpdir) :
+    rows = generate_events(str(tmpdir), 5000)
+    assert sum(rows.values()) == pytest.approx(5000, rel=0.1)
+    df = pd.read_csv(str(tmpdir / "worker_transfer.csv"))
+    assert set(df["type"]) == {"incoming_transfer", "outgoing_transfer"}
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from wfmeta_dask import extract_metadata
+from wfmeta_dask.objs import ColumnarTaskHandler, TaskHandler
+from wfmeta_dask.objs.enums import EventTypeEnum
+from wfmeta_dask.synthetic import generate_run
+
+
+def test_timeIndexMatchesScan(tmpdir, load_run):
+    generate_run(str(tmpdir), 300, n_workers=4, seed=1)
+    index = load_run(TaskHandler(), tmpdir).time_index()
+    df = index.to_df()
+    assert set(df["kind"]) == {"task", "transfer"}
+
+    rng = np.random.default_rng(0)
+    worker = index.workers[0]
+    of_worker = np.isin(np.arange(len(df)), index.rows_of_worker(worker))
+    for lo in rng.uniform(df["t_begin"].min() - 1, df["t_end"].max() + 1, 50):
+        hi = lo + rng.exponential(0.2)
+        for event_type, kind in [(None, None), (EventTypeEnum.SCHEDULER, "task"),
+                                 (EventTypeEnum.WORKER_TRANSFER, "transfer")]:
+            expected = (df["t_begin"] <= hi) & (df["t_end"] >= lo) & ((df["kind"] == kind) | (kind is None))
+            assert set(index.overlapping(lo, hi, event_type)) == set(df.index[expected])
+            assert set(index.overlapping(lo, hi, event_type, worker)) == set(df.index[expected & of_worker])
+
+            stabbed = (df["t_begin"] <= lo) & (df["t_end"] >= lo) & ((df["kind"] == kind) | (kind is None))
+            assert set(index.at(lo, event_type)) == set(df.index[stabbed])
+            assert index.concurrency([lo], event_type)[0] == stabbed.sum()
+
+    with pytest.raises(ValueError):
+        index.at(lo, EventTypeEnum.WORKER)
+
+
+def test_timeIndexHandlersAgree(tmpdir, load_run):
+    generate_run(str(tmpdir), 200, n_workers=4, seed=2)
+    th = load_run(TaskHandler(), tmpdir)
+    cth = load_run(ColumnarTaskHandler(), tmpdir)
+    a, b = th.time_index(), cth.time_index()
+
+    pd.testing.assert_frame_equal(a.to_df(), b.to_df(), atol=1e-5)
+    assert sorted(a.workers) == sorted(b.workers)
+    for w in a.workers:
+        assert sorted(a.rows_of_worker(w)) == sorted(b.rows_of_worker(w))
+
+    # adding events rebuilds the index.
+    assert th.time_index() is a
+    extract_metadata("./tests/test_data/worker_transfer.csv", "WXFER", False, th)
+    assert len(th.time_index()) > len(a)
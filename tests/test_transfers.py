@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from wfmeta_dask.objs import ColumnarTaskHandler, TaskHandler
+from wfmeta_dask.objs.enums import TransferTypeEnum
+from wfmeta_dask.synthetic import generate_run
+
+
+def _as_objects(df):
+    return df.astype({c: object for c in ["requestor", "fulfiller", "transfer_type"]})
+
+
+def test_transfersHandlersAgree(tmpdir, load_run):
+    generate_run(str(tmpdir), 200, n_workers=4, seed=3)
+    a = load_run(TaskHandler(), tmpdir).transfers()
+    b = load_run(ColumnarTaskHandler(), tmpdir).transfers()
+    assert len(a) > 0
+    pd.testing.assert_frame_equal(_as_objects(a), _as_objects(b), atol=1e-5)
+
+
+def test_transferMatrixMatchesGroupby(tmpdir, load_run):
+    generate_run(str(tmpdir), 300, n_workers=5, seed=4)
+    th = load_run(ColumnarTaskHandler(), tmpdir)
+    transfers = _as_objects(th.transfers())
+    incoming = transfers[transfers["transfer_type"] == TransferTypeEnum.INCOMING.value]
+    expected = incoming.groupby(["requestor", "fulfiller"])
+    expected = pd.DataFrame({"bytes": expected["total"].sum(), "count": expected.size(),
+                             "mean_bandwidth": expected["bandwidth"].mean(),
+                             "p95_bandwidth": expected["bandwidth"].quantile(0.95)})
+
+    matrix = th.transfer_matrix()
+    df = matrix.to_df().set_index(["sender", "receiver"]).sort_index()
+    expected.index.names = ["sender", "receiver"]
+    pd.testing.assert_frame_equal(df[expected.columns], expected.sort_index(), check_dtype=False,
+                                  check_index_type=False)
+
+    dense = matrix.dense("count")
+    assert dense.shape == matrix.shape
+    assert dense.sum() == len(incoming)
+
+    binned = th.transfer_matrix(bins=0.5)
+    assert binned.bins is not None
+    np.testing.assert_allclose(binned.dense("bytes").sum(axis=0), matrix.dense("bytes"))
+
+    with pytest.raises(ValueError):
+        matrix.dense("latency")
+    with pytest.raises(ValueError):
+        th.transfer_matrix(bins=0)
+
+
+def test_transferMatrixScipy(tmpdir, load_run):
+    pytest.importorskip("scipy")
+    generate_run(str(tmpdir), 100, n_workers=3, seed=5)
+    matrix = load_run(TaskHandler(), tmpdir).transfer_matrix()
+    np.testing.assert_allclose(matrix.to_scipy("bytes").toarray(), matrix.dense("bytes"))
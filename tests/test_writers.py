@@ -0,0 +1,59 @@
+import pandas as pd
+import pytest
+
+from wfmeta_dask.objs import SchedulerEvent
+from wfmeta_dask.objs.enums import EventTypeEnum, TaskState
+from wfmeta_dask.writers import read_parquet, to_arrow_frame, write_parquet, write_txt
+
+
+def test_arrowFrameTypes(load_run):
+    dfs = load_run().to_df()
+
+    sched = to_arrow_frame(dfs[EventTypeEnum.SCHEDULER])
+    assert sched["start"].dtype == "category"
+    assert list(sched["start"].cat.categories) == [s.value for s in TaskState]
+    assert sched["key"].dtype == "category"
+    assert str(sched["t_begins"].dtype) == "datetime64[us]"
+
+    wxfer = to_arrow_frame(dfs[EventTypeEnum.WORKER_TRANSFER])
+    assert wxfer["transfer_type"].dtype == "category"
+    assert wxfer["requestor"].dtype == "category"
+    assert all(isinstance(k, str) for k in wxfer["key"].cat.categories)
+
+
+def test_parquetRoundTrip(tmp_path, load_run):
+    pytest.importorskip("pyarrow")
+    dfs = load_run().to_df()
+    write_parquet(load_run(), tmp_path)
+    loaded = read_parquet(tmp_path)
+
+    for event_type, df in dfs.items():
+        assert loaded[event_type].shape == df.shape
+        assert loaded[event_type]["key"].dtype == "category"
+    assert list(loaded[EventTypeEnum.WORKER]["finish"].astype(str)) == [s.value for s in dfs[EventTypeEnum.WORKER]["finish"]]
+
+
+def _joined_str(task) -> str:
+    # the original, string concatenating Task.__str__
+    event_strs = ""
+    for e in task.events:
+        event_strs += e.__str__()
+    out = "Task object for task {e.name}:\n".format(e=task)
+    out += "\tEvent objects:\n\t\t{event_info}".format(event_info="\n\t\t".join(event_strs.split("\n")))
+    out = out.strip()
+    out += "\n\tStart time: {e.t_start}\tEnd time: {e.t_end}\n".format(e=task)
+    return out
+
+
+def test_txtMatchesTaskStr(tmp_path, load_run):
+    th = load_run()
+    # a last event ending in whitespace, which the txt output strips.
+    th.add_df(SchedulerEvent, pd.DataFrame([{"key": "blank source", "start": "released", "finish": "waiting",
+                                             "stimulus_id": "s", "called_from": " ", "begins": float("nan"),
+                                             "ends": float("nan"), "time": 1713455681.0}]))
+    expected = "".join(_joined_str(task) for task in th.tasks.values())
+    assert "".join(task.__str__() for task in th.tasks.values()) == expected
+
+    for jobs in (1, 2):
+        write_txt(th, tmp_path / "output.txt", jobs=jobs, chunksize=50)
+        assert (tmp_path / "output.txt").read_text() == expected